@@ -0,0 +1,29 @@
+"""
+Audio cache - content-addressed store for synthesized speech
+Files are named by a hash of (model, voice, speed, text), so identical
+narration is read from disk instead of going back to a TTS provider.
+"""
+import hashlib
+import os
+
+from app.core.config import settings
+from app.core.disk_cache import DiskCache
+
+
+class AudioCache(DiskCache):
+    """Disk cache of TTS output, keyed by synthesis request"""
+
+    def __init__(self, directory: str, max_bytes: int, extension: str = "mp3"):
+        super().__init__(directory, max_bytes, extension)
+
+    @staticmethod
+    def key(text: str, voice: str, speed: float, model: str) -> str:
+        """Content address for a synthesis request"""
+        material = f"{model}\x00{voice}\x00{speed:.3f}\x00{text.strip()}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+audio_cache = AudioCache(
+    settings.AUDIO_CACHE_DIR or os.path.join(settings.VIDEO_OUTPUT_DIR, "audio_cache"),
+    settings.AUDIO_CACHE_MAX_BYTES
+)
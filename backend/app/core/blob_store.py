@@ -0,0 +1,171 @@
+"""
+Upload blob store - content-addressed storage for uploaded files
+Uploads are kept in memory (LRU) and spill to disk when the memory budget is
+exceeded; clients reference them by a short "blob:<id>" handle instead of
+re-sending multi-MB base64 data URLs on every request.
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import base64
+import hashlib
+import mimetypes
+import os
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+HANDLE_PREFIX = "blob:"
+
+
+class BlobStore:
+    """Two-tier (memory, then disk) size-bounded blob store keyed by content hash"""
+
+    def __init__(self, directory: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.stats = {"hits": 0, "misses": 0, "spills": 0, "evictions": 0}
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()  # id -> (data, mime)
+        self._memory_bytes = 0
+        self._disk: Dict[str, Tuple[str, int]] = {}  # id -> (filename, size)
+        self._lock = asyncio.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            blob_id, _, _ = name.partition(".")
+            if name.endswith(".tmp") or not blob_id:
+                continue
+            self._disk[blob_id] = (name, os.path.getsize(os.path.join(self.directory, name)))
+
+    @staticmethod
+    def blob_id(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    @staticmethod
+    def is_handle(value: Optional[str]) -> bool:
+        return bool(value) and value.startswith(HANDLE_PREFIX)
+
+    async def put(self, data: bytes, mime_type: str, blob_id: Optional[str] = None) -> str:
+        """Store `data` and return its handle (identical content shares one entry)"""
+        blob_id = blob_id or self.blob_id(data)
+        async with self._lock:
+            if blob_id in self._memory:
+                self._memory.move_to_end(blob_id)
+            elif blob_id not in self._disk:
+                self._memory[blob_id] = (data, mime_type)
+                self._memory_bytes += len(data)
+                await self._spill()
+        return f"{HANDLE_PREFIX}{blob_id}"
+
+    async def get(self, handle: str) -> Optional[Tuple[bytes, str]]:
+        """(data, mime type) for a handle, or None if unknown/evicted"""
+        blob_id = handle[len(HANDLE_PREFIX):] if self.is_handle(handle) else handle
+        entry = self._memory.get(blob_id)
+        if entry is not None:
+            self._memory.move_to_end(blob_id)
+            self.stats["hits"] += 1
+            return entry
+        if blob_id in self._disk:
+            entry = await asyncio.to_thread(self._read, blob_id)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return entry
+        self.stats["misses"] += 1
+        return None
+
+    async def data_url(self, handle: str) -> Optional[str]:
+        entry = await self.get(handle)
+        if entry is None:
+            return None
+        data, mime_type = entry
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+
+    async def _spill(self) -> None:
+        """Move least recently used blobs to disk until memory is within budget"""
+        while self._memory_bytes > self.memory_max_bytes and len(self._memory) > 1:
+            blob_id, (data, mime_type) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            await asyncio.to_thread(self._write, blob_id, data, mime_type)
+            self.stats["spills"] += 1
+
+    def _read(self, blob_id: str) -> Optional[Tuple[bytes, str]]:
+        entry = self._disk.get(blob_id)
+        if entry is None:
+            return None
+        name, _ = entry
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self._disk.pop(blob_id, None)
+            return None
+        os.utime(path, None)
+        mime_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        return data, mime_type
+
+    def _write(self, blob_id: str, data: bytes, mime_type: str) -> None:
+        extension = mimetypes.guess_extension(mime_type) or ".bin"
+        name = f"{blob_id}{extension}"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._disk[blob_id] = (name, len(data))
+        self._evict()
+
+    def _evict(self) -> None:
+        total = sum(size for _, size in self._disk.values())
+        if total <= self.disk_max_bytes:
+            return
+        entries: List[Tuple[float, str]] = []
+        for blob_id, (name, _) in list(self._disk.items()):
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.directory, name)), blob_id))
+            except FileNotFoundError:
+                self._disk.pop(blob_id, None)
+        for _, blob_id in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            name, size = self._disk.pop(blob_id)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": sum(size for _, size in self._disk.values())
+        }
+
+
+blob_store = BlobStore(
+    settings.UPLOAD_BLOB_DIR or os.path.join(settings.VIDEO_OUTPUT_DIR, "uploads"),
+    settings.UPLOAD_BLOB_MEMORY_BYTES,
+    settings.UPLOAD_BLOB_DISK_BYTES
+)
+
+
+async def resolve_image(value: Optional[str]) -> Optional[str]:
+    """Swap an upload handle for its data URL; data URLs, URLs and raw base64 pass through"""
+    if not blob_store.is_handle(value):
+        return value
+    data_url = await blob_store.data_url(value)
+    if data_url is None:
+        raise HTTPException(status_code=404, detail=f"Upload {value} has expired, please upload it again")
+    return data_url
+
+
+async def resolve_images(values: Optional[List[str]]) -> Optional[List[str]]:
+    if not values:
+        return values
+    return list(await asyncio.gather(*(resolve_image(value) for value in values)))
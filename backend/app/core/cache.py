@@ -0,0 +1,173 @@
+"""
+Response cache - in-memory LRU with TTL and an optional SQLite tier
+Used to short-circuit identical LLM requests (same model, prompt, messages, images)
+"""
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+
+
+def _normalize(value: Any) -> Any:
+    """Canonicalize a request payload: trim text, replace inline images by a hash of their bytes"""
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        if value.startswith("data:") and ";base64," in value:
+            try:
+                raw = base64.b64decode(value.split(",", 1)[1])
+                return f"image-sha256:{hashlib.sha256(raw).hexdigest()}"
+            except ValueError:
+                pass
+        # Only trim the ends - inner whitespace can be meaningful (code, indentation)
+        return value.strip()
+    return value
+
+
+def make_cache_key(model: str, messages: List[Dict[str, Any]], **params: Any) -> str:
+    """Stable hash of model + messages (system prompt included) + extra params"""
+    payload = {"model": model, "messages": _normalize(messages), "params": _normalize(params)}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory + optional SQLite) cache of JSON-serializable values"""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400,
+        sqlite_path: str = "",
+        sqlite_max_entries: int = 10000,
+        enabled: bool = True
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_max_entries = sqlite_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, json)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "evictions": 0}
+
+        if enabled and sqlite_path:
+            os.makedirs(os.path.dirname(sqlite_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return a fresh copy of the cached value, or None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, raw = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return json.loads(raw)
+            del self._memory[key]
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                raw, expires_at = row
+                self._remember(key, raw, expires_at)
+                self.stats["hits"] += 1
+                self.stats["disk_hits"] += 1
+                return json.loads(raw)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        raw = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, raw, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, raw, expires_at)
+
+    def _remember(self, key: str, raw: str, expires_at: float) -> None:
+        self._memory[key] = (expires_at, raw)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _db_get(self, key: str, now: float) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row
+
+    def _db_set(self, key: str, raw: str, expires_at: float) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, raw, expires_at, now)
+            )
+            # Drop expired rows, then least-recently-used rows over the size bound
+            self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.sqlite_max_entries,)
+            )
+            self._db.commit()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "enabled": self.enabled,
+            "disk_enabled": self._db is not None
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+
+llm_cache = ResponseCache(
+    "llm",
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    sqlite_path=settings.LLM_CACHE_SQLITE_PATH,
+    sqlite_max_entries=settings.LLM_CACHE_SQLITE_MAX_ENTRIES,
+    enabled=settings.LLM_CACHE_ENABLED
+)
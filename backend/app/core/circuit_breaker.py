@@ -0,0 +1,171 @@
+"""
+Circuit breakers per upstream endpoint
+Shared process-wide; wired into the pooled HTTP clients via a transport wrapper
+so every service fails fast while a provider endpoint is down.
+"""
+from typing import Any, Dict, Optional
+import time
+import httpx
+
+from app.core.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit open for {name}, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker:
+    closed -> open after `failure_threshold` consecutive failures,
+    open -> half_open after `recovery_seconds`,
+    half_open -> closed on a successful trial call, back to open on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.total_rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not go out"""
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.recovery_seconds:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, self.recovery_seconds - elapsed)
+            self.state = self.HALF_OPEN
+            self.half_open_in_flight = 0
+            print(f"[Circuit] {self.name} half-open, allowing trial call")
+
+        if self.state == self.HALF_OPEN:
+            if self.half_open_in_flight >= self.half_open_max_calls:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.name, 0)
+            self.half_open_in_flight += 1
+
+    def record_success(self) -> None:
+        self.total_successes += 1
+        self.consecutive_failures = 0
+        if self.state == self.HALF_OPEN:
+            print(f"[Circuit] {self.name} closed")
+        self.state = self.CLOSED
+        self.half_open_in_flight = 0
+
+    def record_failure(self) -> None:
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"[Circuit] {self.name} opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.half_open_in_flight = 0
+
+    def reset(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.half_open_in_flight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.recovery_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in": round(retry_in, 1),
+            "total_successes": self.total_successes,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected
+        }
+
+
+class CircuitBreakerRegistry:
+    """Process-wide breakers keyed by endpoint (host + path)"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                recovery_seconds=settings.CIRCUIT_RECOVERY_SECONDS,
+                half_open_max_calls=settings.CIRCUIT_HALF_OPEN_MAX_CALLS
+            )
+            self._breakers[name] = breaker
+        return breaker
+
+    def reset(self, name: Optional[str] = None) -> None:
+        if name is None:
+            targets = list(self._breakers.values())
+        else:
+            targets = [self._breakers[name]] if name in self._breakers else []
+        for breaker in targets:
+            breaker.reset()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport wrapper that guards each request with the breaker for its endpoint.
+    5xx responses and transport errors count as failures; anything else
+    (including 4xx, which is the caller's fault) counts as success.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = circuit_breakers.get(f"{request.url.host}{request.url.path}")
+        breaker.before_call()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled by the caller (e.g. router timeout) - release the trial slot
+            if breaker.state == CircuitBreaker.HALF_OPEN:
+                breaker.half_open_in_flight = max(0, breaker.half_open_in_flight - 1)
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -2,7 +2,7 @@
 Application configuration settings
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -33,6 +33,126 @@ class Settings(BaseSettings):
     MINIMAX_CHAT_URL: str = ""
     MINIMAX_CHAT_MODEL: str = ""
     
+    # Shared HTTP client pool (per upstream host)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP_DEFAULT_TIMEOUT: float = 120.0
+    
+    # Provider routing / health scoring
+    PROVIDER_HEALTH_WINDOW: int = 50
+    PROVIDER_FAILURE_THRESHOLD: int = 3
+    PROVIDER_COOLDOWN_SECONDS: float = 30.0
+    PROVIDER_MIN_TIMEOUT: float = 15.0
+    PROVIDER_MAX_TIMEOUT: float = 120.0
+    PROVIDER_TIMEOUT_P95_MULTIPLIER: float = 3.0
+    
+    # Hedged chat requests (opt-in)
+    CHAT_HEDGING_ENABLED: bool = False
+    CHAT_HEDGE_PERCENTILE: float = 95.0
+    CHAT_HEDGE_DEFAULT_DELAY: float = 8.0
+    CHAT_HEDGE_MIN_DELAY: float = 1.0
+    CHAT_HEDGE_MAX_EXTRA_CALLS: int = 1
+    
+    # Admin API (/api/admin) - disabled unless a token is set; send it as X-Admin-Token
+    ADMIN_TOKEN: str = ""
+    
+    # Circuit breakers (per upstream endpoint)
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0
+    CIRCUIT_HALF_OPEN_MAX_CALLS: int = 1
+    
+    # Rate limits in requests/minute, keyed "provider" or "provider:model"
+    RATE_LIMIT_RPM: Dict[str, float] = {
+        "gemini": 15,
+        "openai": 500,
+        "openai:dall-e-3": 7,
+        "manus": 60,
+        "minimax": 60,
+        "hume": 60,
+    }
+    RATE_LIMIT_DEFAULT_RPM: float = 60
+    RATE_LIMIT_BURST_SECONDS: float = 10.0
+    RATE_LIMIT_MAX_QUEUE_SECONDS: float = 60.0
+    RATE_LIMIT_DEFAULT_BACKOFF: float = 5.0
+    
+    # LLM response cache (exact match)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: float = 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 1000
+    LLM_CACHE_SQLITE_PATH: str = ""  # e.g. "cache/llm_cache.sqlite3" to persist across restarts
+    LLM_CACHE_SQLITE_MAX_ENTRIES: int = 20000
+    
+    # Max concurrent TTS requests per slideshow
+    SLIDESHOW_TTS_CONCURRENCY: int = 4
+    
+    # Step images for /api/explain/solve
+    EXPLANATION_IMAGE_CONCURRENCY: int = 3
+    EXPLANATION_IMAGE_DEADLINE: float = 45.0  # seconds per image once it starts; slower images come back as null
+    EXPLANATION_IMAGE_TICKETS: int = 2000  # lazy image tickets remembered
+    EXPLANATION_IMAGE_CACHE_TTL: int = 50 * 60  # generated image URLs expire upstream after ~1h
+    
+    # Background speech synthesis for /api/reasoning/analyze steps
+    REASONING_SPEECH_PREFETCH: bool = True
+    REASONING_SPEECH_PREFETCH_CONCURRENCY: int = 2
+    REASONING_SPEECH_PREFETCH_STEPS: int = 10  # steps per analysis to synthesize ahead
+    REASONING_SPEECH_CACHE_ENTRIES: int = 500
+    REASONING_SPEECH_CACHE_TTL: int = 30 * 60  # seconds
+    
+    # Local math diagram rendering (matplotlib) before remote image generation
+    DIAGRAM_RENDER_ENABLED: bool = True
+    DIAGRAM_FORMULA_CARDS: bool = True  # render math as a formula card when no other diagram fits
+    DIAGRAM_WORKERS: int = 2
+    DIAGRAM_DPI: int = 150
+    DIAGRAM_RENDER_TIMEOUT: float = 10.0  # seconds in a worker, not counting time queued for one
+    DIAGRAM_CACHE_DIR: str = ""  # defaults to <VIDEO_OUTPUT_DIR>/diagrams
+    DIAGRAM_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+    
+    # Server-side LaTeX rasterization (/api/latex, render_math flags)
+    LATEX_RENDER_ENABLED: bool = True
+    LATEX_FORMAT: str = "svg"  # default output: "svg" or "png"
+    LATEX_FONT_SIZE: int = 20
+    LATEX_MAX_CHARS: int = 2000
+    LATEX_MAX_BATCH: int = 200
+    LATEX_CACHE_DIR: str = ""  # SVGs; defaults to <VIDEO_OUTPUT_DIR>/latex (PNGs share the diagram cache)
+    LATEX_CACHE_MAX_BYTES: int = 100 * 1024 * 1024
+    SLIDESHOW_MATH_COLOR: str = "#f0f0f0"  # chalk on the blackboard slides
+    
+    # TTS audio cache (content-addressed, on disk)
+    AUDIO_CACHE_DIR: str = ""  # defaults to <VIDEO_OUTPUT_DIR>/audio_cache
+    AUDIO_CACHE_MAX_BYTES: int = 500 * 1024 * 1024
+    
+    # Upload blob store (handles instead of re-sent base64)
+    UPLOAD_BLOB_DIR: str = ""  # defaults to <VIDEO_OUTPUT_DIR>/uploads
+    UPLOAD_BLOB_MEMORY_BYTES: int = 64 * 1024 * 1024
+    UPLOAD_BLOB_DISK_BYTES: int = 1024 * 1024 * 1024
+    
+    # Image downscaling before upload storage and vision calls
+    # Targets are [max long side, max short side] in pixels
+    IMAGE_RESIZE_ENABLED: bool = True
+    IMAGE_RESIZE_WORKERS: int = 2
+    IMAGE_TARGETS: Dict[str, List[int]] = {
+        "default": [2048, 1536],
+        "openai": [2048, 768],
+        "manus": [2048, 768],
+        "gemini": [1536, 1536]
+    }
+    IMAGE_FORMATS: Dict[str, str] = {"default": "JPEG", "gemini": "WEBP"}
+    IMAGE_QUALITY: int = 85
+    IMAGE_RECOMPRESS_MIN_BYTES: int = 300 * 1024  # re-encode small-enough images only above this size
+    
+    # PDF text extraction (process pool)
+    PDF_WORKERS: int = 2
+    PDF_PAGES_PER_TASK: int = 25  # larger documents are split into page ranges extracted in parallel
+    PDF_STREAM_PAGES_PER_TASK: int = 5  # pages per worker call when streaming
+    PDF_EXTRACT_TIMEOUT: float = 60.0  # seconds per worker call, not counting time queued for a worker
+    PDF_CACHE_ENTRIES: int = 64
+    
+    # Media URLs (/api/media/{id}) - set when the API is served from another origin
+    MEDIA_BASE_URL: str = ""
+    MEDIA_MAX_AGE_SECONDS: int = 7 * 24 * 3600
+    
     # CORS - allow Vercel deployments
     CORS_ORIGINS: List[str] = [
         "http://localhost:5173", 
@@ -44,6 +164,9 @@ class Settings(BaseSettings):
     
     # Upload settings
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_MAX_BATCH_FILES: int = 10  # per /api/upload/images request
+    UPLOAD_BATCH_CONCURRENCY: int = 4
+    UPLOAD_READ_CHUNK_BYTES: int = 1024 * 1024
     ALLOWED_EXTENSIONS: List[str] = ["png", "jpg", "jpeg", "gif", "webp", "pdf"]
     
     # Video output settings
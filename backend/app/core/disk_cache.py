@@ -0,0 +1,100 @@
+"""
+Disk cache - size-bounded, content-addressed file store
+Entries are files named "<key>.<extension>" in one directory; the least recently
+used are evicted once the directory exceeds its byte budget. Holds TTS audio and
+rendered diagrams/LaTeX, which MediaStore serves by id.
+"""
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+
+
+class DiskCache:
+    """Size-bounded on-disk cache of one file type, evicting least recently used files"""
+
+    def __init__(self, directory: str, max_bytes: int, extension: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._sizes: Dict[str, int] = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(f".{extension}"):
+                self._sizes[name] = os.path.getsize(os.path.join(self.directory, name))
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{self.extension}")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data = await asyncio.to_thread(self._read, key)
+        self.stats["hits" if data is not None else "misses"] += 1
+        return data
+
+    async def locate(self, key: str) -> Optional[str]:
+        """Path of a cached entry (marking it recently used), or None"""
+        path = await asyncio.to_thread(self._touch, key)
+        self.stats["hits" if path is not None else "misses"] += 1
+        return path
+
+    async def put(self, key: str, data: bytes) -> None:
+        if not data:
+            return
+        await asyncio.to_thread(self._write, key, data)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # Touch so eviction treats it as recently used
+        os.utime(path, None)
+        return data
+
+    def _touch(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._sizes[os.path.basename(path)] = len(data)
+        self._evict()
+
+    def _evict(self) -> None:
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        entries: List[Tuple[float, str]] = []
+        for name in list(self._sizes):
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except FileNotFoundError:
+                self._sizes.pop(name, None)
+        for _, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= self._sizes.pop(name, 0)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "files": len(self._sizes),
+            "bytes": sum(self._sizes.values()),
+            "max_bytes": self.max_bytes
+        }
+
@@ -0,0 +1,70 @@
+"""
+Shared HTTP client registry
+One pooled, keep-alive httpx.AsyncClient per upstream host
+"""
+from typing import Dict
+import httpx
+
+from app.core.config import settings
+from app.core.circuit_breaker import CircuitBreakerTransport
+from app.core.rate_limiter import RateLimitTransport
+
+
+class HTTPClientRegistry:
+    """Hands out long-lived AsyncClients so provider calls reuse connections"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        """
+        Get the shared client for the host of `url`
+        Clients are created lazily and kept until shutdown
+        """
+        key = self._host_key(url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                # Breaker check first (fail fast), then rate-limit queue, then the pool
+                transport=CircuitBreakerTransport(
+                    RateLimitTransport(
+                        httpx.AsyncHTTPTransport(
+                            limits=httpx.Limits(
+                                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+                            )
+                        )
+                    )
+                ),
+                timeout=httpx.Timeout(
+                    settings.HTTP_DEFAULT_TIMEOUT,
+                    connect=settings.HTTP_CONNECT_TIMEOUT
+                )
+            )
+            self._clients[key] = client
+            print(f"[HTTP] Opened pooled client for {key}")
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pooled client (called on app shutdown)"""
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for key, client in clients:
+            try:
+                await client.aclose()
+                print(f"[HTTP] Closed pooled client for {key}")
+            except Exception as e:
+                print(f"[HTTP] Error closing client for {key}: {e}")
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        """Normalize a URL down to scheme://host[:port]"""
+        parsed = httpx.URL(url)
+        key = f"{parsed.scheme}://{parsed.host}"
+        if parsed.port:
+            key += f":{parsed.port}"
+        return key
+
+
+http_clients = HTTPClientRegistry()
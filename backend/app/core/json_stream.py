@@ -0,0 +1,228 @@
+"""
+Incremental JSON parsing for streamed LLM output
+Feeds completion deltas through a small state machine and hands back elements
+of one top-level array (e.g. "steps", "cards", "boards") as soon as they close.
+"""
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+import json
+
+from app.core.cache import llm_cache
+from app.core.http_client import http_clients
+
+
+class IncrementalJSONArrayParser:
+    """
+    Streaming parser for documents shaped like {"...": ..., "<array_key>": [ {...}, {...} ], ...}.
+    feed() returns the array elements completed by the new text; scalar top-level
+    fields seen so far are available in `fields`. result() parses the whole document.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self._pos = 0               # absolute offset of the next character to scan
+        self._text = ""             # everything received so far
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._expect_value = False
+        self._in_target = False
+        self._target_done = False
+        self._element_start = -1
+
+    def feed(self, delta: str) -> List[Any]:
+        """Consume a chunk of text and return newly completed array elements"""
+        completed: List[Any] = []
+        self._text += delta
+        text = self._text
+
+        while self._pos < len(text):
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    literal = text[self._string_start:i + 1]
+                    self._on_string(literal)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                if self._in_target and self._depth == 2 and self._element_start < 0:
+                    self._element_start = i
+                continue
+
+            if ch in "{[":
+                if self._in_target and self._depth == 2 and self._element_start < 0:
+                    self._element_start = i
+                if (ch == "[" and self._depth == 1 and self._expect_value
+                        and self._current_key == self.array_key and not self._target_done):
+                    self._in_target = True
+                self._depth += 1
+                self._expect_value = False
+                continue
+
+            if ch in "}]":
+                self._depth -= 1
+                if self._in_target and self._depth == 2 and self._element_start >= 0:
+                    completed.append(self._emit(text[self._element_start:i + 1]))
+                elif self._in_target and self._depth == 1:
+                    # Closing bracket of the target array (flush a trailing scalar element)
+                    if self._element_start >= 0:
+                        completed.append(self._emit(text[self._element_start:i]))
+                    self._in_target = False
+                    self._target_done = True
+                continue
+
+            if ch == ":" and self._depth == 1:
+                self._current_key = self._last_string
+                self._expect_value = True
+                continue
+
+            if ch == ",":
+                if self._in_target and self._depth == 2 and self._element_start >= 0:
+                    completed.append(self._emit(text[self._element_start:i]))
+                if self._depth == 1:
+                    self._expect_value = False
+                continue
+
+            if not ch.isspace():
+                # Start of a bare scalar (number / true / false / null)
+                if self._in_target and self._depth == 2 and self._element_start < 0:
+                    self._element_start = i
+                elif self._depth == 1 and self._expect_value:
+                    if not self._scan_scalar_field(text, i):
+                        # Incomplete - rescan from here on the next feed
+                        self._pos = i
+                        break
+
+        return [item for item in completed if item is not None]
+
+    def result(self) -> Dict[str, Any]:
+        """Parse the full document received so far"""
+        return json.loads(self._text)
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def _on_string(self, literal: str) -> None:
+        if self._depth != 1:
+            return
+        value = json.loads(literal)
+        if self._expect_value and self._current_key is not None:
+            self.fields[self._current_key] = value
+            self._expect_value = False
+        else:
+            self._last_string = value
+
+    def _scan_scalar_field(self, text: str, start: int) -> bool:
+        """Record a top-level number/bool/null; False if its terminator hasn't arrived yet"""
+        end = start
+        while end < len(text) and text[end] not in ",}\n":
+            end += 1
+        if end >= len(text):
+            return False
+        try:
+            self.fields[self._current_key] = json.loads(text[start:end].strip())
+        except ValueError:
+            pass
+        self._pos = end
+        self._expect_value = False
+        return True
+
+    def _emit(self, raw: str) -> Optional[Any]:
+        self._element_start = -1
+        raw = raw.strip()
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+
+async def iter_openai_deltas(
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    timeout: float = 120.0
+) -> AsyncGenerator[str, None]:
+    """Yield content deltas from an OpenAI-compatible streaming chat completion"""
+    client = http_clients.get(url)
+    async with client.stream(
+        "POST",
+        url,
+        headers=headers,
+        json={**payload, "stream": True},
+        timeout=timeout
+    ) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise Exception(f"Streaming API error: {response.status_code} - {body[:200]!r}")
+
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data_str = line[6:]
+            if data_str == "[DONE]":
+                break
+            try:
+                data = json.loads(data_str)
+            except json.JSONDecodeError:
+                continue
+            if data.get("choices"):
+                content = data["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+
+async def stream_json_items(
+    deltas: AsyncGenerator[str, None],
+    array_key: str,
+    item_event: str
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Turn a delta stream into events: one `item_event` per completed element of
+    `array_key` ({"index", "item"}), then "done" with the full parsed document.
+    """
+    parser = IncrementalJSONArrayParser(array_key)
+    index = 0
+    async for delta in deltas:
+        for item in parser.feed(delta):
+            yield {"event": item_event, "data": {"index": index, "item": item}}
+            index += 1
+    yield {"event": "done", "data": parser.result()}
+
+
+async def stream_cached_json_items(
+    cache_key: str,
+    deltas: Callable[[], AsyncGenerator[str, None]],
+    array_key: str,
+    item_event: str
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    stream_json_items backed by the LLM response cache: a hit replays the cached
+    document's elements immediately, a miss streams `deltas()` and stores the result.
+    """
+    cached = await llm_cache.get(cache_key)
+    if cached is not None:
+        for index, item in enumerate(cached.get(array_key, [])):
+            yield {"event": item_event, "data": {"index": index, "item": item}}
+        yield {"event": "done", "data": cached}
+        return
+
+    async for event in stream_json_items(deltas(), array_key, item_event):
+        if event["event"] == "done":
+            await llm_cache.set(cache_key, event["data"])
+        yield event
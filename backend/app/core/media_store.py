@@ -0,0 +1,55 @@
+"""
+Media store - serves cached blobs (TTS audio, rendered images) by id
+Services hand out short /api/media/{id} URLs instead of inlining base64 data
+URLs in JSON; ids are "<content address>.<extension>" of a registered disk cache.
+"""
+from typing import Dict, Optional, Tuple
+import re
+
+from app.core.audio_cache import audio_cache
+from app.core.config import settings
+from app.core.disk_cache import DiskCache
+
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+_MEDIA_ID = re.compile(r"^([0-9a-f]{16,64})\.([a-z0-9]+)$")
+
+
+class MediaStore:
+    """Maps media ids to files in the registered content-addressed caches"""
+
+    def __init__(self):
+        self._caches: Dict[str, DiskCache] = {}
+
+    def register(self, cache: DiskCache) -> None:
+        self._caches[cache.extension] = cache
+
+    def url_for(self, cache: DiskCache, key: str) -> str:
+        """Stable URL for an entry of `cache`"""
+        return f"{settings.MEDIA_BASE_URL.rstrip('/')}/api/media/{key}.{cache.extension}"
+
+    async def resolve(self, media_id: str) -> Optional[Tuple[str, str]]:
+        """(file path, content type) for a media id, or None if unknown/evicted"""
+        match = _MEDIA_ID.match(media_id)
+        if not match:
+            return None
+        key, extension = match.groups()
+        cache = self._caches.get(extension)
+        if cache is None:
+            return None
+        path = await cache.locate(key)
+        if path is None:
+            return None
+        return path, MEDIA_TYPES.get(extension, "application/octet-stream")
+
+
+media_store = MediaStore()
+media_store.register(audio_cache)
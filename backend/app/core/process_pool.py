@@ -0,0 +1,113 @@
+"""
+Process pool helpers
+Cancelling a future that is already running doesn't stop its worker, so work
+that overruns its timeout would keep a worker busy indefinitely. WorkerPool
+terminates such pools and starts a fresh one; jobs of other requests that the
+restart killed are retried once, so only the job that overran fails.
+"""
+from typing import Any, Callable, Optional, Set
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+
+
+def terminate_pool(pool: ProcessPoolExecutor) -> None:
+    """Kill the pool's workers (running tasks included) and shut it down"""
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # Jobs nobody awaits any more (timed out, abandoned) shouldn't log unretrieved errors
+    if not future.cancelled():
+        future.exception()
+
+
+class WorkerPool:
+    """
+    Lazily started process pool that runs at most `workers` jobs at a time, so a
+    job's timeout only counts time spent in a worker, not time queued behind others
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reapers: Set[asyncio.Task] = set()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots, self._loop = asyncio.Semaphore(self.workers), loop
+        return self._slots
+
+    async def run(self, timeout: float, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        fn(*args) in a worker process. Raises asyncio.TimeoutError (after restarting
+        the pool) if it runs longer than `timeout` seconds, or whatever fn raised.
+        """
+        for attempt in range(2):
+            slots: Optional[asyncio.Semaphore] = self._semaphore()
+            await slots.acquire()
+            pool = self.pool
+            done = asyncio.wrap_future(pool.submit(fn, *args))
+            done.add_done_callback(_retrieve)
+            try:
+                return await asyncio.wait_for(asyncio.shield(done), timeout)
+            except asyncio.TimeoutError:
+                print(f"[{self.name}] Worker timed out, restarting the pool")
+                self.restart(pool)
+                raise
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError) and not done.cancelled():
+                    # The caller gave up; the worker stays busy (and its slot taken) until the job ends
+                    self._abandon(pool, done, slots, timeout)
+                    slots = None
+                    raise
+                # Killed by a restart (or a crashed worker) - not this job's fault
+                self.restart(pool)
+                if attempt:
+                    raise BrokenProcessPool(f"{self.name} worker pool restarted twice during the job") from None
+                print(f"[{self.name}] Pool restarted under a running job, retrying")
+            finally:
+                if slots is not None:
+                    slots.release()
+
+    def _abandon(self, pool: ProcessPoolExecutor, done: asyncio.Future, slots: asyncio.Semaphore, timeout: float) -> None:
+        """Give an abandoned running job its timeout, then restart the pool if it is still going"""
+        async def reap():
+            try:
+                await asyncio.wait_for(done, timeout)
+            except asyncio.TimeoutError:
+                print(f"[{self.name}] Abandoned job still running, restarting the pool")
+                self.restart(pool)
+            except Exception:
+                pass
+            finally:
+                slots.release()
+
+        task = asyncio.ensure_future(reap())
+        self._reapers.add(task)
+        task.add_done_callback(self._reapers.discard)
+
+    def restart(self, pool: ProcessPoolExecutor) -> None:
+        """Terminate `pool` if it is still the current one; the next job starts a fresh pool"""
+        if self._pool is pool:
+            self._pool = None
+            terminate_pool(pool)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,249 @@
+"""
+Provider router - health-aware ordering and fallback across AI providers
+Tracks rolling success rate and latency per provider, puts failing providers
+into a cooldown and derives per-attempt timeouts from observed latency.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import time
+
+from app.core.config import settings
+
+
+ProviderCall = Callable[[], Awaitable[Any]]
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ProviderStats:
+    """Rolling health window for a single provider"""
+
+    def __init__(self, window: int):
+        self.results = deque(maxlen=window)     # True/False per attempt
+        self.latencies = deque(maxlen=window)   # seconds, successful attempts only
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        # Providers without history are assumed healthy
+        if not self.results:
+            return 1.0
+        return sum(self.results) / len(self.results)
+
+    def p50(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 50)
+
+    def p95(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 95)
+
+    def in_cooldown(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+
+class ProviderRouter:
+    """Orders provider attempts by live health and runs them with fallback"""
+
+    def __init__(
+        self,
+        window: int = 50,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        min_timeout: float = 15.0,
+        max_timeout: float = 120.0,
+        timeout_multiplier: float = 3.0
+    ):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self._stats: Dict[str, ProviderStats] = {}
+
+    def stats(self, name: str) -> ProviderStats:
+        if name not in self._stats:
+            self._stats[name] = ProviderStats(self.window)
+        return self._stats[name]
+
+    def record_success(self, name: str, latency: float) -> None:
+        stats = self.stats(name)
+        stats.results.append(True)
+        stats.latencies.append(latency)
+        stats.consecutive_failures = 0
+        stats.cooldown_until = 0.0
+
+    def record_failure(self, name: str) -> None:
+        stats = self.stats(name)
+        stats.results.append(False)
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.failure_threshold:
+            stats.cooldown_until = time.monotonic() + self.cooldown_seconds
+            print(f"[Router] {name} cooling down for {self.cooldown_seconds:.0f}s after {stats.consecutive_failures} failures")
+
+    def timeout_for(self, name: str) -> float:
+        """Per-attempt timeout: a multiple of observed p95, clamped to [min, max]"""
+        stats = self.stats(name)
+        p95 = stats.p95()
+        if p95 is None or len(stats.latencies) < 5:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p95 * self.timeout_multiplier))
+
+    def order(self, names: List[str]) -> List[str]:
+        """
+        Order providers by health, keeping the caller's preference as tie-break.
+        Providers in cooldown are moved to the end as a last resort.
+        """
+        now = time.monotonic()
+
+        def sort_key(item: Tuple[int, str]):
+            index, name = item
+            stats = self.stats(name)
+            p50 = stats.p50()
+            return (
+                stats.in_cooldown(now),
+                -round(stats.success_rate, 1),
+                index,
+                p50 if p50 is not None else 0.0
+            )
+
+        return [name for _, name in sorted(enumerate(names), key=sort_key)]
+
+    def hedge_delay(self, name: str, percentile: float, default: float) -> float:
+        """How long to wait on `name` before racing a hedge against it"""
+        stats = self.stats(name)
+        if len(stats.latencies) < 5:
+            return default
+        return _percentile(list(stats.latencies), percentile)
+
+    async def _attempt(self, name: str, call: ProviderCall, label: str) -> Any:
+        """Run one provider call with its adaptive timeout and record the outcome"""
+        timeout = self.timeout_for(name)
+        started = time.monotonic()
+        print(f"[{label}] Trying {name} (timeout {timeout:.0f}s)")
+        try:
+            result = await asyncio.wait_for(call(), timeout=timeout)
+            if not result:
+                raise Exception(f"Empty response from {name}")
+        except asyncio.CancelledError:
+            # Lost a hedge race - not the provider's fault
+            raise
+        except Exception as e:
+            self.record_failure(name)
+            print(f"[{label}] {name} failed: {e!r}")
+            raise
+        self.record_success(name, time.monotonic() - started)
+        return result
+
+    async def run(self, candidates: List[Tuple[str, ProviderCall]], label: str = "Router") -> Any:
+        """
+        Try candidates in health order until one succeeds.
+        Each candidate is a (provider name, zero-arg coroutine factory) pair.
+        Raises the last error if every candidate fails.
+        """
+        calls = dict(candidates)
+        last_error: Optional[Exception] = None
+
+        for name in self.order([name for name, _ in candidates]):
+            try:
+                return await self._attempt(name, calls[name], label)
+            except Exception as e:
+                last_error = e
+
+        raise last_error or Exception("No providers available")
+
+    async def run_hedged(
+        self,
+        candidates: List[Tuple[str, ProviderCall]],
+        percentile: float = 95,
+        default_delay: float = 8.0,
+        min_delay: float = 1.0,
+        max_hedges: int = 1,
+        label: str = "Router"
+    ) -> Any:
+        """
+        Like run(), but if the in-flight provider hasn't answered within its
+        `percentile` latency, race the next candidate against it.
+        The first valid answer wins and the others are cancelled.
+        At most `max_hedges` extra calls are made on top of plain fallbacks.
+        """
+        calls = dict(candidates)
+        queue = self.order([name for name, _ in candidates])
+        pending: Dict[asyncio.Task, str] = {}
+        hedges_used = 0
+        last_error: Optional[Exception] = None
+
+        def launch() -> None:
+            name = queue.pop(0)
+            task = asyncio.ensure_future(self._attempt(name, calls[name], label))
+            pending[task] = name
+
+        launch()
+        try:
+            while pending:
+                delay = None
+                if queue and hedges_used < max_hedges:
+                    delay = max(min_delay, min(
+                        self.hedge_delay(name, percentile, default_delay) for name in pending.values()
+                    ))
+
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges_used += 1
+                    print(f"[{label}] No answer after {delay:.1f}s, hedging with {queue[0]}")
+                    launch()
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if pending:
+                        print(f"[{label}] {name} won the hedge race")
+                    return result
+
+                # Everything in flight failed - fall back to the next candidate
+                if not pending and queue:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or Exception("No providers available")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current health per provider (for diagnostics)"""
+        now = time.monotonic()
+        return {
+            name: {
+                "success_rate": round(stats.success_rate, 3),
+                "samples": len(stats.results),
+                "p50_latency": stats.p50(),
+                "p95_latency": stats.p95(),
+                "consecutive_failures": stats.consecutive_failures,
+                "cooldown_remaining": max(0.0, round(stats.cooldown_until - now, 1)),
+                "timeout": self.timeout_for(name)
+            }
+            for name, stats in self._stats.items()
+        }
+
+
+provider_router = ProviderRouter(
+    window=settings.PROVIDER_HEALTH_WINDOW,
+    failure_threshold=settings.PROVIDER_FAILURE_THRESHOLD,
+    cooldown_seconds=settings.PROVIDER_COOLDOWN_SECONDS,
+    min_timeout=settings.PROVIDER_MIN_TIMEOUT,
+    max_timeout=settings.PROVIDER_MAX_TIMEOUT,
+    timeout_multiplier=settings.PROVIDER_TIMEOUT_P95_MULTIPLIER
+)
@@ -0,0 +1,194 @@
+"""
+Token-bucket rate limiting per provider and model
+Requests queue for a token before they leave the process; 429s, Retry-After
+and x-ratelimit-* headers slow the bucket down, successes speed it back up.
+"""
+from typing import Dict, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio
+import json
+import re
+import time
+import httpx
+
+from app.core.config import settings
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would have to queue longer than allowed"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI-style reset durations like '1s', '20ms', '6m0s' into seconds"""
+    if not value:
+        return None
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    if matched:
+        return total
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """FIFO token bucket with AIMD rate adjustment"""
+
+    def __init__(self, name: str, requests_per_minute: float, burst: float):
+        self.name = name
+        self.base_rate = requests_per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, max_wait: float) -> None:
+        """Wait for a token; raise RateLimitExceeded instead of waiting past `max_wait`"""
+        if self.base_rate <= 0:
+            return  # 0 rpm means unlimited
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(0.0, self.paused_until - now)
+                if wait == 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if wait == 0:
+                    wait = (1 - self.tokens) / self.rate
+                if waited + wait > max_wait:
+                    raise RateLimitExceeded(f"Rate limit queue for {self.name} exceeds {max_wait:.0f}s")
+                await asyncio.sleep(wait)
+                waited += wait
+
+    def on_response(self, status_code: int, headers: httpx.Headers) -> None:
+        """Adjust pacing from an upstream response"""
+        now = time.monotonic()
+
+        if status_code == 429:
+            pause = parse_retry_after(headers.get("retry-after"))
+            if pause is None:
+                pause = settings.RATE_LIMIT_DEFAULT_BACKOFF
+            self.paused_until = max(self.paused_until, now + pause)
+            self.tokens = 0.0
+            self.rate = max(self.base_rate * 0.1, self.rate * 0.5)
+            print(f"[RateLimit] {self.name} got 429, pausing {pause:.1f}s, rate now {self.rate * 60:.1f}/min")
+            return
+
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.strip() == "0":
+            reset = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.paused_until = max(self.paused_until, now + reset)
+
+        if status_code < 400 and self.rate < self.base_rate:
+            # Additive recovery towards the configured rate
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+
+class RateLimiterRegistry:
+    """Process-wide buckets keyed by (provider, model)"""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._hosts = {
+            "api.openai.com": "openai",
+            "generativelanguage.googleapis.com": "gemini",
+            "api.hume.ai": "hume",
+            "api.minimax.io": "minimax",
+            httpx.URL(settings.MINIMAX_API_BASE_URL).host: "minimax",
+            httpx.URL(settings.MANUS_API_BASE_URL).host: "manus",
+        }
+        if settings.MINIMAX_CHAT_URL:
+            self._hosts[httpx.URL(settings.MINIMAX_CHAT_URL).host] = "minimax"
+
+    def provider_for(self, host: str) -> str:
+        return self._hosts.get(host, host)
+
+    def get(self, provider: str, model: str = "") -> TokenBucket:
+        key = (provider, model)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limits = settings.RATE_LIMIT_RPM
+            rpm = limits.get(f"{provider}:{model}", limits.get(provider, settings.RATE_LIMIT_DEFAULT_RPM))
+            burst = rpm / 60.0 * settings.RATE_LIMIT_BURST_SECONDS
+            name = f"{provider}:{model}" if model else provider
+            bucket = TokenBucket(name, rpm, burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        now = time.monotonic()
+        return {
+            bucket.name: {
+                "configured_rpm": round(bucket.base_rate * 60, 2),
+                "current_rpm": round(bucket.rate * 60, 2),
+                "tokens": round(bucket.tokens, 2),
+                "paused_for": round(max(0.0, bucket.paused_until - now), 1)
+            }
+            for bucket in self._buckets.values()
+        }
+
+
+rate_limiters = RateLimiterRegistry()
+
+
+def _model_for(request: httpx.Request) -> str:
+    """Best-effort model name from a provider request (URL path or JSON body)"""
+    path = request.url.path
+    if "/models/" in path:
+        # Gemini: /v1beta/models/{model}:generateContent
+        return path.split("/models/", 1)[1].split(":", 1)[0]
+    if "json" in request.headers.get("content-type", ""):
+        try:
+            body = json.loads(request.content)
+            return str(body.get("model", "")) if isinstance(body, dict) else ""
+        except (httpx.RequestNotRead, ValueError):
+            return ""
+    return ""
+
+
+class RateLimitTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper that paces requests through the provider buckets"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        provider = rate_limiters.provider_for(request.url.host)
+        bucket = rate_limiters.get(provider, _model_for(request))
+        await bucket.acquire(settings.RATE_LIMIT_MAX_QUEUE_SECONDS)
+        response = await self._transport.handle_async_request(request)
+        bucket.on_response(response.status_code, response.headers)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
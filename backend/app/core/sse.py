@@ -0,0 +1,51 @@
+"""
+Server-Sent Events (and NDJSON) helpers for streaming endpoints
+"""
+from typing import Any, AsyncGenerator, Dict
+import json
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one named SSE event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncGenerator[Dict[str, Any], None]) -> StreamingResponse:
+    """
+    Wrap an async generator of {"event", "data"} dicts as a text/event-stream response.
+    Exceptions become a final "error" event instead of a broken connection.
+    """
+    async def generate():
+        try:
+            async for item in events:
+                yield sse_event(item["event"], item["data"])
+        except Exception as e:
+            print(f"[SSE] Stream error: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+def ndjson_response(events: AsyncGenerator[Dict[str, Any], None]) -> StreamingResponse:
+    """Same contract as sse_response, framed as one {"event", "data"} JSON object per line"""
+    async def generate():
+        try:
+            async for item in events:
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"[NDJSON] Stream error: {e}")
+            yield json.dumps({"event": "error", "data": {"error": str(e)}}) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
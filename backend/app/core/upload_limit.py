@@ -0,0 +1,54 @@
+"""
+Upload size limiting middleware
+Rejects oversized upload requests from Content-Length before the body is read,
+and aborts bodies without a (truthful) Content-Length as soon as they cross the limit.
+"""
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+# Allowance for multipart boundaries and part headers on top of the file bytes
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def upload_limit_for(path: str) -> int:
+    """Max request body size for an upload endpoint"""
+    files = settings.UPLOAD_MAX_BATCH_FILES if path.rstrip("/").endswith("/images") else 1
+    return settings.MAX_UPLOAD_SIZE * files + MULTIPART_OVERHEAD * files
+
+
+class UploadSizeLimitMiddleware:
+    """Pure ASGI middleware so the limit applies while the body is still streaming in"""
+
+    def __init__(self, app, path_prefix: str = "/api/upload"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        limit = upload_limit_for(scope["path"])
+        detail = f"File too large. Max size: {settings.MAX_UPLOAD_SIZE // 1024 // 1024}MB"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised from inside body parsing - FastAPI re-raises HTTPExceptions as-is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
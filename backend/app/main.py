@@ -2,19 +2,41 @@
 AI Study Assistant - FastAPI Backend
 Clean main entry point
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
 from app.core.config import settings
-from app.routers import chat, upload, health, video, explanation, reasoning, gambling, flashcard, slideshow
+from app.core.cache import llm_cache
+from app.core.http_client import http_clients
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.services.diagram_service import diagram_service
+from app.services.pdf_service import pdf_service
+from app.routers import chat, upload, health, video, explanation, reasoning, gambling, flashcard, slideshow, admin, media, latex
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks - close pooled provider clients and workers on exit"""
+    yield
+    await http_clients.aclose()
+    llm_cache.close()
+    pdf_service.shutdown()
+    diagram_service.shutdown()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="AI-powered study assistant API with Manus AI chat and MiniMax video generation"
+    description="AI-powered study assistant API with Manus AI chat and MiniMax video generation",
+    lifespan=lifespan
 )
 
+# Reject oversized uploads before their bodies are buffered
+# (added first so CORS, the outermost middleware, also covers its 413s)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS middleware - allow all origins for Vercel deployment
 app.add_middleware(
     CORSMiddleware,
@@ -34,3 +56,6 @@ app.include_router(reasoning.router, prefix="/api", tags=["Reasoning"])
 app.include_router(gambling.router, prefix="/api", tags=["Gambling"])
 app.include_router(flashcard.router, prefix="/api", tags=["Flashcards"])
 app.include_router(slideshow.router, prefix="/api", tags=["Slideshow"])
+app.include_router(admin.router, prefix="/api", tags=["Admin"])
+app.include_router(media.router, prefix="/api", tags=["Media"])
+app.include_router(latex.router, prefix="/api", tags=["LaTeX"])
@@ -15,10 +15,11 @@ class Message(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
-    images: Optional[List[str]] = None  # Base64 encoded images
+    images: Optional[List[str]] = None  # Base64 data URLs or "blob:<id>" upload handles
     history: Optional[List[Message]] = None
     model: Optional[str] = "openai"  # "openai" or "manus"
     reasoning_mode: Optional[bool] = False  # Enable step-by-step reasoning
+    hedge: Optional[bool] = None  # Race a backup provider on slow responses (None = server default)
 
 
 class ChatResponse(BaseModel):
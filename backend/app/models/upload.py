@@ -8,6 +8,7 @@ from typing import Optional
 class UploadResponse(BaseModel):
     success: bool
     filename: Optional[str] = None
-    data: Optional[str] = None  # Base64 encoded data
+    data: Optional[str] = None  # Extracted text (PDF uploads)
     mime_type: Optional[str] = None
+    handle: Optional[str] = None  # "blob:<id>" - send this instead of `data` in later requests
     error: Optional[str] = None
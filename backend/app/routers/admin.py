@@ -0,0 +1,57 @@
+"""
+Admin router - runtime diagnostics for upstream providers
+Disabled unless ADMIN_TOKEN is set; every request must carry it in X-Admin-Token.
+"""
+from typing import Optional
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.core.audio_cache import audio_cache
+from app.core.blob_store import blob_store
+from app.core.cache import llm_cache
+from app.core.circuit_breaker import circuit_breakers
+from app.core.config import settings
+from app.core.provider_router import provider_router
+from app.core.rate_limiter import rate_limiters
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """Reject requests without the configured admin token (404 when the admin API is disabled)"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/circuit-breakers")
+async def get_circuit_breakers():
+    """Current state of every upstream endpoint breaker"""
+    return {"breakers": circuit_breakers.snapshot()}
+
+
+@router.post("/circuit-breakers/reset")
+async def reset_circuit_breakers(name: Optional[str] = None):
+    """Force breakers back to closed (all, or a single endpoint by name)"""
+    circuit_breakers.reset(name)
+    return {"success": True, "breakers": circuit_breakers.snapshot()}
+
+
+@router.get("/providers")
+async def get_provider_health():
+    """Rolling health and latency stats used by the provider router"""
+    return {"providers": provider_router.snapshot()}
+
+
+@router.get("/rate-limits")
+async def get_rate_limits():
+    """Token-bucket state per provider/model"""
+    return {"buckets": rate_limiters.snapshot()}
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Hit/miss counters for the LLM response, TTS audio and upload caches"""
+    return {"llm": llm_cache.snapshot(), "audio": audio_cache.snapshot(), "uploads": blob_store.snapshot()}
@@ -5,12 +5,22 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from typing import List, Optional
 
+from app.core.blob_store import resolve_images
 from app.models.chat import ChatRequest, ChatResponse, Message
 from app.services.ai_service import ai_service
 
 router = APIRouter()
 
 
+async def _resolve_uploads(request: ChatRequest) -> None:
+    """
+    Replace upload handles in the request's images with image data.
+    History images aren't sent upstream (only their text is), so their
+    handles are left as they are - evicted ones must not fail the request.
+    """
+    request.images = await resolve_images(request.images)
+
+
 @router.post("/message", response_model=ChatResponse)
 async def send_message(request: ChatRequest):
     """
@@ -19,6 +29,7 @@ async def send_message(request: ChatRequest):
     Model can be specified: "openai" or "manus"
     reasoning_mode: enables step-by-step explanations with visualizations
     """
+    await _resolve_uploads(request)
     try:
         model = request.model or "langchain"
         reasoning_mode = request.reasoning_mode or False
@@ -37,7 +48,8 @@ async def send_message(request: ChatRequest):
             images=images if images else None,
             conversation_history=request.history,
             model=model,
-            reasoning_mode=reasoning_mode
+            reasoning_mode=reasoning_mode,
+            hedge=request.hedge
         )
         
         print(f"[API Response] Generated response from {model}: {response[:100]}...")
@@ -56,6 +68,7 @@ async def stream_message(request: ChatRequest):
     Stream AI response for real-time feedback using Manus AI
     Returns a Server-Sent Events stream
     """
+    await _resolve_uploads(request)
     async def generate():
         try:
             async for chunk in ai_service.stream_response(
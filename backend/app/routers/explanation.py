@@ -5,6 +5,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
+from app.core.blob_store import resolve_image
+from app.core.sse import sse_response
 from app.services.explanation_service import explanation_service
 
 router = APIRouter(prefix="/explain", tags=["explanation"])
@@ -12,9 +14,11 @@ router = APIRouter(prefix="/explain", tags=["explanation"])
 
 class ExplanationRequest(BaseModel):
     problem: str
-    image: Optional[str] = None  # Base64 image of the problem
+    image: Optional[str] = None  # Base64 image of the problem or an upload handle
     notation_context: Optional[str] = None  # Notation used in the problem
     generate_images: bool = True  # Whether to generate step images
+    lazy_images: bool = False  # Return image tickets now, generate images on request
+    render_math: bool = False  # Attach pre-rendered math_content / final_answer images
 
 
 class StepResponse(BaseModel):
@@ -25,6 +29,8 @@ class StepResponse(BaseModel):
     visual_description: str
     key_insight: str
     generated_image: Optional[str] = None
+    image_ticket: Optional[str] = None  # GET /explain/step-image/{ticket} (lazy_images mode)
+    math_image: Optional[str] = None  # render_math mode
 
 
 class ExplanationResponse(BaseModel):
@@ -33,6 +39,7 @@ class ExplanationResponse(BaseModel):
     steps: List[StepResponse]
     final_answer: str
     red_thread: str
+    final_answer_image: Optional[str] = None  # render_math mode
 
 
 @router.post("/solve", response_model=ExplanationResponse)
@@ -41,13 +48,20 @@ async def solve_with_explanation(request: ExplanationRequest):
     Solve a problem with detailed step-by-step explanations.
     Each step includes an explanation, math content, and optionally a generated image.
     """
+    request.image = await resolve_image(request.image)
     try:
         print(f"[Explanation] Received problem: {request.problem[:100]}...")
+        if not request.generate_images:
+            image_mode = "none"
+        else:
+            image_mode = "lazy" if request.lazy_images else "eager"
         
         result = await explanation_service.generate_step_explanation(
             problem_description=request.problem,
             problem_image=request.image,
-            notation_context=request.notation_context
+            notation_context=request.notation_context,
+            image_mode=image_mode,
+            render_math=request.render_math
         )
         
         # Ensure all required fields exist
@@ -60,7 +74,9 @@ async def solve_with_explanation(request: ExplanationRequest):
                 math_content=step_data.get("math_content", ""),
                 visual_description=step_data.get("visual_description", ""),
                 key_insight=step_data.get("key_insight", ""),
-                generated_image=step_data.get("generated_image")
+                generated_image=step_data.get("generated_image"),
+                image_ticket=step_data.get("image_ticket"),
+                math_image=step_data.get("math_image")
             ))
         
         return ExplanationResponse(
@@ -68,7 +84,8 @@ async def solve_with_explanation(request: ExplanationRequest):
             notation_used=result.get("notation_used", []),
             steps=steps,
             final_answer=result.get("final_answer", ""),
-            red_thread=result.get("red_thread", "")
+            red_thread=result.get("red_thread", ""),
+            final_answer_image=result.get("final_answer_image")
         )
         
     except Exception as e:
@@ -76,11 +93,25 @@ async def solve_with_explanation(request: ExplanationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/step-image/{ticket}")
+async def get_step_image(ticket: str):
+    """
+    Resolve a step image ticket from /solve with lazy_images.
+    The image is generated on the first request and cached; {"ready": false}
+    means it is still being generated - poll again.
+    """
+    try:
+        return await explanation_service.get_step_image(ticket)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired image ticket")
+
+
 @router.post("/quick-solve")
 async def quick_solve(request: ExplanationRequest):
     """
     Quick solve without image generation - faster response.
     """
+    request.image = await resolve_image(request.image)
     try:
         result = await explanation_service._get_structured_solution(
             problem=request.problem,
@@ -90,3 +121,17 @@ async def quick_solve(request: ExplanationRequest):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/quick-solve/stream")
+async def stream_quick_solve(request: ExplanationRequest):
+    """
+    Streaming variant of /quick-solve (Server-Sent Events).
+    Emits a "step" event as each step is complete, then "done" with the full solution.
+    """
+    request.image = await resolve_image(request.image)
+    return sse_response(explanation_service.stream_structured_solution(
+        problem=request.problem,
+        image=request.image,
+        notation=request.notation_context
+    ))
@@ -5,6 +5,8 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.core.blob_store import resolve_image
+from app.core.sse import sse_response
 from app.services.flashcard_service import flashcard_service
 
 router = APIRouter(prefix="/flashcards", tags=["flashcards"])
@@ -22,6 +24,7 @@ async def generate_flashcards(request: FlashcardGenerateRequest):
     """
     Generate study flashcards from a topic or problem.
     """
+    request.image = await resolve_image(request.image)
     try:
         result = await flashcard_service.generate_flashcards(
             topic=request.topic,
@@ -32,3 +35,18 @@ async def generate_flashcards(request: FlashcardGenerateRequest):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def stream_flashcards(request: FlashcardGenerateRequest):
+    """
+    Streaming variant of /generate (Server-Sent Events).
+    Emits a "card" event as each flashcard is complete, then "done" with the full set.
+    """
+    request.image = await resolve_image(request.image)
+    return sse_response(flashcard_service.stream_flashcards(
+        topic=request.topic,
+        context=request.context,
+        image=request.image,
+        num_cards=request.num_cards
+    ))
@@ -5,6 +5,8 @@ from typing import Optional, List, Dict
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.core.blob_store import resolve_image
+from app.core.sse import sse_response
 from app.services.gambling_service import gambling_service
 
 router = APIRouter(prefix="/gambling", tags=["gambling"])
@@ -22,6 +24,7 @@ async def analyze_gambling_scenario(request: GamblingAnalysisRequest):
     Analyze a gambling scenario with Lucky Larry's enthusiastic but mathematically honest advice.
     Educational satire showing why gambling is problematic.
     """
+    request.image = await resolve_image(request.image)
     try:
         result = await gambling_service.analyze_gambling_scenario(
             scenario=request.scenario,
@@ -31,3 +34,17 @@ async def analyze_gambling_scenario(request: GamblingAnalysisRequest):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/stream")
+async def stream_gambling_scenario(request: GamblingAnalysisRequest):
+    """
+    Streaming variant of /analyze (Server-Sent Events).
+    Emits a "scenario" event as each outcome is complete, then "done" with the full analysis.
+    """
+    request.image = await resolve_image(request.image)
+    return sse_response(gambling_service.stream_gambling_scenario(
+        scenario=request.scenario,
+        image=request.image,
+        conversation_history=request.conversation_history
+    ))
@@ -0,0 +1,61 @@
+"""
+LaTeX router - pre-rendered math as cached SVG/PNG media
+"""
+from typing import List, Optional
+import re
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import RedirectResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.latex_service import latex_service
+
+router = APIRouter(prefix="/latex", tags=["latex"])
+
+_COLOR = re.compile(r"^(#[0-9a-fA-F]{6}|[a-z]{3,20})$")
+
+
+class LatexRenderRequest(BaseModel):
+    expressions: List[str]
+    format: str = "svg"  # "svg" or "png"
+    color: Optional[str] = None  # "#rrggbb" or a color name, default black
+    size: Optional[int] = None  # font size in points
+
+
+def _check_style(fmt: str, color: Optional[str], size: Optional[int]) -> None:
+    if fmt not in latex_service.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {', '.join(latex_service.FORMATS)}")
+    if color is not None and not _COLOR.match(color):
+        raise HTTPException(status_code=400, detail="Color must be #rrggbb or a color name")
+    if size is not None and not 6 <= size <= 96:
+        raise HTTPException(status_code=400, detail="Size must be between 6 and 96")
+
+
+@router.post("/render")
+async def render_latex(request: LatexRenderRequest):
+    """
+    Typeset expressions (pure LaTeX or text with $..$ math).
+    Returns a media URL per expression, or null where the client has to render it itself.
+    """
+    _check_style(request.format, request.color, request.size)
+    if len(request.expressions) > settings.LATEX_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {settings.LATEX_MAX_BATCH} expressions per request")
+    urls = await latex_service.render_many(request.expressions, request.format, request.color, request.size)
+    return {
+        "images": [{"expression": expression, "url": url} for expression, url in zip(request.expressions, urls)]
+    }
+
+
+@router.get("/render")
+async def render_latex_image(
+    tex: str,
+    format: str = "svg",
+    color: Optional[str] = None,
+    size: Optional[int] = None
+):
+    """Redirect to the typeset expression, so it can be used directly as an <img> src"""
+    _check_style(format, color, size)
+    url = await latex_service.render(tex, format, color, size)
+    if url is None:
+        raise HTTPException(status_code=422, detail="Could not typeset expression")
+    return RedirectResponse(url, status_code=302)
@@ -0,0 +1,110 @@
+"""
+Media router - serves generated audio/images by id with Range, ETag and caching
+"""
+from typing import AsyncGenerator, Optional, Tuple
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.config import settings
+from app.core.media_store import media_store
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into an inclusive (start, end).
+    Returns None for headers we serve in full (multiple ranges, other units,
+    malformed ranges - RFC 9110 says to ignore those); raises ValueError for
+    well-formed ranges that can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_str, dash, end_str = spec.strip().partition("-")
+    start_str, end_str = start_str.strip(), end_str.strip()
+    if not dash or not (start_str or end_str) or not all(p.isdigit() for p in (start_str, end_str) if p):
+        return None
+    if not start_str:
+        # Suffix range: the last N bytes
+        length = int(end_str)
+        if length <= 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start_str)
+    end = int(end_str) if end_str else size - 1
+    if end_str and end < start:
+        return None  # invalid range-spec (last-pos before first-pos)
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def _iter_file(path: str, start: int, length: int) -> AsyncGenerator[bytes, None]:
+    """Read `length` bytes from `start` in chunks without blocking the loop"""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+@router.get("/{media_id}")
+async def get_media(media_id: str, request: Request):
+    """Serve a stored blob; supports conditional and partial (Range) requests"""
+    resolved = await media_store.resolve(media_id)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    path, content_type = resolved
+
+    try:
+        stat = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    size = stat.st_size
+    # Ids are content addresses; mtime is no validator (the LRU cache touches it on every lookup)
+    etag = f'"{media_id.split(".", 1)[0][:32]}-{size:x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.MEDIA_MAX_AGE_SECONDS}",
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_file(path, 0, size), media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=206,
+        media_type=content_type,
+        headers=headers
+    )
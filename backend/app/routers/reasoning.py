@@ -5,6 +5,8 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.core.blob_store import resolve_image
+from app.core.sse import sse_response
 from app.services.reasoning_service import reasoning_service
 
 router = APIRouter(prefix="/reasoning", tags=["reasoning"])
@@ -13,6 +15,7 @@ router = APIRouter(prefix="/reasoning", tags=["reasoning"])
 class AnalyzeRequest(BaseModel):
     problem: str
     image: Optional[str] = None
+    render_math: bool = False  # Attach pre-rendered math / final_answer images
 
 
 class StepImageRequest(BaseModel):
@@ -29,16 +32,31 @@ async def analyze_problem(request: AnalyzeRequest):
     Analyze a problem and return structured steps.
     This creates the plan that can then be revealed step by step.
     """
+    request.image = await resolve_image(request.image)
     try:
         result = await reasoning_service.analyze_problem(
             problem=request.problem,
-            image=request.image
+            image=request.image,
+            render_math=request.render_math
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analyze/stream")
+async def stream_analysis(request: AnalyzeRequest):
+    """
+    Streaming variant of /analyze (Server-Sent Events).
+    Emits a "step" event as each step is complete, then "done" with the full plan.
+    """
+    request.image = await resolve_image(request.image)
+    return sse_response(reasoning_service.stream_analysis(
+        problem=request.problem,
+        image=request.image
+    ))
+
+
 @router.post("/generate-image")
 async def generate_step_image(request: StepImageRequest):
     """Generate an image for a step"""
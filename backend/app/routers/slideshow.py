@@ -5,6 +5,8 @@ from typing import Optional, Dict, Any
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.core.blob_store import resolve_image
+from app.core.sse import sse_response
 from app.services.slideshow_service import slideshow_service
 
 router = APIRouter(prefix="/slideshow", tags=["slideshow"])
@@ -14,6 +16,7 @@ class SlideshowGenerateRequest(BaseModel):
     problem: str
     image: Optional[str] = None
     reasoning_analysis: Optional[Dict[str, Any]] = None
+    render_math: bool = False  # attach pre-rendered line_images (media URLs) to each slide
 
 
 class RenderRequest(BaseModel):
@@ -27,17 +30,35 @@ async def generate_slideshow(request: SlideshowGenerateRequest):
     Generate an educational slideshow from a problem.
     Returns slide data with audio narrations.
     """
+    request.image = await resolve_image(request.image)
     try:
         result = await slideshow_service.generate_slideshow(
             problem=request.problem,
             reasoning_analysis=request.reasoning_analysis,
-            image=request.image
+            image=request.image,
+            render_math=request.render_math
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate/stream")
+async def stream_slideshow(request: SlideshowGenerateRequest):
+    """
+    Stream slideshow generation as Server-Sent Events.
+    Events: "lesson" (metadata), "slide" (one per board, as soon as its audio is ready,
+    with its index), "progress", then "done" or "error".
+    """
+    request.image = await resolve_image(request.image)
+    return sse_response(slideshow_service.stream_slideshow(
+        problem=request.problem,
+        reasoning_analysis=request.reasoning_analysis,
+        image=request.image,
+        render_math=request.render_math
+    ))
+
+
 @router.post("/render")
 async def render_slideshow(request: RenderRequest):
     """
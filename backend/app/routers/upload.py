@@ -2,39 +2,75 @@
 Upload router - handles file uploads
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
-import base64
-import io
+from typing import List, Optional, Tuple
+import asyncio
+import hashlib
 
+from app.core.blob_store import blob_store
 from app.core.config import settings
+from app.core.sse import ndjson_response, sse_response
 from app.models.upload import UploadResponse
-from app.services.image_service import ImageService
+from app.services.image_service import image_service
+from app.services.pdf_service import parse_page_ranges, pdf_service
 
 router = APIRouter()
-image_service = ImageService()
 
 
-def extract_pdf_text(content: bytes) -> str:
-    """Extract text from PDF file"""
+async def extract_pdf_text(content: bytes, content_hash: Optional[str] = None) -> str:
+    """Extract text from PDF file (in the PDF worker pool)"""
     try:
-        from PyPDF2 import PdfReader
-        pdf_file = io.BytesIO(content)
-        reader = PdfReader(pdf_file)
-        text_parts = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
-        return "\n\n".join(text_parts)
+        pages = await pdf_service.extract_pages(content, content_hash)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"PDF took longer than {settings.PDF_EXTRACT_TIMEOUT:.0f}s to read. Try a smaller file."
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to read PDF: {str(e)}")
+    return "\n\n".join(text for text in pages if text)
+
+
+async def read_upload(file: UploadFile) -> Tuple[bytes, str]:
+    """
+    Read an upload in chunks, hashing as it streams in.
+    Stops as soon as MAX_UPLOAD_SIZE is crossed; returns (content, sha256 hex).
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE // 1024 // 1024}MB"
+    )
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise too_large
+    
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(settings.UPLOAD_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > settings.MAX_UPLOAD_SIZE:
+            raise too_large
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+async def _read_pdf(file: UploadFile) -> Tuple[bytes, str]:
+    """Validate a PDF upload and return (bytes, sha256 hex)"""
+    ext = file.filename.split(".")[-1].lower() if file.filename else ""
+    if ext != "pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    return await read_upload(file)
 
 
 @router.post("/image", response_model=UploadResponse)
 async def upload_image(file: UploadFile = File(...)):
     """
     Upload a single image
-    Returns base64 encoded image for chat context
+    Returns a handle to send instead of the image data in later requests
+    (clients preview the file locally)
     """
     # Validate file extension
     ext = file.filename.split(".")[-1].lower() if file.filename else ""
@@ -44,22 +80,19 @@ async def upload_image(file: UploadFile = File(...)):
             detail=f"File type not allowed. Allowed: {settings.ALLOWED_EXTENSIONS}"
         )
     
-    # Read and encode file
-    content = await file.read()
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE // 1024 // 1024}MB"
-        )
+    # Read and store file
+    original, digest = await read_upload(file)
     
-    base64_image = base64.b64encode(content).decode("utf-8")
     mime_type = file.content_type or f"image/{ext}"
+    content, mime_type = await image_service.prepare_upload(original, mime_type)
+    # Reuse the streaming hash as the blob id unless resizing changed the bytes
+    handle = await blob_store.put(content, mime_type, blob_id=digest[:32] if content is original else None)
     
     return UploadResponse(
         success=True,
         filename=file.filename,
-        data=f"data:{mime_type};base64,{base64_image}",
-        mime_type=mime_type
+        mime_type=mime_type,
+        handle=handle
     )
 
 
@@ -69,19 +102,10 @@ async def upload_pdf(file: UploadFile = File(...)):
     Upload a PDF file and extract its text content
     Returns the extracted text for AI processing
     """
-    ext = file.filename.split(".")[-1].lower() if file.filename else ""
-    if ext != "pdf":
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-    
-    content = await file.read()
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE // 1024 // 1024}MB"
-        )
+    content, digest = await _read_pdf(file)
     
     # Extract text from PDF
-    pdf_text = extract_pdf_text(content)
+    pdf_text = await extract_pdf_text(content, digest)
     
     if not pdf_text.strip():
         raise HTTPException(status_code=400, detail="Could not extract text from PDF. The PDF might be image-based.")
@@ -94,20 +118,54 @@ async def upload_pdf(file: UploadFile = File(...)):
     )
 
 
+@router.post("/pdf/stream")
+async def upload_pdf_stream(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    format: str = "ndjson"
+):
+    """
+    Upload a PDF file and stream its text page by page
+    pages: 1-based page ranges to extract, e.g. "1-5,8,12-" (default: all)
+    format: "ndjson" (one JSON object per line) or "sse"
+    Emits "meta" ({pages, selected}), one "page" ({page, text}) per page, then "done"
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    try:
+        ranges = parse_page_ranges(pages)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid page ranges: {pages}")
+    
+    content, digest = await _read_pdf(file)
+    events = pdf_service.iter_pages(content, ranges, content_hash=digest)
+    return sse_response(events) if format == "sse" else ndjson_response(events)
+
+
 @router.post("/images", response_model=List[UploadResponse])
 async def upload_multiple_images(files: List[UploadFile] = File(...)):
     """
     Upload multiple images at once
+    Files are processed concurrently (up to UPLOAD_BATCH_CONCURRENCY at a time);
+    results keep the request order and a failed file only fails its own entry
     """
-    results = []
-    for file in files:
-        try:
-            result = await upload_image(file)
-            results.append(result)
-        except HTTPException as e:
-            results.append(UploadResponse(
-                success=False,
-                filename=file.filename,
-                error=e.detail
-            ))
-    return results
+    # The size middleware bounds the total bytes; many small files need their own limit
+    if len(files) > settings.UPLOAD_MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files. Max {settings.UPLOAD_MAX_BATCH_FILES} per upload"
+        )
+    semaphore = asyncio.Semaphore(max(1, settings.UPLOAD_BATCH_CONCURRENCY))
+    
+    async def process(file: UploadFile) -> UploadResponse:
+        async with semaphore:
+            try:
+                return await upload_image(file)
+            except HTTPException as e:
+                return UploadResponse(
+                    success=False,
+                    filename=file.filename,
+                    error=e.detail
+                )
+    
+    return list(await asyncio.gather(*(process(file) for file in files)))
@@ -2,16 +2,28 @@
 AI Service - Handles communication with AI providers
 """
 from typing import List, Optional, AsyncGenerator
-import httpx
 import json
 
 from app.core.config import settings
+from app.core.http_client import http_clients
+from app.core.provider_router import provider_router
 from app.models.chat import Message
+from app.services.image_service import image_service
 
 
 class AIService:
     """Service for AI-powered responses using LangChain with fallbacks"""
     
+    # Preferred provider order per requested model; the router reorders by live health
+    FALLBACK_CHAINS = {
+        "langchain": ["langchain", "gemini", "openai"],
+        "minimax": ["minimax", "manus", "gemini", "openai"],
+        "manus": ["manus", "gemini", "openai"],
+        "gemini": ["gemini", "openai"],
+        "openai": ["openai", "gemini"],
+        "default": ["gemini", "langchain", "openai"],
+    }
+    
     def __init__(self):
         self.openai_key = settings.OPENAI_API_KEY
         self.minimax_key = settings.MINIMAX_API_KEY
@@ -23,6 +35,7 @@ class AIService:
         self.manus_model = settings.MANUS_MODEL
         self.gemini_base_url = settings.GEMINI_API_BASE_URL
         self.gemini_model = settings.GEMINI_MODEL
+        self._llm_cache = {}  # (provider, model, temperature) -> LangChain chat model
     
     async def generate_response(
         self,
@@ -30,119 +43,76 @@ class AIService:
         images: Optional[List[str]] = None,
         conversation_history: Optional[List[Message]] = None,
         model: str = "langchain",
-        reasoning_mode: bool = False
+        reasoning_mode: bool = False,
+        hedge: Optional[bool] = None
     ) -> str:
         """
         Generate AI response with specified model
         Models: "langchain", "minimax", "manus", "openai", or "gemini"
         reasoning_mode: enables step-by-step explanations with visual markers
+        hedge: race a backup provider if the primary is slow (defaults to CHAT_HEDGING_ENABLED)
         """
-        # Use LangChain as primary (Gemini via LangChain, prioritized)
-        if model == "langchain" and self.gemini_key:
-            try:
-                print(f"[AI Service] Using LangChain (Gemini), reasoning_mode: {reasoning_mode}")
-                return await self._langchain_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] LangChain error: {e}")
-                # Fall back to direct Gemini API
-                try:
-                    print(f"[AI Service] Falling back to direct Gemini API")
-                    return await self._gemini_response(message, images, conversation_history, reasoning_mode)
-                except Exception as e2:
-                    print(f"[AI Service] Direct Gemini also failed: {e2}")
-                    if self.openai_key:
-                        try:
-                            print(f"[AI Service] Falling back to OpenAI")
-                            return await self._openai_response(message, images, conversation_history, reasoning_mode)
-                        except Exception as e3:
-                            print(f"[AI Service] OpenAI also failed: {e3}")
-                return self._mock_response(message)
-
-        # Use MiniMax if selected and key is available
-        if model == "minimax" and self.minimax_key:
-            try:
-                print(f"[AI Service] Using MiniMax API, reasoning_mode: {reasoning_mode}")
-                return await self._minimax_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] MiniMax API error: {e}")
-                # Fall back to Manus or direct providers
-                if self.manus_key:
-                    print(f"[AI Service] Falling back to Manus")
-                    return await self._manus_response(message, images, conversation_history, reasoning_mode)
-                if self.gemini_key:
-                    print(f"[AI Service] Falling back to Gemini")
-                    return await self._gemini_response(message, images, conversation_history, reasoning_mode)
-                if self.openai_key:
-                    print(f"[AI Service] Falling back to OpenAI")
-                    return await self._openai_response(message, images, conversation_history, reasoning_mode)
-                return self._mock_response(message)
-
-        # Use Manus AI if selected and key is available (most reliable)
-        if model == "manus" and self.manus_key:
-            try:
-                print(f"[AI Service] Using Manus AI API, reasoning_mode: {reasoning_mode}")
-                return await self._manus_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] Manus AI API error: {e}")
-                # Fall back to Gemini or OpenAI
-                if self.gemini_key:
-                    print(f"[AI Service] Falling back to Gemini")
-                    return await self._gemini_response(message, images, conversation_history, reasoning_mode)
-                elif self.openai_key:
-                    print(f"[AI Service] Falling back to OpenAI")
-                    return await self._openai_response(message, images, conversation_history, reasoning_mode)
-                return self._mock_response(message)
+        chain = self.FALLBACK_CHAINS.get(model, self.FALLBACK_CHAINS["default"])
+        providers = [name for name in chain if self._has_provider(name)]
         
-        # Use Gemini AI if selected and key is available
-        if model == "gemini" and self.gemini_key:
-            try:
-                print(f"[AI Service] Using Gemini AI API, reasoning_mode: {reasoning_mode}")
-                return await self._gemini_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] Gemini AI API error: {e}")
-                # Fall back to OpenAI if available
-                if self.openai_key:
-                    print(f"[AI Service] Falling back to OpenAI")
-                    return await self._openai_response(message, images, conversation_history, reasoning_mode)
-                return self._mock_response(message)
-        
-        # Use OpenAI if selected
-        if model == "openai" and self.openai_key:
-            try:
-                print(f"[AI Service] Using OpenAI API (gpt-4o), reasoning_mode: {reasoning_mode}")
-                return await self._openai_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] OpenAI API error: {e}")
-                # Fall back to Gemini
-                if self.gemini_key:
-                    print(f"[AI Service] Falling back to Gemini")
-                    return await self._gemini_response(message, images, conversation_history, reasoning_mode)
-                return self._mock_response(message)
+        if not providers:
+            print(f"[AI Service] No API keys available, using mock response")
+            return self._mock_response(message)
         
-        # Default fallback order: Gemini -> LangChain -> OpenAI -> Mock
-        if self.gemini_key:
-            try:
-                print(f"[AI Service] Using Gemini AI API (default)")
-                return await self._gemini_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] Gemini error: {e}")
+        print(f"[AI Service] Model: {model}, candidates: {providers}, reasoning_mode: {reasoning_mode}")
+        candidates = [
+            (name, self._provider_call(name, message, images, conversation_history, reasoning_mode))
+            for name in providers
+        ]
+        if hedge is None:
+            hedge = settings.CHAT_HEDGING_ENABLED
+        try:
+            if hedge and len(candidates) > 1:
+                return await provider_router.run_hedged(
+                    candidates,
+                    percentile=settings.CHAT_HEDGE_PERCENTILE,
+                    default_delay=settings.CHAT_HEDGE_DEFAULT_DELAY,
+                    min_delay=settings.CHAT_HEDGE_MIN_DELAY,
+                    max_hedges=settings.CHAT_HEDGE_MAX_EXTRA_CALLS,
+                    label="AI Service"
+                )
+            return await provider_router.run(candidates, label="AI Service")
+        except Exception as e:
+            print(f"[AI Service] All providers failed: {e}")
+            return self._mock_response(message)
 
-        if self.gemini_key or self.openai_key:
-            try:
-                print(f"[AI Service] Using LangChain (default fallback)")
-                return await self._langchain_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] LangChain error: {e}")
-        
-        if self.openai_key:
-            try:
-                print(f"[AI Service] Using OpenAI (default fallback)")
-                return await self._openai_response(message, images, conversation_history, reasoning_mode)
-            except Exception as e:
-                print(f"[AI Service] OpenAI error: {e}")
+    def _has_provider(self, name: str) -> bool:
+        """Whether the credentials for a provider are configured"""
+        if name == "langchain":
+            return bool(self.gemini_key or self.openai_key)
+        return bool({
+            "gemini": self.gemini_key,
+            "manus": self.manus_key,
+            "minimax": self.minimax_key and self.minimax_chat_url and self.minimax_chat_model,
+            "openai": self.openai_key,
+        }.get(name))
+
+    def _provider_call(
+        self,
+        name: str,
+        message: str,
+        images: Optional[List[str]],
+        history: Optional[List[Message]],
+        reasoning_mode: bool
+    ):
+        """Bind a provider method to the request arguments for the router"""
+        method = {
+            "gemini": self._gemini_response,
+            "langchain": self._langchain_response,
+            "manus": self._manus_response,
+            "minimax": self._minimax_response,
+            "openai": self._openai_response,
+        }[name]
         
-        print(f"[AI Service] No API keys available, using mock response")
-        return self._mock_response(message)
+        async def call():
+            prepared = await image_service.prepare_images(images, name)
+            return await method(message, prepared, history, reasoning_mode)
+        return call
 
     async def _langchain_response(
         self,
@@ -160,41 +130,87 @@ class AIService:
                 return await self._openai_response(message, images, history, reasoning_mode)
 
         try:
-            from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-            if self.gemini_key:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                llm = ChatGoogleGenerativeAI(
-                    model=self.gemini_model,
-                    google_api_key=self.gemini_key,
-                    temperature=0.7
-                )
-            elif self.openai_key:
-                from langchain_openai import ChatOpenAI
-                llm = ChatOpenAI(
-                    model="gpt-4o-mini",
-                    api_key=self.openai_key,
-                    temperature=0.7
-                )
-            else:
-                raise Exception("No LangChain-supported API key available")
+            llm = self._get_langchain_llm(temperature=0.7)
+            messages = self._build_langchain_messages(message, history, reasoning_mode)
+            result = await llm.ainvoke(messages)
+            return result.content
+        except Exception as e:
+            raise Exception(f"LangChain error: {e}")
 
-            messages = []
-            if reasoning_mode:
-                messages.append(SystemMessage(content="You are a math tutor. Explain problems STEP BY STEP with numbered steps, calculations, and insights."))
+    async def _langchain_stream(
+        self,
+        message: str,
+        images: Optional[List[str]] = None,
+        history: Optional[List[Message]] = None,
+        reasoning_mode: bool = False
+    ) -> AsyncGenerator[str, None]:
+        """Stream response using LangChain astream (text-only; images go to native providers)"""
+        if images:
+            raise Exception("LangChain stream does not handle images")
+        
+        llm = self._get_langchain_llm(temperature=0.7)
+        messages = self._build_langchain_messages(message, history, reasoning_mode)
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                yield chunk.content
 
-            if history:
-                for msg in history[-10:]:
-                    if msg.role == "user":
-                        messages.append(HumanMessage(content=msg.content))
-                    else:
-                        messages.append(AIMessage(content=msg.content))
+    def _get_langchain_llm(self, temperature: float = 0.7):
+        """
+        Get a cached LangChain chat model for the configured provider.
+        Models are built once per (provider, model, temperature) and reused.
+        """
+        if self.gemini_key:
+            key = ("gemini", self.gemini_model, temperature)
+        elif self.openai_key:
+            key = ("openai", "gpt-4o-mini", temperature)
+        else:
+            raise Exception("No LangChain-supported API key available")
+        
+        llm = self._llm_cache.get(key)
+        if llm is not None:
+            return llm
+        
+        provider, model_name, _ = key
+        if provider == "gemini":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            llm = ChatGoogleGenerativeAI(
+                model=model_name,
+                google_api_key=self.gemini_key,
+                temperature=temperature
+            )
+        else:
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(
+                model=model_name,
+                api_key=self.openai_key,
+                temperature=temperature
+            )
+        
+        self._llm_cache[key] = llm
+        return llm
 
-            messages.append(HumanMessage(content=message))
+    def _build_langchain_messages(
+        self,
+        message: str,
+        history: Optional[List[Message]] = None,
+        reasoning_mode: bool = False
+    ) -> list:
+        """Build LangChain message objects from chat history"""
+        from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+        
+        messages = []
+        if reasoning_mode:
+            messages.append(SystemMessage(content="You are a math tutor. Explain problems STEP BY STEP with numbered steps, calculations, and insights."))
 
-            result = llm.invoke(messages)
-            return result.content
-        except Exception as e:
-            raise Exception(f"LangChain error: {e}")
+        if history:
+            for msg in history[-10:]:
+                if msg.role == "user":
+                    messages.append(HumanMessage(content=msg.content))
+                else:
+                    messages.append(AIMessage(content=msg.content))
+
+        messages.append(HumanMessage(content=message))
+        return messages
 
     async def _minimax_response(
         self,
@@ -205,7 +221,7 @@ class AIService:
     ) -> str:
         """Generate response using MiniMax chat endpoint (OpenAI-compatible)."""
         if not self.minimax_chat_url or not self.minimax_chat_model:
-            return "MiniMax chat is not configured. Please set MINIMAX_CHAT_URL and MINIMAX_CHAT_MODEL."
+            raise Exception("MiniMax chat is not configured. Please set MINIMAX_CHAT_URL and MINIMAX_CHAT_MODEL.")
 
         if images:
             # MiniMax text chat may not support images; fall back to Gemini/OpenAI if available
@@ -216,27 +232,27 @@ class AIService:
 
         messages = self._build_messages(message, images=None, history=history, reasoning_mode=reasoning_mode)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                self.minimax_chat_url,
-                headers={
-                    "Authorization": f"Bearer {self.minimax_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.minimax_chat_model,
-                    "messages": messages,
-                    "temperature": 0.7
-                },
-                timeout=120.0
-            )
+        client = http_clients.get(self.minimax_chat_url)
+        response = await client.post(
+            self.minimax_chat_url,
+            headers={
+                "Authorization": f"Bearer {self.minimax_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.minimax_chat_model,
+                "messages": messages,
+                "temperature": 0.7
+            },
+            timeout=120.0
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                if "choices" in data and data["choices"]:
-                    return data["choices"][0]["message"]["content"]
-                raise Exception("No content in MiniMax response")
-            raise Exception(f"MiniMax API error: {response.status_code} - {response.text}")
+        if response.status_code == 200:
+            data = response.json()
+            if "choices" in data and data["choices"]:
+                return data["choices"][0]["message"]["content"]
+            raise Exception("No content in MiniMax response")
+        raise Exception(f"MiniMax API error: {response.status_code} - {response.text}")
     
     async def stream_response(
         self,
@@ -246,24 +262,33 @@ class AIService:
     ) -> AsyncGenerator[str, None]:
         """
         Stream AI response for real-time feedback
-        Falls back through: Gemini (non-streaming) -> Manus -> OpenAI -> mock
+        Falls back through: Gemini -> LangChain -> Manus -> OpenAI -> mock
+        A provider is only skipped if it fails before emitting its first chunk
         """
+        streams = []
         if self.gemini_key:
-            # Gemini doesn't have streaming in our implementation, so yield full response
+            streams.append(("Gemini", self._gemini_stream))
+        if self.gemini_key or self.openai_key:
+            streams.append(("LangChain", self._langchain_stream))
+        if self.manus_key:
+            streams.append(("Manus", self._manus_stream))
+        if self.openai_key:
+            streams.append(("OpenAI", self._openai_stream))
+        
+        for name, stream in streams:
+            started = False
             try:
-                result = await self._gemini_response(message, images, conversation_history)
-                yield result
+                prepared = await image_service.prepare_images(images, name.lower())
+                async for chunk in stream(message, prepared, conversation_history):
+                    started = True
+                    yield chunk
                 return
             except Exception as e:
-                print(f"[AI Service] Gemini stream fallback failed: {e}")
-        if self.manus_key:
-            async for chunk in self._manus_stream(message, images, conversation_history):
-                yield chunk
-        elif self.openai_key:
-            async for chunk in self._openai_stream(message, images, conversation_history):
-                yield chunk
-        else:
-            yield self._mock_response(message)
+                if started:
+                    raise
+                print(f"[AI Service] {name} stream failed, falling back: {e}")
+        
+        yield self._mock_response(message)
     
     async def _manus_response(
         self,
@@ -273,45 +298,30 @@ class AIService:
         reasoning_mode: bool = False
     ) -> str:
         """Generate response using Manus AI API (OpenAI SDK compatible)"""
-        try:
-            async with httpx.AsyncClient() as client:
-                messages = self._build_messages(message, images, history, reasoning_mode)
-                
-                # Manus uses OpenAI-compatible endpoint at /v1/chat/completions
-                response = await client.post(
-                    f"{self.manus_base_url}/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.manus_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.manus_model,
-                        "messages": messages,
-                        "max_tokens": 4096,
-                        "temperature": 0.7
-                    },
-                    timeout=120.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    print(f"Manus AI API error: {response.status_code} - {response.text}")
-                    # Fall back to Gemini first, then OpenAI
-                    if self.gemini_key:
-                        return await self._gemini_response(message, images, history)
-                    if self.openai_key:
-                        return await self._openai_response(message, images, history)
-                    return self._mock_response(message)
-        except Exception as e:
-            print(f"Manus AI error: {e}")
-            # Fall back to Gemini first, then OpenAI
-            if self.gemini_key:
-                return await self._gemini_response(message, images, history)
-            if self.openai_key:
-                return await self._openai_response(message, images, history)
-            return self._mock_response(message)
+        client = http_clients.get(self.manus_base_url)
+        messages = self._build_messages(message, images, history, reasoning_mode)
+        
+        # Manus uses OpenAI-compatible endpoint at /v1/chat/completions
+        response = await client.post(
+            f"{self.manus_base_url}/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.manus_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.manus_model,
+                "messages": messages,
+                "max_tokens": 4096,
+                "temperature": 0.7
+            },
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data["choices"][0]["message"]["content"]
+        # Fallback to other providers is handled by the provider router
+        raise Exception(f"Manus AI API error: {response.status_code} - {response.text}")
     
     async def _manus_stream(
         self,
@@ -320,42 +330,42 @@ class AIService:
         history: Optional[List[Message]] = None
     ) -> AsyncGenerator[str, None]:
         """Stream response using Manus AI API"""
-        async with httpx.AsyncClient() as client:
-            messages = self._build_messages(message, images, history)
+        client = http_clients.get(self.manus_base_url)
+        messages = self._build_messages(message, images, history)
+        
+        async with client.stream(
+            "POST",
+            f"{self.manus_base_url}/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.manus_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.manus_model,
+                "messages": messages,
+                "max_tokens": 4096,
+                "temperature": 0.7,
+                "stream": True
+            },
+            timeout=120.0
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(f"Manus AI API error: {response.status_code}")
             
-            async with client.stream(
-                "POST",
-                f"{self.manus_base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.manus_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.manus_model,
-                    "messages": messages,
-                    "max_tokens": 4096,
-                    "temperature": 0.7,
-                    "stream": True
-                },
-                timeout=120.0
-            ) as response:
-                if response.status_code != 200:
-                    raise Exception(f"Manus AI API error: {response.status_code}")
-                
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            if "choices" in data and len(data["choices"]) > 0:
-                                delta = data["choices"][0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    if data_str == "[DONE]":
+                        break
+                    try:
+                        data = json.loads(data_str)
+                        if "choices" in data and len(data["choices"]) > 0:
+                            delta = data["choices"][0].get("delta", {})
+                            content = delta.get("content", "")
+                            if content:
+                                yield content
+                    except json.JSONDecodeError:
+                        continue
     
     async def _gemini_response(
         self,
@@ -365,82 +375,34 @@ class AIService:
         reasoning_mode: bool = False
     ) -> str:
         """Generate response using Google Gemini API with retry logic"""
-        import asyncio
-        
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient() as client:
-                    # Build Gemini-format messages
-                    contents = []
-                    
-                    # Add history
-                    if history:
-                        for msg in history[-10:]:  # Last 10 messages for context
-                            role = "user" if msg.role == "user" else "model"
-                            contents.append({"role": role, "parts": [{"text": msg.content}]})
-                    
-                    # Add current message with images
-                    parts = []
-                    if images:
-                        for img in images:
-                            if img.startswith('data:image'):
-                                # Extract base64 data
-                                img_data = img.split(',')[1] if ',' in img else img
-                                mime_type = img.split(';')[0].split(':')[1] if 'data:' in img else 'image/jpeg'
-                                parts.append({
-                                    "inline_data": {
-                                        "mime_type": mime_type,
-                                        "data": img_data
-                                    }
-                                })
-                    
-                    parts.append({"text": message})
-                    contents.append({"role": "user", "parts": parts})
-                    
-                    # System instruction for reasoning mode
-                    system_instruction = None
-                    if reasoning_mode:
-                        system_instruction = {
-                            "parts": [{
-                                "text": "You are a math tutor. Explain problems STEP BY STEP with numbered steps, calculations, and insights."
-                            }]
-                        }
-                    
-                    # Build request body
-                    request_body = {
-                        "contents": contents,
-                        "generationConfig": {
-                            "temperature": 0.7,
-                            "maxOutputTokens": 8192
-                        }
-                    }
-                    if system_instruction:
-                        request_body["systemInstruction"] = system_instruction
-                    
-                    # Make request
-                    response = await client.post(
-                        f"{self.gemini_base_url}/models/{self.gemini_model}:generateContent?key={self.gemini_key}",
-                        headers={"Content-Type": "application/json"},
-                        json=request_body,
-                        timeout=120.0
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if "candidates" in data and len(data["candidates"]) > 0:
-                            content = data["candidates"][0]["content"]
-                            if "parts" in content and len(content["parts"]) > 0:
-                                return content["parts"][0]["text"]
-                        raise Exception("No content in Gemini response")
-                    elif response.status_code == 429:
-                        # Rate limited - wait and retry
-                        wait_time = (attempt + 1) * 5  # 5, 10, 15 seconds
-                        print(f"[Gemini] Rate limited, waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    else:
-                        raise Exception(f"Gemini API error: {response.status_code} - {response.text}")
+                client = http_clients.get(self.gemini_base_url)
+                request_body = self._build_gemini_body(message, images, history, reasoning_mode)
+                
+                # Make request
+                response = await client.post(
+                    f"{self.gemini_base_url}/models/{self.gemini_model}:generateContent?key={self.gemini_key}",
+                    headers={"Content-Type": "application/json"},
+                    json=request_body,
+                    timeout=120.0
+                )
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    if "candidates" in data and len(data["candidates"]) > 0:
+                        content = data["candidates"][0]["content"]
+                        if "parts" in content and len(content["parts"]) > 0:
+                            return content["parts"][0]["text"]
+                    raise Exception("No content in Gemini response")
+                elif response.status_code == 429:
+                    # Rate limited - the shared limiter has already paused the Gemini bucket
+                    # (honouring Retry-After), so the retry just queues behind it
+                    print(f"[Gemini] Rate limited, retry {attempt + 1}/{max_retries}")
+                    continue
+                else:
+                    raise Exception(f"Gemini API error: {response.status_code} - {response.text}")
             except Exception as e:
                 if attempt == max_retries - 1:
                     print(f"Gemini AI error after {max_retries} attempts: {e}")
@@ -449,6 +411,93 @@ class AIService:
         
         raise Exception("Gemini API failed after all retries")
     
+    def _build_gemini_body(
+        self,
+        message: str,
+        images: Optional[List[str]] = None,
+        history: Optional[List[Message]] = None,
+        reasoning_mode: bool = False
+    ) -> dict:
+        """Build Gemini generateContent request body (shared by stream and non-stream)"""
+        contents = []
+        
+        # Add history
+        if history:
+            for msg in history[-10:]:  # Last 10 messages for context
+                role = "user" if msg.role == "user" else "model"
+                contents.append({"role": role, "parts": [{"text": msg.content}]})
+        
+        # Add current message with images
+        parts = []
+        if images:
+            for img in images:
+                if img.startswith('data:image'):
+                    # Extract base64 data
+                    img_data = img.split(',')[1] if ',' in img else img
+                    mime_type = img.split(';')[0].split(':')[1] if 'data:' in img else 'image/jpeg'
+                    parts.append({
+                        "inline_data": {
+                            "mime_type": mime_type,
+                            "data": img_data
+                        }
+                    })
+        
+        parts.append({"text": message})
+        contents.append({"role": "user", "parts": parts})
+        
+        request_body = {
+            "contents": contents,
+            "generationConfig": {
+                "temperature": 0.7,
+                "maxOutputTokens": 8192
+            }
+        }
+        
+        # System instruction for reasoning mode
+        if reasoning_mode:
+            request_body["systemInstruction"] = {
+                "parts": [{
+                    "text": "You are a math tutor. Explain problems STEP BY STEP with numbered steps, calculations, and insights."
+                }]
+            }
+        
+        return request_body
+    
+    async def _gemini_stream(
+        self,
+        message: str,
+        images: Optional[List[str]] = None,
+        history: Optional[List[Message]] = None,
+        reasoning_mode: bool = False
+    ) -> AsyncGenerator[str, None]:
+        """Stream response using Gemini streamGenerateContent (SSE)"""
+        client = http_clients.get(self.gemini_base_url)
+        request_body = self._build_gemini_body(message, images, history, reasoning_mode)
+        
+        async with client.stream(
+            "POST",
+            f"{self.gemini_base_url}/models/{self.gemini_model}:streamGenerateContent?alt=sse&key={self.gemini_key}",
+            headers={"Content-Type": "application/json"},
+            json=request_body,
+            timeout=120.0
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise Exception(f"Gemini API error: {response.status_code} - {body[:200]!r}")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                try:
+                    data = json.loads(line[6:])
+                except json.JSONDecodeError:
+                    continue
+                for candidate in data.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        text = part.get("text", "")
+                        if text:
+                            yield text
+    
     async def _openai_response(
         self,
         message: str,
@@ -457,30 +506,30 @@ class AIService:
         reasoning_mode: bool = False
     ) -> str:
         """Generate response using OpenAI API"""
-        async with httpx.AsyncClient() as client:
-            messages = self._build_messages(message, images, history, reasoning_mode)
-            
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 4096
-                },
-                timeout=120.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
-            else:
-                error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
-                print(f"[API Error] {error_msg}")
-                raise Exception(error_msg)
+        client = http_clients.get("https://api.openai.com")
+        messages = self._build_messages(message, images, history, reasoning_mode)
+        
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 4096
+            },
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data["choices"][0]["message"]["content"]
+        else:
+            error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
+            print(f"[API Error] {error_msg}")
+            raise Exception(error_msg)
     
     async def _openai_stream(
         self,
@@ -489,41 +538,41 @@ class AIService:
         history: Optional[List[Message]] = None
     ) -> AsyncGenerator[str, None]:
         """Stream response using OpenAI API"""
-        async with httpx.AsyncClient() as client:
-            messages = self._build_messages(message, images, history)
+        client = http_clients.get("https://api.openai.com")
+        messages = self._build_messages(message, images, history)
+        
+        async with client.stream(
+            "POST",
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 4096,
+                "stream": True
+            },
+            timeout=120.0
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(f"OpenAI API error: {response.status_code}")
             
-            async with client.stream(
-                "POST",
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 4096,
-                    "stream": True
-                },
-                timeout=120.0
-            ) as response:
-                if response.status_code != 200:
-                    raise Exception(f"OpenAI API error: {response.status_code}")
-                
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            if "choices" in data and len(data["choices"]) > 0:
-                                delta = data["choices"][0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    if data_str == "[DONE]":
+                        break
+                    try:
+                        data = json.loads(data_str)
+                        if "choices" in data and len(data["choices"]) > 0:
+                            delta = data["choices"][0].get("delta", {})
+                            content = delta.get("content", "")
+                            if content:
+                                yield content
+                    except json.JSONDecodeError:
+                        continue
     
     def _build_messages(
         self,
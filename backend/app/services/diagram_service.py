@@ -0,0 +1,700 @@
+"""
+Diagram Service - Local rendering of math step diagrams
+Step image descriptions are planned into a small set of diagram kinds (formula
+cards, function plots, number lines, vectors/matrices, simple geometry) and
+drawn with matplotlib in a process pool. PNGs are cached by spec hash and served
+from /api/media; descriptions the planner can't handle fall back to remote
+image generation.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import ast
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
+import math
+import os
+import re
+
+from app.core.config import settings
+from app.core.disk_cache import DiskCache
+from app.core.media_store import media_store
+from app.core.process_pool import WorkerPool
+
+
+PLOT_WORDS = ("graph", "plot", "funktion", "function", "kurve", "curve", "parabel", "parabola",
+              "schaubild", "koordinatensystem", "coordinate")
+NUMBER_LINE_WORDS = ("number line", "zahlenstrahl", "zahlengerade", "intervall", "interval",
+                     "ungleichung", "inequalit", "lösungsmenge")
+VECTOR_WORDS = ("vektor", "vector", "pfeil", "arrow")
+SHAPE_WORDS = {
+    "triangle": ("dreieck", "triangle", "pythagoras"),
+    "circle": ("kreis", "circle"),
+    "rectangle": ("rechteck", "rectangle", "quadrat", "square"),
+}
+RIGHT_ANGLE_WORDS = ("rechtwinklig", "right triangle", "right-angled", "pythagoras", "hypotenuse")
+
+FUNCTIONS = ("sqrt", "sin", "cos", "tan", "exp", "log", "ln", "abs")
+CONSTANTS = ("pi", "e", "x")
+
+_NUMBER = r"-?\d+(?:[.,]\d+)?"
+_MATRIX_ENV = re.compile(r"\\begin\{([pbvBV]?matrix)\}(.*?)\\end\{\1\}", re.S)
+_MATH_SPAN = re.compile(r"\$\$(.+?)\$\$|\$(.+?)\$|\\\[(.+?)\\\]|\\\((.+?)\\\)", re.S)
+_FUNCTION_DEF = re.compile(r"(?:\b([a-zA-Z])\s*\(\s*x\s*\)|\by)\s*=\s*(.+?)(?=\\quad|\\qquad|\\\\|[,;\n]|\\text|$)")
+_INEQUALITY = re.compile(rf"(?:({_NUMBER})\s*(<|\\le(?:q)?|≤)\s*)?x\s*(<|>|\\le(?:q)?|\\ge(?:q)?|≤|≥|<=|>=)\s*({_NUMBER})")
+_INTERVAL = re.compile(rf"([\[\]\(])\s*({_NUMBER})\s*[,;]\s*({_NUMBER})\s*([\[\]\)])")
+_POINT = re.compile(rf"\b(x(?:_\{{?\d\}}?)?)\s*=\s*({_NUMBER})(?![\d.]|\s*[a-zA-Z(\\*/^])")
+_PROSE = re.compile(r"[^\W\d_]{2,}\s+[^\W\d_]{2,}\s+[^\W\d_]{2,}")
+_LABELLED_VALUE = re.compile(rf"(?<![a-zA-Z\\])([a-dhr]|\\alpha|\\beta|\\gamma)\s*=\s*({_NUMBER})\s*(cm|mm|m|°|\^\\circ)?")
+
+
+def _mentions(text: str, words) -> bool:
+    return any(word in text for word in words)
+
+
+def _number(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+def _strip_delimiters(content: str) -> str:
+    return re.sub(r"\\[\[\]()]|\$", " ", content)
+
+
+def math_segments(text: str) -> List[str]:
+    """LaTeX inside $..$, \\(..\\) and \\[..\\] in free text (reasoning image prompts)"""
+    return [next(group for group in match.groups() if group) for match in _MATH_SPAN.finditer(text)]
+
+
+# --- LaTeX -> safe numeric expression -------------------------------------------------
+
+def _replace_innermost(pattern: str, repl, s: str) -> str:
+    previous = None
+    while previous != s:
+        previous = s
+        s = re.sub(pattern, repl, s)
+    return s
+
+
+def _tokenize(s: str) -> Optional[List[str]]:
+    tokens = []
+    i = 0
+    while i < len(s):
+        ch = s[i]
+        if ch.isspace():
+            i += 1
+        elif ch.isdigit() or ch == ".":
+            match = re.match(r"\d*\.?\d+", s[i:])
+            tokens.append(match.group())
+            i += len(match.group())
+        elif ch.isalpha():
+            name = next((n for n in FUNCTIONS + CONSTANTS if s.startswith(n, i)), None)
+            if name is None:
+                return None  # unknown symbol (a parameter) - not plottable
+            tokens.append(name)
+            i += len(name)
+        elif s.startswith("**", i):
+            tokens.append("**")
+            i += 2
+        elif ch in "+-*/()":
+            tokens.append(ch)
+            i += 1
+        else:
+            return None
+    return tokens
+
+
+def latex_to_expression(latex: str) -> Optional[str]:
+    """
+    Translate a LaTeX function term in x into a Python expression over a small
+    whitelist of names, or None if it uses anything else.
+    """
+    s = latex.strip().rstrip(".")
+    s = re.sub(r"\\(left|right|displaystyle|,|;|!|:)|\\?\s", " ", s)
+    s = re.sub(r"\\[dt]frac", r"\\frac", s)
+    s = s.replace("\\cdot", "*").replace("\\times", "*").replace("\\pi", " pi ").replace("\\ln", " ln ")
+    s = re.sub(r"\\(sin|cos|tan|exp|log)", r" \1 ", s)
+    s = re.sub(r"\|([^|]+)\|", r" abs(\1) ", s)
+    s = _replace_innermost(r"\\frac\{([^{}]*)\}\{([^{}]*)\}", r"((\1)/(\2))", s)
+    s = _replace_innermost(r"\\sqrt\[([^\]]*)\]\{([^{}]*)\}", r"((\2)**(1/(\1)))", s)
+    s = _replace_innermost(r"\\sqrt\{([^{}]*)\}", r" sqrt(\1) ", s)
+    s = re.sub(r"(?<![a-zA-Z])e\s*\^", " exp ^", s)
+    s = s.replace("^", "**").replace("{", "(").replace("}", ")")
+    if "\\" in s:
+        return None
+
+    tokens = _tokenize(s)
+    if not tokens:
+        return None
+    out = []
+    for token in tokens:
+        if token[0].isdigit() or token[0] == ".":
+            # Float literals: constant powers overflow instead of building huge integers
+            value = float(token)
+            if not math.isfinite(value):
+                return None
+            token = repr(value)
+        if out:
+            previous = out[-1]
+            ends_operand = previous == ")" or previous[0].isdigit() or previous[0] == "." or previous in CONSTANTS
+            starts_operand = token == "(" or token[0].isdigit() or token[0] == "." or token in FUNCTIONS + CONSTANTS
+            if ends_operand and starts_operand:
+                out.append("*")
+        out.append(token)
+    expression = re.sub(r"exp \*\* ([\w.]+)", r"exp ( \1 )", " ".join(out).replace("exp ** (", "exp ("))
+    return expression if _is_safe_expression(expression) else None
+
+
+def _is_safe_expression(expression: str) -> bool:
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError:
+        return False
+    called = set()
+    allowed = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+               ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or len(node.args) != 1 or node.keywords:
+                return False
+            called.add(id(node.func))
+        elif isinstance(node, ast.Name):
+            if node.id not in CONSTANTS and not (node.id in FUNCTIONS and id(node) in called):
+                return False
+        elif not isinstance(node, allowed):
+            return False
+        if isinstance(node, ast.Constant) and type(node.value) is not float:
+            return False
+    return "x" in expression
+
+
+# --- Planning (main process, no matplotlib) -------------------------------------------
+
+def _parse_matrix(body: str) -> List[List[str]]:
+    rows = [row.strip() for row in re.split(r"\\\\", body) if row.strip()]
+    return [[cell.strip() for cell in row.split("&")] for row in rows]
+
+
+def _plan_matrices(math_text: str, description: str) -> Optional[Dict[str, Any]]:
+    parts: List[Dict[str, Any]] = []
+    position = 0
+    for match in _MATRIX_ENV.finditer(math_text):
+        before = math_text[position:match.start()].strip()
+        if before:
+            parts.append({"tex": before})
+        parts.append({"matrix": _parse_matrix(match.group(2)), "env": match.group(1)})
+        position = match.end()
+    if not parts:
+        return None
+    after = math_text[position:].strip()
+    if after:
+        parts.append({"tex": after})
+
+    # Plane vectors drawn as arrows when the description asks for a picture of vectors
+    matrices = [part for part in parts if "matrix" in part]
+    if _mentions(description, VECTOR_WORDS):
+        vectors = []
+        for index, part in enumerate(parts):
+            rows = part.get("matrix")
+            if rows is None:
+                continue
+            if len(rows) != 2 or any(len(row) != 1 for row in rows):
+                break
+            try:
+                x, y = (_number(row[0]) for row in rows)
+            except ValueError:
+                break
+            label = ""
+            if index > 0 and "tex" in parts[index - 1]:
+                match = re.search(r"([^=\s]+)\s*=\s*$", parts[index - 1]["tex"])
+                label = match.group(1) if match else ""
+            vectors.append({"label": label, "x": x, "y": y})
+        if vectors and len(vectors) == len(matrices):
+            return {"kind": "vectors", "vectors": vectors}
+    return {"kind": "matrix", "parts": parts}
+
+
+def _plan_plot(math_text: str) -> Optional[Dict[str, Any]]:
+    functions = []
+    for match in _FUNCTION_DEF.finditer(math_text):
+        expression = latex_to_expression(match.group(2))
+        if expression:
+            name = match.group(1)
+            functions.append({"label": f"{name}(x)" if name else "y", "expression": expression})
+    if not functions:
+        return None
+    x_range = [-5.0, 5.0]
+    domain = re.search(rf"x\s*\\in\s*[\[\]]\s*({_NUMBER})\s*[,;]\s*({_NUMBER})\s*[\[\]]", math_text)
+    if domain and _number(domain.group(1)) < _number(domain.group(2)):
+        x_range = [_number(domain.group(1)), _number(domain.group(2))]
+    return {"kind": "plot", "functions": functions[:4], "x_range": x_range}
+
+
+def _plan_number_line(math_text: str) -> Optional[Dict[str, Any]]:
+    intervals = []
+    for match in _INEQUALITY.finditer(math_text):
+        lower, lower_op, op, value = match.groups()
+        bound = _number(value)
+        closed = op in ("\\le", "\\leq", "\\ge", "\\geq", "≤", "≥", "<=", ">=")
+        if lower is not None:
+            intervals.append([_number(lower), bound, lower_op != "<", closed])
+        elif op in (">", "\\ge", "\\geq", "≥", ">="):
+            intervals.append([bound, None, closed, False])
+        else:
+            intervals.append([None, bound, False, closed])
+    for match in _INTERVAL.finditer(math_text):
+        left, lower, upper, right = match.groups()
+        if _number(lower) < _number(upper):
+            intervals.append([_number(lower), _number(upper), left == "[", right == "]"])
+    points = [[name, _number(value)] for name, value in _POINT.findall(math_text)]
+    if not intervals and not points:
+        return None
+    return {"kind": "number_line", "intervals": intervals[:4], "points": points[:6]}
+
+
+def _plan_geometry(text: str, math_text: str) -> Optional[Dict[str, Any]]:
+    shape = next((shape for shape, words in SHAPE_WORDS.items() if _mentions(text, words)), None)
+    if shape is None:
+        return None
+    values = {}
+    for name, value, unit in _LABELLED_VALUE.findall(math_text):
+        values.setdefault(name.lstrip("\\"), [_number(value), (unit or "").replace("^\\circ", "°")])
+    spec = {"kind": "geometry", "shape": shape, "values": values}
+    if shape == "rectangle":
+        spec["square"] = _mentions(text, ("quadrat", "square"))
+    if shape == "triangle":
+        spec["right_angle"] = _mentions(text, RIGHT_ANGLE_WORDS)
+    return spec
+
+
+def _formula_lines(math_text: str) -> List[str]:
+    """Split math content into display lines of mathtext ("$...$" around the math parts)"""
+    if not _MATH_SPAN.search(math_text):
+        # Pure LaTeX (reasoning "math" fields, final answers)
+        return [f"${line.strip()}$" for line in re.split(r"\\\\|\n", math_text) if line.strip()]
+
+    lines: List[str] = []
+    current = ""
+    position = 0
+    for match in _MATH_SPAN.finditer(math_text):
+        current += math_text[position:match.start()]
+        display = match.group(1) or match.group(3)
+        if display:
+            # Display math gets lines of its own; inline math continues the text line
+            lines.extend(current.split("\n"))
+            current = ""
+            lines.extend(f"${part.strip()}$" for part in re.split(r"\\\\", display) if part.strip())
+        else:
+            current += f"${(match.group(2) or match.group(4)).strip()}$"
+        position = match.end()
+    lines.extend((current + math_text[position:]).split("\n"))
+    return [line.strip() for line in lines if line.strip()]
+
+
+def _clean_mathtext(line: str) -> str:
+    """Rewrite LaTeX that matplotlib's mathtext doesn't know into what it does"""
+    line = re.sub(r"\\[dt]frac", r"\\frac", line)
+    line = re.sub(r"\\operatorname\{([^{}]*)\}", r"\\mathrm{\1}", line)
+    line = re.sub(r"\\(displaystyle|left(?=[.])|right(?=[.])|begin\{aligned\*?\}|end\{aligned\*?\}|begin\{align\*?\}|end\{align\*?\})", "", line)
+    line = line.replace("&", "").replace("\\implies", "\\Rightarrow").replace("\\iff", "\\Leftrightarrow")
+    line = re.sub(r"\\text(?:bf|it|rm)?\{([^{}]*)\}", lambda m: "\\mathrm{" + m.group(1).replace(" ", "\\ ") + "}", line)
+    return line
+
+
+def plan_diagram(description: str, math_content: str = "", formula_cards: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Pick a local diagram for a step description, or None if it needs remote generation.
+    math_content may be pure LaTeX or text with \\( \\) / \\[ \\] / $ delimiters; when
+    empty, math is taken from delimited spans in the description.
+    """
+    text = f"{description or ''} ".lower()
+    math_content = math_content or ""
+    math_text = math_content if math_content.strip() else " ".join(math_segments(description or ""))
+    plain_math = _strip_delimiters(math_text)
+
+    spec = None
+    if _MATRIX_ENV.search(plain_math):
+        spec = _plan_matrices(plain_math, text)
+    if spec is None and _mentions(text, NUMBER_LINE_WORDS):
+        spec = _plan_number_line(plain_math or description)
+    if spec is None and _mentions(text, PLOT_WORDS):
+        spec = _plan_plot(plain_math or _strip_delimiters(description))
+    if spec is None:
+        spec = _plan_geometry(text, plain_math or description)
+    if spec is None and formula_cards and math_text.strip():
+        lines = [_clean_mathtext(line) for line in _formula_lines(math_text)]
+        spec = {"kind": "formula", "lines": lines[:12]} if lines else None
+    if spec is not None and spec["kind"] not in ("formula", "geometry") and not _MATRIX_ENV.search(math_text):
+        # Caption diagrams with their key equation when it is pure math and short enough to read
+        first = next(iter(_formula_lines(math_text)), "")
+        if first.startswith("$") and first.endswith("$") and first.count("$") == 2 and len(first) <= 60:
+            spec["caption"] = _clean_mathtext(first)
+    return spec
+
+
+def plan_expression(expression: str) -> Optional[Dict[str, Any]]:
+    """
+    Spec that typesets one expression as-is - pure LaTeX, a text line with
+    $..$ / \\( \\) math, or matrices. None for empty input.
+    """
+    expression = (expression or "").strip()
+    if not expression:
+        return None
+    if _MATRIX_ENV.search(expression):
+        return _plan_matrices(_strip_delimiters(expression), "")
+    if not _MATH_SPAN.search(expression) and "\\" not in expression and _PROSE.search(expression):
+        lines = [expression]  # plain prose (e.g. a worded final answer)
+    else:
+        lines = _formula_lines(expression)
+    return {"kind": "formula", "lines": [_clean_mathtext(line) for line in lines]}
+
+
+# --- Rendering (worker processes) ----------------------------------------------------
+
+def _figure(width: float, height: float):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(width, height), facecolor="white")
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _axes(fig, caption: Optional[str] = None):
+    ax = fig.add_subplot(1, 1, 1)
+    if caption:
+        ax.set_title(caption, fontsize=15, pad=12)
+    return ax
+
+
+def _render_formula(spec: Dict[str, Any]) -> Any:
+    lines = spec["lines"]
+    fig = _figure(8, 0.7 * len(lines) + 0.4)
+    for i, line in enumerate(lines):
+        y = 1 - (i + 0.5) / len(lines)
+        fig.text(0.5, y, line, ha="center", va="center", fontsize=spec.get("size", 20), color=spec.get("color", "black"))
+    return fig
+
+
+def _render_plot(spec: Dict[str, Any]) -> Any:
+    import numpy as np
+
+    namespace = {
+        "sqrt": np.sqrt, "sin": np.sin, "cos": np.cos, "tan": np.tan, "exp": np.exp,
+        "log": np.log10, "ln": np.log, "abs": np.abs, "pi": np.pi, "e": np.e,
+    }
+    x_min, x_max = spec["x_range"]
+    xs = np.linspace(x_min, x_max, 800)
+    fig = _figure(7, 5)
+    ax = _axes(fig, spec.get("caption"))
+    curves = []
+    with np.errstate(all="ignore"):
+        for function in spec["functions"]:
+            ys = eval(compile(function["expression"], "<plot>", "eval"), {"__builtins__": {}}, {**namespace, "x": xs})
+            ys = np.broadcast_to(np.asarray(ys, dtype=float), xs.shape).copy()
+            ys[~np.isfinite(ys)] = np.nan
+            curves.append(ys)
+        values = np.concatenate([ys[np.isfinite(ys)] for ys in curves])
+        if values.size:
+            # Clip asymptotes so the interesting part of the curve stays visible
+            low, high = np.percentile(values, [2, 98])
+            margin = max(1.0, (high - low) * 0.15)
+            low, high = min(low, 0) - margin, max(high, 0) + margin
+            ax.set_ylim(low, high)
+            for ys in curves:
+                # Don't join the two sides of a pole with a vertical line
+                ys[1:][np.abs(np.diff(ys)) > high - low] = np.nan
+    for function, ys in zip(spec["functions"], curves):
+        ax.plot(xs, ys, linewidth=2.2, label=f"${function['label']}$")
+    ax.axhline(0, color="black", linewidth=1)
+    ax.axvline(0, color="black", linewidth=1)
+    ax.grid(True, alpha=0.3)
+    ax.set_xlim(x_min, x_max)
+    ax.legend(fontsize=13)
+    return fig
+
+
+def _render_number_line(spec: Dict[str, Any]) -> Any:
+    values = [v for interval in spec["intervals"] for v in interval[:2] if v is not None]
+    values += [value for _, value in spec["points"]]
+    low, high = min(values), max(values)
+    span = max(high - low, 4.0)
+    start, end = math.floor(low - span * 0.3), math.ceil(high + span * 0.3)
+
+    fig = _figure(8, 2.2)
+    ax = _axes(fig, spec.get("caption"))
+    ax.annotate("", xy=(end, 0), xytext=(start, 0), arrowprops={"arrowstyle": "->", "linewidth": 1.5})
+    step = max(1, math.ceil((end - start) / 16))
+    for tick in range(start, end, step):
+        ax.plot([tick, tick], [-0.08, 0.08], color="black", linewidth=1)
+        ax.text(tick, -0.25, str(tick), ha="center", va="top", fontsize=11)
+    for i, (lower, upper, lower_closed, upper_closed) in enumerate(spec["intervals"]):
+        y = 0.22 + 0.18 * i
+        left = lower if lower is not None else start
+        right = upper if upper is not None else end
+        ax.plot([left, right], [y, y], color="tab:blue", linewidth=5, solid_capstyle="butt")
+        for bound, closed in ((lower, lower_closed), (upper, upper_closed)):
+            if bound is not None:
+                ax.plot([bound], [y], "o", markersize=10, markeredgewidth=2, color="tab:blue",
+                        markerfacecolor="tab:blue" if closed else "white")
+    for name, value in spec["points"]:
+        ax.plot([value], [0], "o", markersize=9, color="tab:red")
+        ax.text(value, 0.2, f"${name} = {value:g}$", ha="center", va="bottom", fontsize=13, color="tab:red")
+    ax.set_xlim(start - 0.5, end + 0.5)
+    ax.set_ylim(-0.7, 0.5 + 0.18 * len(spec["intervals"]))
+    ax.axis("off")
+    return fig
+
+
+def _render_vectors(spec: Dict[str, Any]) -> Any:
+    vectors = spec["vectors"]
+    extent = max([1.0] + [max(abs(v["x"]), abs(v["y"])) for v in vectors]) * 1.25
+    fig = _figure(6, 6)
+    ax = _axes(fig, spec.get("caption"))
+    colors = ["tab:blue", "tab:red", "tab:green", "tab:purple", "tab:orange"]
+    for i, vector in enumerate(vectors):
+        color = colors[i % len(colors)]
+        ax.annotate("", xy=(vector["x"], vector["y"]), xytext=(0, 0),
+                    arrowprops={"arrowstyle": "-|>", "linewidth": 2.2, "color": color, "mutation_scale": 20})
+        label = vector["label"] or f"v_{i + 1}"
+        ax.text(vector["x"] * 1.06, vector["y"] * 1.06, f"${label}$", fontsize=15, color=color)
+    ax.set_xlim(-extent, extent)
+    ax.set_ylim(-extent, extent)
+    ax.set_aspect("equal")
+    ax.axhline(0, color="black", linewidth=1)
+    ax.axvline(0, color="black", linewidth=1)
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def _render_matrix(spec: Dict[str, Any]) -> Any:
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Arc
+    from matplotlib.transforms import Affine2D
+
+    fig = _figure(1, 1)
+    renderer = fig.canvas.get_renderer()
+    # Laid out in inches around y = 0; mapped onto the figure once the total size is
+    # known (via transFigure, so bbox_inches="tight" can still crop it)
+    offset = Affine2D()
+    transform = offset + fig.transFigure
+    max_height = 0.0
+    color = spec.get("color", "black")
+    fontsize = spec.get("size", 20)
+    gap = 0.12  # inches
+
+    def size_of(artist) -> Tuple[float, float]:
+        box = artist.get_window_extent(renderer)
+        return box.width / fig.dpi, box.height / fig.dpi
+
+    x = 0.0
+    for part in spec["parts"]:
+        if "tex" in part:
+            text = fig.text(x, 0, f"${part['tex']}$", fontsize=fontsize, va="center", ha="left",
+                            color=color, transform=transform)
+            width, height = size_of(text)
+            x += width + gap
+            max_height = max(max_height, height)
+            continue
+
+        rows = part["matrix"]
+        cells = [[fig.text(0, 0, f"${cell}$" if cell else "", fontsize=fontsize, ha="center", va="center",
+                           color=color, transform=transform) for cell in row] for row in rows]
+        columns = max(len(row) for row in rows)
+        widths = [max((size_of(row[c])[0] for row in cells if c < len(row)), default=0) for c in range(columns)]
+        row_height = max(size_of(cell)[1] for row in cells for cell in row) + 0.15
+        height = row_height * len(rows)
+        max_height = max(max_height, height)
+        bracket = 0.12
+        left = x + bracket + 0.06
+        for r, row in enumerate(cells):
+            y = height / 2 - row_height * (r + 0.5)
+            column_x = left
+            for c, cell in enumerate(row):
+                cell.set_position((column_x + widths[c] / 2, y))
+                column_x += widths[c] + 0.3
+        right = left + sum(widths) + 0.3 * (columns - 1) + 0.06
+        top, bottom = height / 2, -height / 2
+        env = part["env"]
+        if env == "pmatrix":
+            for center, start_angle in ((x + bracket, 90), (right + 0.0, -90)):
+                fig.add_artist(Arc((center, 0), bracket * 2, height, theta1=start_angle, theta2=start_angle + 180,
+                                   transform=transform, color=color, linewidth=1.6))
+        elif env in ("bmatrix", "Bmatrix"):
+            for edge, tip in ((x, x + bracket), (right + bracket, right)):
+                fig.add_artist(Line2D([tip, edge, edge, tip], [top, top, bottom, bottom],
+                                      transform=transform, color=color, linewidth=1.6))
+        elif env in ("vmatrix", "Vmatrix"):
+            for edge in (x + bracket / 2, right + bracket / 2):
+                fig.add_artist(Line2D([edge, edge], [top, bottom], transform=transform, color=color, linewidth=1.6))
+        x = right + bracket + gap
+
+    pad = 0.3
+    width, height = x - gap + 2 * pad, max_height + 2 * pad
+    offset.translate(pad, max_height / 2 + pad).scale(1 / width, 1 / height)
+    fig.set_size_inches(width, height)
+    return fig
+
+
+def _render_geometry(spec: Dict[str, Any]) -> Any:
+    from matplotlib.patches import Circle, Polygon
+
+    values = spec["values"]
+
+    def value(name: str) -> Optional[float]:
+        entry = values.get(name)
+        return entry[0] if entry and entry[0] > 0 else None
+
+    def label(name: str) -> str:
+        entry = values.get(name)
+        if not entry:
+            return f"${name}$"
+        unit = f"\\,\\mathrm{{{entry[1]}}}" if entry[1] and entry[1] != "°" else entry[1]
+        return f"${name} = {entry[0]:g}{unit}$"
+
+    fig = _figure(6, 5)
+    ax = _axes(fig, spec.get("caption"))
+    shape = spec["shape"]
+
+    if shape == "circle":
+        radius = value("r") or (value("d") / 2 if value("d") else 1.0)
+        ax.add_patch(Circle((0, 0), radius, fill=False, linewidth=2.2))
+        ax.plot([0, radius], [0, 0], color="tab:red", linewidth=2)
+        ax.plot([0], [0], "o", color="black")
+        ax.text(radius / 2, radius * 0.05, label("r") if "r" in values or "d" not in values else label("d"),
+                ha="center", va="bottom", fontsize=15, color="tab:red")
+        extent = radius * 1.25
+        ax.set_xlim(-extent, extent)
+        ax.set_ylim(-extent, extent)
+    elif shape == "rectangle":
+        a = value("a") or 4.0
+        b = value("b") or (a if spec.get("square") else 2.5)
+        ax.add_patch(Polygon([(0, 0), (a, 0), (a, b), (0, b)], fill=False, linewidth=2.2))
+        ax.text(a / 2, -0.06 * max(a, b), label("a"), ha="center", va="top", fontsize=15)
+        ax.text(a + 0.04 * max(a, b), b / 2, label("a" if spec.get("square") else "b"), ha="left", va="center", fontsize=15)
+        ax.set_xlim(-0.2 * max(a, b), a + 0.45 * max(a, b))
+        ax.set_ylim(-0.25 * max(a, b), b + 0.2 * max(a, b))
+    else:
+        a, b, c = value("a"), value("b"), value("c")
+        if spec.get("right_angle"):
+            # Right angle at C, c is the hypotenuse
+            if not (a and b):
+                if a and c and c > a:
+                    b = math.sqrt(c * c - a * a)
+                elif b and c and c > b:
+                    a = math.sqrt(c * c - b * b)
+                else:
+                    a, b = a or 3.0, b or 4.0
+            A, B, C = (0.0, b), (a, 0.0), (0.0, 0.0)
+            size = 0.08 * max(a, b)
+            ax.add_patch(Polygon([(0, 0), (size, 0), (size, size), (0, size)], fill=False, linewidth=1.2))
+        else:
+            if not (a and b and c and a + b > c and a + c > b and b + c > a):
+                a, b, c = 4.0, 3.5, 5.0
+            cx = (b * b + c * c - a * a) / (2 * c)
+            A, B, C = (0.0, 0.0), (c, 0.0), (cx, math.sqrt(max(b * b - cx * cx, 0.0)))
+        ax.add_patch(Polygon([A, B, C], fill=False, linewidth=2.2))
+        center = ((A[0] + B[0] + C[0]) / 3, (A[1] + B[1] + C[1]) / 3)
+        for name, (p, q) in (("a", (B, C)), ("b", (C, A)), ("c", (A, B))):
+            mid = ((p[0] + q[0]) / 2, (p[1] + q[1]) / 2)
+            offset = (mid[0] - center[0], mid[1] - center[1])
+            ax.text(mid[0] + offset[0] * 0.35, mid[1] + offset[1] * 0.35, label(name),
+                    ha="center", va="center", fontsize=14)
+        for name, point in (("A", A), ("B", B), ("C", C)):
+            offset = (point[0] - center[0], point[1] - center[1])
+            ax.text(point[0] + offset[0] * 0.15, point[1] + offset[1] * 0.15, f"${name}$",
+                    ha="center", va="center", fontsize=15, fontweight="bold")
+        xs, ys = zip(A, B, C)
+        extent = max(max(xs) - min(xs), max(ys) - min(ys))
+        ax.set_xlim(min(xs) - 0.3 * extent, max(xs) + 0.3 * extent)
+        ax.set_ylim(min(ys) - 0.3 * extent, max(ys) + 0.3 * extent)
+
+    ax.set_aspect("equal")
+    ax.axis("off")
+    return fig
+
+
+RENDERERS = {
+    "formula": _render_formula,
+    "plot": _render_plot,
+    "number_line": _render_number_line,
+    "vectors": _render_vectors,
+    "matrix": _render_matrix,
+    "geometry": _render_geometry,
+}
+
+
+def _render(spec: Dict[str, Any], dpi: int, fmt: str = "png") -> bytes:
+    """Worker: PNG/SVG bytes for a planned diagram - runs in a child process"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    fig = RENDERERS[spec["kind"]](spec)
+    transparent = spec.get("transparent", False)
+    out = io.BytesIO()
+    fig.savefig(
+        out,
+        format=fmt,
+        dpi=dpi,
+        bbox_inches="tight",
+        pad_inches=spec.get("pad", 0.3),
+        transparent=transparent,
+        facecolor="none" if transparent else "white"
+    )
+    return out.getvalue()
+
+
+class DiagramService:
+    """Renders planned math diagrams in worker processes and caches the PNGs"""
+
+    def __init__(self):
+        self.workers = WorkerPool("Diagram", settings.DIAGRAM_WORKERS)
+        self.available = importlib.util.find_spec("matplotlib") is not None
+        self.cache = DiskCache(
+            settings.DIAGRAM_CACHE_DIR or os.path.join(settings.VIDEO_OUTPUT_DIR, "diagrams"),
+            settings.DIAGRAM_CACHE_MAX_BYTES,
+            extension="png"
+        )
+        media_store.register(self.cache)
+
+    async def render(self, description: str, math_content: str = "") -> Optional[str]:
+        """
+        Media URL of a locally rendered diagram for a step, or None when the
+        description isn't something we can draw (callers fall back to remote generation).
+        """
+        if not settings.DIAGRAM_RENDER_ENABLED or not self.available:
+            return None
+        spec = plan_diagram(description, math_content, formula_cards=settings.DIAGRAM_FORMULA_CARDS)
+        if spec is None:
+            return None
+
+        key = hashlib.sha256(json.dumps({**spec, "dpi": settings.DIAGRAM_DPI}, sort_keys=True).encode()).hexdigest()
+        if await self.cache.locate(key):
+            return media_store.url_for(self.cache, key)
+
+        try:
+            data = await self.rasterize(spec)
+        except asyncio.TimeoutError:
+            print(f"[Diagram] {spec['kind']} render timed out")
+            return None
+        except Exception as e:
+            print(f"[Diagram] {spec['kind']} render failed: {e}")
+            return None
+
+        await self.cache.put(key, data)
+        print(f"[Diagram] Rendered {spec['kind']} ({len(data) // 1024}KB)")
+        return media_store.url_for(self.cache, key)
+
+    async def rasterize(self, spec: Dict[str, Any], fmt: str = "png") -> bytes:
+        """
+        Render a spec in the worker pool; raises on timeout or render errors.
+        DIAGRAM_RENDER_TIMEOUT counts from when a worker picks the render up. An
+        overrun restarts the pool; renders it kills in passing are retried once.
+        """
+        return await self.workers.run(settings.DIAGRAM_RENDER_TIMEOUT, _render, spec, settings.DIAGRAM_DPI, fmt)
+
+    def shutdown(self) -> None:
+        self.workers.shutdown()
+
+
+diagram_service = DiagramService()
@@ -1,13 +1,20 @@
 """
 Explanation Service - Generates step-by-step explanations with visual aids
 """
-from typing import List, Optional, Dict, Any
-import httpx
+from typing import List, Optional, Dict, Any, AsyncGenerator
+from collections import OrderedDict
+import asyncio
 import json
 import base64
 import re
 
 from app.core.config import settings
+from app.core.cache import ResponseCache, llm_cache, make_cache_key
+from app.core.http_client import http_clients
+from app.core.json_stream import iter_openai_deltas, stream_cached_json_items
+from app.services.diagram_service import diagram_service
+from app.services.image_service import image_service
+from app.services.latex_service import latex_service
 
 
 class ExplanationService:
@@ -16,16 +23,29 @@ class ExplanationService:
     def __init__(self):
         self.openai_key = settings.OPENAI_API_KEY
         self.manus_key = settings.MANUS_API_KEY
+        self._tickets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # ticket -> image params
+        self._image_tasks: Dict[str, asyncio.Task] = {}  # ticket -> in-flight generation
+        # Generated image URLs are temporary upstream, so they get their own short TTL
+        self._image_cache = ResponseCache(
+            "step-images",
+            max_entries=settings.EXPLANATION_IMAGE_TICKETS,
+            ttl_seconds=settings.EXPLANATION_IMAGE_CACHE_TTL
+        )
     
     async def generate_step_explanation(
         self,
         problem_description: str,
         problem_image: Optional[str] = None,
-        notation_context: Optional[str] = None
+        notation_context: Optional[str] = None,
+        image_mode: str = "eager",
+        render_math: bool = False
     ) -> Dict[str, Any]:
         """
         Generate a structured step-by-step explanation for a problem.
         Returns a "red thread" of solution steps with explanations.
+        image_mode: "eager" generates step images now, "lazy" attaches an
+        image_ticket per step (see get_step_image), "none" skips images.
+        render_math attaches math_image / final_answer_image (pre-rendered LaTeX URLs).
         """
         # First, get the AI to analyze and structure the solution
         structured_solution = await self._get_structured_solution(
@@ -34,6 +54,16 @@ class ExplanationService:
             notation_context
         )
         
+        if render_math:
+            await self._render_math(structured_solution)
+        
+        if image_mode == "lazy":
+            return self._issue_image_tickets(structured_solution)
+        if image_mode == "none":
+            for step in structured_solution.get("steps", []):
+                step["generated_image"] = None
+            return structured_solution
+        
         # Generate images for key steps
         steps_with_images = await self._generate_step_images(
             structured_solution,
@@ -42,13 +72,13 @@ class ExplanationService:
         
         return steps_with_images
     
-    async def _get_structured_solution(
+    def _build_solution_messages(
         self,
         problem: str,
         image: Optional[str] = None,
         notation: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Get AI to structure the solution into clear steps"""
+    ) -> List[Dict[str, Any]]:
+        """Build the chat messages for a structured solution"""
         
         system_prompt = """Du bist ein Mathe-Tutor, der Probleme in klare, verständliche Schritte zerlegt.
 
@@ -96,32 +126,83 @@ Regeln:
         
         messages.append({"role": "user", "content": user_content if image else prompt})
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 4096,
-                    "response_format": {"type": "json_object"}
-                },
-                timeout=120.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError:
-                    # Try to extract JSON from response
-                    return self._parse_fallback_response(content)
-            else:
-                raise Exception(f"OpenAI API error: {response.text}")
+        return messages
+    
+    async def _get_structured_solution(
+        self,
+        problem: str,
+        image: Optional[str] = None,
+        notation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get AI to structure the solution into clear steps"""
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_solution_messages(problem, image, notation)
+        
+        cache_key = make_cache_key("gpt-4o", messages, max_tokens=4096)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Explanation] Cache hit")
+            return cached
+        
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 4096,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            try:
+                result = json.loads(content)
+            except json.JSONDecodeError:
+                # Try to extract JSON from response
+                return self._parse_fallback_response(content)
+            await llm_cache.set(cache_key, result)
+            return result
+        else:
+            raise Exception(f"OpenAI API error: {response.text}")
+    
+    async def stream_structured_solution(
+        self,
+        problem: str,
+        image: Optional[str] = None,
+        notation: Optional[str] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Streaming variant of _get_structured_solution.
+        Yields a "step" event per step as soon as it is complete, then "done" with the full solution.
+        """
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_solution_messages(problem, image, notation)
+        cache_key = make_cache_key("gpt-4o", messages, max_tokens=4096)
+        
+        deltas = lambda: iter_openai_deltas(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            payload={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 4096,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=120.0
+        )
+        async for event in stream_cached_json_items(cache_key, deltas, "steps", "step"):
+            yield event
     
     def _parse_fallback_response(self, content: str) -> Dict[str, Any]:
         """Fallback parser if JSON parsing fails"""
@@ -140,43 +221,126 @@ Regeln:
             "red_thread": ""
         }
     
+    async def _render_math(self, solution: Dict[str, Any]) -> None:
+        """Attach pre-rendered math_content / final_answer images (None where rendering failed)"""
+        steps = solution.get("steps", [])
+        expressions = [step.get("math_content", "") for step in steps] + [solution.get("final_answer", "")]
+        urls = await latex_service.render_many(expressions)
+        for step, url in zip(steps, urls):
+            step["math_image"] = url
+        solution["final_answer_image"] = urls[-1]
+    
     async def _generate_step_images(
         self,
         solution: Dict[str, Any],
         notation: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generate explanatory images for each step using Manus AI"""
-        
+        """
+        Generate explanatory images for each step using Manus AI.
+        Steps run concurrently (EXPLANATION_IMAGE_CONCURRENCY at a time); an image not
+        ready within EXPLANATION_IMAGE_DEADLINE seconds of its generation starting is
+        cancelled and left as None (time queued behind the semaphore doesn't count).
+        """
         steps = solution.get("steps", [])
         notation_used = solution.get("notation_used", [])
+        semaphore = asyncio.Semaphore(max(1, settings.EXPLANATION_IMAGE_CONCURRENCY))
         
-        for step in steps:
-            visual_desc = step.get("visual_description", "")
-            math_content = step.get("math_content", "")
-            
-            if visual_desc:
+        async def generate(step: Dict[str, Any]) -> None:
+            async with semaphore:
                 try:
-                    image_url = await self._generate_math_image(
-                        visual_desc,
-                        math_content,
-                        notation_used
+                    step["generated_image"] = await asyncio.wait_for(
+                        self._generate_math_image(
+                            step.get("visual_description", ""),
+                            step.get("math_content", ""),
+                            notation_used
+                        ),
+                        timeout=settings.EXPLANATION_IMAGE_DEADLINE
                     )
-                    step["generated_image"] = image_url
+                except asyncio.TimeoutError:
+                    print(f"[Explanation] Image for step {step.get('step_number')} missed the deadline")
                 except Exception as e:
                     print(f"[Explanation] Failed to generate image for step {step.get('step_number')}: {e}")
-                    step["generated_image"] = None
-            else:
-                step["generated_image"] = None
+        
+        for step in steps:
+            step["generated_image"] = None
+        await asyncio.gather(*(generate(step) for step in steps if step.get("visual_description")))
         
         return solution
     
+    def _issue_image_tickets(self, solution: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Attach an image_ticket to every step with a visual description instead of
+        generating images. Tickets are content hashes, so identical steps share one image.
+        """
+        notation_used = solution.get("notation_used", [])
+        for step in solution.get("steps", []):
+            step["generated_image"] = None
+            step["image_ticket"] = None
+            description = step.get("visual_description", "")
+            if not description:
+                continue
+            params = {
+                "description": description,
+                "math_content": step.get("math_content", ""),
+                "notation": notation_used
+            }
+            ticket = make_cache_key("step-image", [], **params)[:32]
+            self._tickets[ticket] = params
+            self._tickets.move_to_end(ticket)
+            step["image_ticket"] = ticket
+        while len(self._tickets) > settings.EXPLANATION_IMAGE_TICKETS:
+            self._tickets.popitem(last=False)
+        return solution
+    
+    async def get_step_image(self, ticket: str) -> Dict[str, Any]:
+        """
+        Resolve an image ticket: generated on first request, then served from cache.
+        Concurrent requests share one generation; if it isn't done within
+        EXPLANATION_IMAGE_DEADLINE it keeps running and {"ready": False} is returned.
+        Raises KeyError for unknown tickets.
+        """
+        cached = await self._image_cache.get(ticket)
+        if cached is not None:
+            return {"ready": True, "image_url": cached}
+        
+        task = self._image_tasks.get(ticket)
+        if task is None:
+            params = self._tickets[ticket]
+            task = asyncio.ensure_future(self._generate_ticket_image(ticket, params))
+            self._image_tasks[ticket] = task
+        
+        try:
+            image_url = await asyncio.wait_for(asyncio.shield(task), timeout=settings.EXPLANATION_IMAGE_DEADLINE)
+        except asyncio.TimeoutError:
+            return {"ready": False, "image_url": None}
+        return {"ready": True, "image_url": image_url}
+    
+    async def _generate_ticket_image(self, ticket: str, params: Dict[str, Any]) -> Optional[str]:
+        try:
+            image_url = await self._generate_math_image(
+                params["description"],
+                params["math_content"],
+                params["notation"]
+            )
+        except Exception as e:
+            print(f"[Explanation] Image for ticket {ticket} failed: {e}")
+            return None
+        finally:
+            self._image_tasks.pop(ticket, None)
+        if image_url:
+            await self._image_cache.set(ticket, image_url)
+        return image_url
+    
     async def _generate_math_image(
         self,
         description: str,
         math_content: str,
         notation: List[str]
     ) -> Optional[str]:
-        """Generate a mathematical explanation image using Manus AI or DALL-E"""
+        """Render a mathematical explanation image locally, or generate one using Manus AI or DALL-E"""
+        local_image = await diagram_service.render(description, math_content)
+        if local_image:
+            return local_image
         
         # Create a detailed prompt for image generation
         prompt = f"""Create a clean, educational mathematical diagram:
@@ -210,56 +374,56 @@ Style requirements:
         if not self.manus_key:
             raise Exception("Manus API key not configured")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.MANUS_API_BASE_URL}/images/generations",
-                headers={
-                    "Authorization": f"Bearer {self.manus_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "manus-image-1",
-                    "prompt": prompt,
-                    "n": 1,
-                    "size": "1024x1024",
-                    "response_format": "url"
-                },
-                timeout=120.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data["data"][0]["url"]
-            else:
-                raise Exception(f"Manus AI error: {response.status_code}")
+        client = http_clients.get(settings.MANUS_API_BASE_URL)
+        response = await client.post(
+            f"{settings.MANUS_API_BASE_URL}/images/generations",
+            headers={
+                "Authorization": f"Bearer {self.manus_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "manus-image-1",
+                "prompt": prompt,
+                "n": 1,
+                "size": "1024x1024",
+                "response_format": "url"
+            },
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data["data"][0]["url"]
+        else:
+            raise Exception(f"Manus AI error: {response.status_code}")
     
     async def _dalle_image_generation(self, prompt: str) -> str:
         """Fallback: Generate image using DALL-E"""
         if not self.openai_key:
             raise Exception("OpenAI API key not configured")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/images/generations",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "dall-e-3",
-                    "prompt": prompt,
-                    "n": 1,
-                    "size": "1024x1024",
-                    "quality": "standard"
-                },
-                timeout=120.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data["data"][0]["url"]
-            else:
-                raise Exception(f"DALL-E error: {response.text}")
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/images/generations",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "dall-e-3",
+                "prompt": prompt,
+                "n": 1,
+                "size": "1024x1024",
+                "quality": "standard"
+            },
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data["data"][0]["url"]
+        else:
+            raise Exception(f"DALL-E error: {response.text}")
 
 
 explanation_service = ExplanationService()
@@ -1,11 +1,14 @@
 """
 Flashcard Service - Generate study flashcards from topics or problems
 """
-from typing import Optional, Dict, Any, List
-import httpx
+from typing import Optional, Dict, Any, List, AsyncGenerator
 import json
 
 from app.core.config import settings
+from app.core.cache import llm_cache, make_cache_key
+from app.core.http_client import http_clients
+from app.core.json_stream import iter_openai_deltas, stream_cached_json_items
+from app.services.image_service import image_service
 
 
 class FlashcardService:
@@ -14,16 +17,14 @@ class FlashcardService:
     def __init__(self):
         self.openai_key = settings.OPENAI_API_KEY
     
-    async def generate_flashcards(
+    def _build_flashcard_messages(
         self,
         topic: str,
         context: Optional[str] = None,
         image: Optional[str] = None,
         num_cards: int = 5
-    ) -> Dict[str, Any]:
-        """
-        Generate study flashcards from a topic or problem.
-        """
+    ) -> List[Dict[str, Any]]:
+        """Build the chat messages for flashcard generation"""
         system_prompt = f"""You are an expert educator creating study flashcards.
 Generate {num_cards} flashcards based on the given topic or problem.
 
@@ -69,28 +70,83 @@ GUIDELINES:
         else:
             messages.append({"role": "user", "content": user_content})
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 2500,
-                    "response_format": {"type": "json_object"}
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                return json.loads(content)
-            else:
-                raise Exception(f"OpenAI error: {response.text}")
+        return messages
+    
+    async def generate_flashcards(
+        self,
+        topic: str,
+        context: Optional[str] = None,
+        image: Optional[str] = None,
+        num_cards: int = 5
+    ) -> Dict[str, Any]:
+        """
+        Generate study flashcards from a topic or problem.
+        """
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_flashcard_messages(topic, context, image, num_cards)
+        
+        cache_key = make_cache_key("gpt-4o", messages, max_tokens=2500)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Flashcards] Cache hit")
+            return cached
+        
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 2500,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            result = json.loads(content)
+            await llm_cache.set(cache_key, result)
+            return result
+        else:
+            raise Exception(f"OpenAI error: {response.text}")
+
+    async def stream_flashcards(
+        self,
+        topic: str,
+        context: Optional[str] = None,
+        image: Optional[str] = None,
+        num_cards: int = 5
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Streaming variant of generate_flashcards.
+        Yields a "card" event per flashcard as soon as it is complete, then "done" with the full set.
+        """
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_flashcard_messages(topic, context, image, num_cards)
+        cache_key = make_cache_key("gpt-4o", messages, max_tokens=2500)
+        
+        deltas = lambda: iter_openai_deltas(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            payload={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 2500,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60.0
+        )
+        async for event in stream_cached_json_items(cache_key, deltas, "cards", "card"):
+            yield event
 
 
 flashcard_service = FlashcardService()
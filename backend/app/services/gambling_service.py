@@ -2,11 +2,13 @@
 Gambling Service - Educational gambling advisor that demonstrates why gambling is bad
 by acting as an overly enthusiastic gambler while showing the harsh math reality
 """
-from typing import Optional, Dict, Any, List
-import httpx
+from typing import Optional, Dict, Any, List, AsyncGenerator
 import json
 
 from app.core.config import settings
+from app.core.http_client import http_clients
+from app.core.json_stream import iter_openai_deltas, stream_json_items
+from app.services.image_service import image_service
 
 
 class GamblingService:
@@ -15,15 +17,13 @@ class GamblingService:
     def __init__(self):
         self.openai_key = settings.OPENAI_API_KEY
     
-    async def analyze_gambling_scenario(
+    def _build_scenario_messages(
         self,
         scenario: str,
         image: Optional[str] = None,
         conversation_history: Optional[List[Dict[str, str]]] = None
-    ) -> Dict[str, Any]:
-        """
-        Analyze a gambling scenario with enthusiastic 
-        """
+    ) -> List[Dict[str, Any]]:
+        """Build the chat messages for Lucky Larry's scenario analysis"""
         system_prompt = """You are "Lucky Larry" - a DEGENERATE GAMBLER advisor who is WAY too enthusiastic about gambling. 
 You're meant to be SATIRICAL - showing users why gambling is the key by embodying the gambler's perfect mindset.
 
@@ -98,28 +98,71 @@ IMPORTANT: If there is prior conversation history, acknowledge and build upon it
         else:
             messages.append({"role": "user", "content": f"Analyze this gambling scenario: {scenario}"})
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 2000,
-                    "response_format": {"type": "json_object"}
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                return json.loads(content)
-            else:
-                raise Exception(f"OpenAI error: {response.text}")
+        return messages
+    
+    async def analyze_gambling_scenario(
+        self,
+        scenario: str,
+        image: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze a gambling scenario with enthusiastic 
+        """
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_scenario_messages(scenario, image, conversation_history)
+        
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 2000,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            return json.loads(content)
+        else:
+            raise Exception(f"OpenAI error: {response.text}")
+
+    async def stream_gambling_scenario(
+        self,
+        scenario: str,
+        image: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Streaming variant of analyze_gambling_scenario.
+        Yields a "scenario" event per outcome as soon as it is complete, then "done" with the full analysis.
+        """
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_scenario_messages(scenario, image, conversation_history)
+        deltas = iter_openai_deltas(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            payload={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 2000,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60.0
+        )
+        async for event in stream_json_items(deltas, "scenarios", "scenario"):
+            yield event
 
 
 gambling_service = GamblingService()
@@ -1,13 +1,40 @@
 """
 Image Service - Handles image processing
+Downscales and recompresses images to the resolution each vision provider
+actually uses, off the event loop.
 """
-from typing import Optional
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import base64
+import hashlib
+import io
+
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow missing - images are passed through unchanged
+    Image = None
+
+_MAGIC = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
 
 
 class ImageService:
     """Service for image processing operations"""
     
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.IMAGE_RESIZE_WORKERS),
+            thread_name_prefix="image-resize"
+        )
+        self._prepared: "OrderedDict[str, str]" = OrderedDict()  # (image hash, provider) -> result
+    
     def process_image(self, base64_data: str) -> dict:
         """
         Process an uploaded image
@@ -30,14 +57,169 @@ class ImageService:
                 "error": str(e)
             }
     
+    @staticmethod
+    def split_image(image: str) -> Tuple[str, str]:
+        """
+        (mime type, base64 payload) of a data URL or raw base64 image
+        Raw base64 has no declared type, so it is sniffed from the magic bytes
+        """
+        if image.startswith("data:"):
+            header, _, payload = image.partition(",")
+            return header[5:].split(";")[0] or "image/jpeg", payload
+        try:
+            head = base64.b64decode(image[:16])
+        except Exception:
+            head = b""
+        for magic, mime_type in _MAGIC:
+            if head.startswith(magic):
+                return mime_type, image
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return "image/webp", image
+        return "image/jpeg", image
+    
+    def target_for(self, provider: str) -> Tuple[int, int, str]:
+        """(max long side, max short side, output format) for a provider"""
+        targets = settings.IMAGE_TARGETS
+        long_side, short_side = targets.get(provider, targets["default"])
+        formats = settings.IMAGE_FORMATS
+        return long_side, short_side, formats.get(provider, formats["default"]).upper()
+    
+    def resize_bytes(
+        self,
+        data: bytes,
+        max_long: int,
+        max_short: int,
+        fmt: str = "JPEG",
+        quality: int = 85
+    ) -> Optional[Tuple[bytes, str]]:
+        """
+        Downscale so the long/short sides fit the limits and re-encode.
+        Returns (bytes, mime type), or None when the input is already small enough.
+        """
+        if Image is None:
+            return None
+        
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+            downscale = scale < 1.0
+            if not downscale and len(data) <= settings.IMAGE_RECOMPRESS_MIN_BYTES:
+                return None
+            
+            # Let the JPEG decoder downsample while decoding (much cheaper than a full decode)
+            img.draft("RGB", (max(1, int(width * scale)), max(1, int(height * scale))))
+            img = ImageOps.exif_transpose(img)
+            width, height = img.size
+            scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+            if scale < 1.0:
+                img = img.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+            
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+                # Flatten transparency onto white - JPEG has no alpha channel
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.split()[-1])
+            elif img.mode not in ("RGB", "RGBA", "L"):
+                img = img.convert("RGBA")
+            
+            out = io.BytesIO()
+            img.save(out, format=fmt, quality=quality, optimize=True)
+        
+        result = out.getvalue()
+        if not downscale and len(result) >= len(data):
+            return None
+        return result, f"image/{fmt.lower()}"
+    
     def resize_image(
         self,
         base64_data: str,
         max_width: int = 1920,
-        max_height: int = 1080
+        max_height: int = 1080,
+        fmt: str = "JPEG",
+        quality: int = 85
     ) -> str:
         """
         Resize image if too large
-        TODO: Implement with Pillow
+        Accepts a data URL or raw base64 and returns the same form
         """
-        return base64_data
+        is_data_url = base64_data.startswith("data:")
+        raw = base64_data.split(",", 1)[1] if is_data_url else base64_data
+        try:
+            resized = self.resize_bytes(
+                base64.b64decode(raw),
+                max(max_width, max_height),
+                min(max_width, max_height),
+                fmt,
+                quality
+            )
+        except Exception as e:
+            print(f"[Image] Resize failed, sending original: {e}")
+            return base64_data
+        if resized is None:
+            return base64_data
+        data, mime_type = resized
+        encoded = base64.b64encode(data).decode("utf-8")
+        return f"data:{mime_type};base64,{encoded}" if is_data_url else encoded
+    
+    async def prepare_upload(self, data: bytes, mime_type: str, provider: str = "default") -> Tuple[bytes, str]:
+        """Resize raw uploaded bytes in the worker pool; returns (bytes, mime type)"""
+        if not settings.IMAGE_RESIZE_ENABLED:
+            return data, mime_type
+        long_side, short_side, fmt = self.target_for(provider)
+        loop = asyncio.get_running_loop()
+        try:
+            resized = await loop.run_in_executor(
+                self._executor,
+                self.resize_bytes,
+                data,
+                long_side,
+                short_side,
+                fmt,
+                settings.IMAGE_QUALITY
+            )
+        except Exception as e:
+            print(f"[Image] Upload resize failed, keeping original: {e}")
+            return data, mime_type
+        return resized or (data, mime_type)
+    
+    async def prepare_image(self, image: Optional[str], provider: str = "default") -> Optional[str]:
+        """Resize an image for `provider` in the worker pool (URLs pass through)"""
+        if not image or not settings.IMAGE_RESIZE_ENABLED or image.startswith("http"):
+            return image
+        
+        key = f"{hashlib.sha256(image.encode()).hexdigest()}:{provider}"
+        prepared = self._prepared.get(key)
+        if prepared is not None:
+            self._prepared.move_to_end(key)
+            return prepared
+        
+        long_side, short_side, fmt = self.target_for(provider)
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(
+            self._executor,
+            self.resize_image,
+            image,
+            long_side,
+            short_side,
+            fmt,
+            settings.IMAGE_QUALITY
+        )
+        if len(prepared) < len(image):
+            print(f"[Image] {provider}: {len(image) // 1024}KB -> {len(prepared) // 1024}KB")
+        
+        self._prepared[key] = prepared
+        while len(self._prepared) > 32:
+            self._prepared.popitem(last=False)
+        return prepared
+    
+    async def prepare_images(
+        self,
+        images: Optional[List[str]],
+        provider: str = "default"
+    ) -> Optional[List[str]]:
+        if not images:
+            return images
+        return list(await asyncio.gather(*(self.prepare_image(image, provider) for image in images)))
+
+
+image_service = ImageService()
@@ -0,0 +1,125 @@
+"""
+LaTeX Service - Server-side rasterization of math expressions
+Each expression (pure LaTeX or a text line with $..$ math) is typeset once by
+the diagram renderer's worker pool and stored as SVG/PNG under a hash of the
+expression and style. The disk caches evict least recently used files, and the
+returned /api/media URLs are stable, so clients and the slideshow renderer can
+reuse pre-rendered math.
+"""
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import hashlib
+import os
+
+from app.core.config import settings
+from app.core.disk_cache import DiskCache
+from app.core.media_store import media_store
+from app.services.diagram_service import diagram_service, plan_expression
+
+
+class LatexService:
+    """Renders LaTeX to cached SVG/PNG media"""
+
+    FORMATS = ("svg", "png")
+
+    def __init__(self):
+        self.caches: Dict[str, DiskCache] = {
+            "svg": DiskCache(
+                settings.LATEX_CACHE_DIR or os.path.join(settings.VIDEO_OUTPUT_DIR, "latex"),
+                settings.LATEX_CACHE_MAX_BYTES,
+                extension="svg"
+            ),
+            # PNGs share the diagram cache (media ids are resolved by extension)
+            "png": diagram_service.cache,
+        }
+        media_store.register(self.caches["svg"])
+        self._tasks: Dict[str, asyncio.Task] = {}  # cache key -> in-flight render
+        self._failed: "OrderedDict[str, None]" = OrderedDict()  # keys mathtext couldn't typeset
+
+    @staticmethod
+    def key(expression: str, fmt: str, color: str, size: int) -> str:
+        """Content address for an expression in a given style"""
+        material = f"latex\x00{fmt}\x00{color}\x00{size}\x00{settings.DIAGRAM_DPI}\x00{expression.strip()}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def render(
+        self,
+        expression: str,
+        fmt: Optional[str] = None,
+        color: Optional[str] = None,
+        size: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        /api/media URL of the typeset expression, or None if it is empty, too long
+        or can't be typeset (clients then render it themselves).
+        """
+        fmt = fmt or settings.LATEX_FORMAT
+        if fmt not in self.caches:
+            raise ValueError(f"Unsupported format '{fmt}'")
+        if not settings.LATEX_RENDER_ENABLED or not diagram_service.available:
+            return None
+        if not expression or not expression.strip() or len(expression) > settings.LATEX_MAX_CHARS:
+            return None
+
+        color = color or "black"
+        size = size or settings.LATEX_FONT_SIZE
+        cache = self.caches[fmt]
+        key = self.key(expression, fmt, color, size)
+        if key in self._failed:
+            return None
+        if await cache.locate(key):
+            return media_store.url_for(cache, key)
+
+        # Identical expressions (e.g. repeated slide lines) share one render
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._rasterize(key, cache, expression, fmt, color, size))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def render_many(
+        self,
+        expressions: List[str],
+        fmt: Optional[str] = None,
+        color: Optional[str] = None,
+        size: Optional[int] = None
+    ) -> List[Optional[str]]:
+        """URLs for several expressions, in order"""
+        return list(await asyncio.gather(*(self.render(expression, fmt, color, size) for expression in expressions)))
+
+    async def _rasterize(
+        self,
+        key: str,
+        cache: DiskCache,
+        expression: str,
+        fmt: str,
+        color: str,
+        size: int
+    ) -> Optional[str]:
+        spec = plan_expression(expression)
+        if spec is None:
+            return None
+        spec.update(color=color, size=size, transparent=True, pad=0.05)
+        try:
+            data = await diagram_service.rasterize(spec, fmt)
+        except asyncio.TimeoutError:
+            print(f"[LaTeX] Timed out typesetting {expression[:60]!r}")
+            return None
+        except BrokenProcessPool:
+            # Other renders' timeouts restarted the pool under this one twice - not its fault
+            print(f"[LaTeX] Worker pool restarted while typesetting {expression[:60]!r}")
+            return None
+        except Exception as e:
+            print(f"[LaTeX] Could not typeset {expression[:60]!r}: {' '.join(str(e).split())[:200]}")
+            self._failed[key] = None
+            while len(self._failed) > 1000:
+                self._failed.popitem(last=False)
+            return None
+        await cache.put(key, data)
+        return media_store.url_for(cache, key)
+
+
+latex_service = LatexService()
@@ -0,0 +1,192 @@
+"""
+PDF Service - Text extraction off the event loop
+Pages are parsed in a bounded process pool (large documents are split into
+page ranges that run in parallel) and results are cached by content hash.
+iter_pages streams selected pages in order for page-by-page responses.
+A worker call that overruns PDF_EXTRACT_TIMEOUT gets its pool restarted, so a
+stuck document can't keep workers busy for later uploads; chunks of other
+documents killed by the restart are retried.
+"""
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+
+from app.core.cache import ResponseCache
+from app.core.config import settings
+from app.core.process_pool import WorkerPool
+
+
+def _extract_pages(content: bytes, start: int, stop: Optional[int]) -> Tuple[int, List[str]]:
+    """Worker: (total page count, text of pages [start, stop)) - runs in a child process"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    total = len(reader.pages)
+    stop = total if stop is None else min(stop, total)
+    return total, [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _count_pages(path: str) -> int:
+    """Worker: number of pages in the PDF at `path`"""
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_page_list(path: str, indices: List[int]) -> List[str]:
+    """Worker: text of the given 0-based pages of the PDF at `path`"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in indices]
+
+
+PageRanges = List[Tuple[int, Optional[int]]]
+
+
+def parse_page_ranges(spec: Optional[str]) -> Optional[PageRanges]:
+    """
+    Parse "1-5,8,12-" (1-based, inclusive, open-ended allowed) into (first, last) pairs.
+    None/empty means all pages; raises ValueError on malformed input.
+    """
+    if not spec or not spec.strip():
+        return None
+    ranges: PageRanges = []
+    for part in spec.split(","):
+        part = part.strip()
+        first, sep, last = part.partition("-")
+        first_page = int(first)
+        last_page = (int(last) if last.strip() else None) if sep else first_page
+        if first_page < 1 or (last_page is not None and last_page < first_page):
+            raise ValueError(f"Invalid page range '{part}'")
+        ranges.append((first_page, last_page))
+    return ranges
+
+
+def select_pages(ranges: Optional[PageRanges], total: int) -> List[int]:
+    """0-based page indices selected by `ranges`, in document order (out-of-range pages dropped)"""
+    if ranges is None:
+        return list(range(total))
+    selected = set()
+    for first, last in ranges:
+        selected.update(range(first - 1, min(total, last if last is not None else total)))
+    return sorted(selected)
+
+
+class PdfService:
+    """Extracts PDF text in worker processes with timeouts and caching"""
+
+    def __init__(self):
+        self.workers = WorkerPool("PDF", settings.PDF_WORKERS)
+        self.cache = ResponseCache(
+            "pdf",
+            max_entries=settings.PDF_CACHE_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+        )
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    async def _run(self, fn, *args) -> Any:
+        return await self.workers.run(settings.PDF_EXTRACT_TIMEOUT, fn, *args)
+
+    async def extract_pages(self, content: bytes, content_hash: Optional[str] = None) -> List[str]:
+        """
+        Text per page (empty string for pages without text).
+        Raises asyncio.TimeoutError if a worker spends longer than PDF_EXTRACT_TIMEOUT on it.
+        """
+        key = content_hash or self.content_hash(content)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            print(f"[PDF] Cache hit ({len(cached)} pages)")
+            return cached
+
+        pages = await self._extract_all(content)
+        await self.cache.set(key, pages)
+        return pages
+
+    async def _extract_all(self, content: bytes) -> List[str]:
+        chunk = max(1, settings.PDF_PAGES_PER_TASK)
+        # The first chunk also tells us the page count; the rest fan out across the pool
+        total, pages = await self._run(_extract_pages, content, 0, chunk)
+        if total > chunk:
+            print(f"[PDF] {total} pages, extracting in {(total + chunk - 1) // chunk} parallel chunks")
+            tasks = [
+                asyncio.ensure_future(self._run(_extract_pages, content, start, start + chunk))
+                for start in range(chunk, total, chunk)
+            ]
+            try:
+                rest = await asyncio.gather(*tasks)
+            except BaseException:
+                # One chunk failed - the others are of no use any more
+                for task in tasks:
+                    task.cancel()
+                raise
+            for _, texts in rest:
+                pages.extend(texts)
+        return pages
+
+    async def iter_pages(
+        self,
+        content: bytes,
+        ranges: Optional[PageRanges] = None,
+        content_hash: Optional[str] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream page texts in order: "meta" ({"pages", "selected"}), one "page"
+        ({"page", "text"}) per selected page, then "done".
+        Only PDF_WORKERS chunks of PDF_STREAM_PAGES_PER_TASK pages are in flight at a
+        time, so memory stays bounded regardless of document size.
+        """
+        cached = await self.cache.get(content_hash or self.content_hash(content))
+        if cached is not None:
+            indices = select_pages(ranges, len(cached))
+            yield {"event": "meta", "data": {"pages": len(cached), "selected": len(indices)}}
+            for i in indices:
+                yield {"event": "page", "data": {"page": i + 1, "text": cached[i]}}
+            yield {"event": "done", "data": {"pages": len(indices)}}
+            return
+
+        # Workers open the file by path instead of receiving the bytes with every chunk
+        path = await asyncio.to_thread(self._spool, content)
+        in_flight: deque = deque()
+        try:
+            total = await self._run(_count_pages, path)
+            indices = select_pages(ranges, total)
+            yield {"event": "meta", "data": {"pages": total, "selected": len(indices)}}
+
+            chunk = max(1, settings.PDF_STREAM_PAGES_PER_TASK)
+            batches = deque(indices[k:k + chunk] for k in range(0, len(indices), chunk))
+            while batches or in_flight:
+                while batches and len(in_flight) < self.workers.workers:
+                    batch = batches.popleft()
+                    in_flight.append((batch, asyncio.ensure_future(self._run(_extract_page_list, path, batch))))
+                batch, task = in_flight.popleft()
+                texts = await task
+                for i, text in zip(batch, texts):
+                    yield {"event": "page", "data": {"page": i + 1, "text": text}}
+
+            yield {"event": "done", "data": {"pages": len(indices)}}
+        finally:
+            # Running chunks keep their worker until they finish (or overrun and get killed)
+            for _, task in in_flight:
+                task.cancel()
+            os.remove(path)
+
+    @staticmethod
+    def _spool(content: bytes) -> str:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        return path
+
+    def shutdown(self) -> None:
+        self.workers.shutdown()
+
+
+pdf_service = PdfService()
@@ -1,12 +1,19 @@
 """
 Reasoning Service - Interactive step-by-step explanations with images and TTS
 """
-from typing import List, Optional, Dict, Any
-import httpx
+from typing import List, Optional, Dict, Any, AsyncGenerator, Set
+import asyncio
 import json
-import base64
 
 from app.core.config import settings
+from app.core.audio_cache import audio_cache
+from app.core.media_store import media_store
+from app.core.cache import ResponseCache, llm_cache, make_cache_key
+from app.core.http_client import http_clients
+from app.core.json_stream import iter_openai_deltas, stream_cached_json_items
+from app.services.diagram_service import diagram_service
+from app.services.image_service import image_service
+from app.services.latex_service import latex_service
 
 
 class ReasoningService:
@@ -15,16 +22,22 @@ class ReasoningService:
     def __init__(self):
         self.openai_key = settings.OPENAI_API_KEY
         self.hume_key = settings.HUME_API_KEY
+        # Speech for analysed steps is synthesized ahead of the /speak calls
+        self._speech_cache = ResponseCache(
+            "speech",
+            max_entries=settings.REASONING_SPEECH_CACHE_ENTRIES,
+            ttl_seconds=settings.REASONING_SPEECH_CACHE_TTL
+        )
+        self._speech_tasks: Dict[str, asyncio.Task] = {}  # text -> in-flight synthesis
+        self._prefetch_semaphore: Optional[asyncio.Semaphore] = None
+        self._queued_prefetches: Set[asyncio.Task] = set()  # prefetches waiting for the semaphore
     
-    async def analyze_problem(
+    def _build_analysis_messages(
         self,
         problem: str,
         image: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """
-        Analyze a problem and return structured steps.
-        Returns a plan with steps that can be revealed one at a time.
-        """
+    ) -> List[Dict[str, Any]]:
+        """Build the chat messages for problem analysis"""
         system_prompt = """You are an expert tutor. Analyze this problem and create a detailed step-by-step solution.
 
 Return your response as JSON with this EXACT structure:
@@ -78,40 +91,115 @@ CRITICAL FORMATTING RULES:
         else:
             messages.append({"role": "user", "content": f"Analyze this problem: {problem}"})
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 2000,
-                    "response_format": {"type": "json_object"}
-                },
-                timeout=60.0
-            )
-            
-            print(f"[Reasoning] OpenAI response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError as e:
-                    print(f"[Reasoning] JSON parse error: {e}")
-                    print(f"[Reasoning] Raw content: {content[:500]}")
-                    raise Exception(f"Invalid JSON response from AI: {e}")
-            else:
-                error_detail = response.text
-                print(f"[Reasoning] OpenAI API Error: {error_detail}")
-                raise Exception(f"OpenAI error: {error_detail}")
+        return messages
+    
+    async def analyze_problem(
+        self,
+        problem: str,
+        image: Optional[str] = None,
+        render_math: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Analyze a problem and return structured steps.
+        Returns a plan with steps that can be revealed one at a time.
+        render_math attaches math_image / final_answer_image (pre-rendered LaTeX URLs).
+        """
+        result = await self._analyze(problem, image)
+        if render_math:
+            await self._render_math(result)
+        return result
+    
+    async def _render_math(self, result: Dict[str, Any]) -> None:
+        steps = result.get("steps") or []
+        urls = await latex_service.render_many([step.get("math", "") for step in steps] + [result.get("final_answer", "")])
+        for step, url in zip(steps, urls):
+            step["math_image"] = url
+        result["final_answer_image"] = urls[-1]
+    
+    async def _analyze(self, problem: str, image: Optional[str] = None) -> Dict[str, Any]:
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_analysis_messages(problem, image)
+        
+        cache_key = make_cache_key("gpt-4o", messages, max_tokens=2000)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Reasoning] Cache hit")
+            self.prefetch_speech(cached)
+            return cached
+        
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 2000,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60.0
+        )
+        
+        print(f"[Reasoning] OpenAI response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            try:
+                result = json.loads(content)
+            except json.JSONDecodeError as e:
+                print(f"[Reasoning] JSON parse error: {e}")
+                print(f"[Reasoning] Raw content: {content[:500]}")
+                raise Exception(f"Invalid JSON response from AI: {e}")
+            await llm_cache.set(cache_key, result)
+            self.prefetch_speech(result)
+            return result
+        else:
+            error_detail = response.text
+            print(f"[Reasoning] OpenAI API Error: {error_detail}")
+            raise Exception(f"OpenAI error: {error_detail}")
+    
+    async def stream_analysis(
+        self,
+        problem: str,
+        image: Optional[str] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Streaming variant of analyze_problem.
+        Yields a "step" event per step as soon as it is complete, then "done" with the full plan.
+        """
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._build_analysis_messages(problem, image)
+        cache_key = make_cache_key("gpt-4o", messages, max_tokens=2000)
+        
+        deltas = lambda: iter_openai_deltas(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            payload={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 2000,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60.0
+        )
+        async for event in stream_cached_json_items(cache_key, deltas, "steps", "step"):
+            if event["event"] == "done":
+                self.prefetch_speech(event["data"])
+            yield event
     
     async def generate_step_image(self, image_prompt: str) -> Optional[str]:
-        """Generate a simple diagram for a step using DALL-E"""
+        """Render a simple diagram for a step locally, falling back to DALL-E"""
+        local_image = await diagram_service.render(image_prompt)
+        if local_image:
+            return local_image
+        
         if not self.openai_key:
             return None
             
@@ -126,97 +214,163 @@ Style:
 - Educational and clean"""
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.openai.com/v1/images/generations",
-                    headers={
-                        "Authorization": f"Bearer {self.openai_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "dall-e-3",
-                        "prompt": full_prompt,
-                        "n": 1,
-                        "size": "1024x1024",
-                        "quality": "standard"
-                    },
-                    timeout=60.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["data"][0]["url"]
+            client = http_clients.get("https://api.openai.com")
+            response = await client.post(
+                "https://api.openai.com/v1/images/generations",
+                headers={
+                    "Authorization": f"Bearer {self.openai_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "dall-e-3",
+                    "prompt": full_prompt,
+                    "n": 1,
+                    "size": "1024x1024",
+                    "quality": "standard"
+                },
+                timeout=60.0
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                return data["data"][0]["url"]
         except Exception as e:
             print(f"[Reasoning] Image generation failed: {e}")
         
         return None
     
     async def generate_speech(self, text: str) -> Optional[str]:
-        """Generate speech using Hume AI or OpenAI TTS"""
+        """Generate speech using Hume AI or OpenAI TTS; returns a /api/media URL"""
+        cached = await self._speech_cache.get(self._speech_key(text))
+        if cached is not None:
+            print(f"[Reasoning] Speech prefetch hit")
+            return cached
+        
+        # Join a prefetch (or concurrent request) already synthesizing this text;
+        # a prefetch still queued behind earlier steps is replaced by a direct synthesis
+        task = self._speech_tasks.get(text)
+        if task is not None and task in self._queued_prefetches:
+            task.cancel()
+            task = None
+        if task is None:
+            task = self._start_speech(text)
+        return await asyncio.shield(task)
+    
+    def prefetch_speech(self, result: Dict[str, Any]) -> None:
+        """Start synthesizing each step's explanation in the background (fire and forget)"""
+        if not settings.REASONING_SPEECH_PREFETCH or not (self.hume_key or self.openai_key):
+            return
+        if self._prefetch_semaphore is None:
+            self._prefetch_semaphore = asyncio.Semaphore(max(1, settings.REASONING_SPEECH_PREFETCH_CONCURRENCY))
+        
+        steps = result.get("steps") or []
+        for step in steps[:settings.REASONING_SPEECH_PREFETCH_STEPS]:
+            text = step.get("explanation") if isinstance(step, dict) else None
+            if text and text not in self._speech_tasks:
+                self._start_speech(text, self._prefetch_semaphore)
+    
+    def _start_speech(self, text: str, semaphore: Optional[asyncio.Semaphore] = None) -> asyncio.Task:
+        task = asyncio.ensure_future(self._synthesize_speech(text, semaphore))
+        self._speech_tasks[text] = task
+        task.add_done_callback(lambda done: self._speech_tasks.get(text) is done and self._speech_tasks.pop(text))
+        return task
+    
+    @staticmethod
+    def _speech_key(text: str) -> str:
+        return make_cache_key("speech", [], text=text)
+    
+    async def _synthesize_speech(self, text: str, semaphore: Optional[asyncio.Semaphore] = None) -> Optional[str]:
+        if semaphore is not None:
+            task = asyncio.current_task()
+            self._queued_prefetches.add(task)
+            try:
+                await semaphore.acquire()
+            finally:
+                self._queued_prefetches.discard(task)
+            try:
+                url = await self._synthesize_speech(text)
+            finally:
+                semaphore.release()
+            if url:
+                print(f"[Reasoning] Prefetched speech ({len(text)} chars)")
+            return url
+        
+        url = await self._tts_to_media(text)
+        if url:
+            await self._speech_cache.set(self._speech_key(text), url)
+        return url
+    
+    async def _tts_to_media(self, text: str) -> Optional[str]:
+        hume_cache_key = audio_cache.key(text, "ITO", 1.0, "hume-tts")
+        openai_cache_key = audio_cache.key(text, "nova", 1.0, "tts-1")
+        for cache_key in (hume_cache_key, openai_cache_key):
+            if await audio_cache.locate(cache_key):
+                print(f"[Reasoning] Audio cache hit")
+                return media_store.url_for(audio_cache, cache_key)
         
         # Try Hume AI first
         if self.hume_key:
             try:
-                return await self._hume_tts(text)
+                audio_bytes = await self._hume_tts(text)
+                await audio_cache.put(hume_cache_key, audio_bytes)
+                return media_store.url_for(audio_cache, hume_cache_key)
             except Exception as e:
                 print(f"[Reasoning] Hume TTS failed: {e}")
         
         # Fallback to OpenAI TTS
         if self.openai_key:
             try:
-                return await self._openai_tts(text)
+                audio_bytes = await self._openai_tts(text)
+                await audio_cache.put(openai_cache_key, audio_bytes)
+                return media_store.url_for(audio_cache, openai_cache_key)
             except Exception as e:
                 print(f"[Reasoning] OpenAI TTS failed: {e}")
         
         return None
     
-    async def _hume_tts(self, text: str) -> str:
+    async def _hume_tts(self, text: str) -> bytes:
         """Generate speech using Hume AI"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.hume.ai/v0/tts",
-                headers={
-                    "X-Hume-Api-Key": self.hume_key,
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "text": text,
-                    "voice": "ITO",  # Hume's default voice
-                    "speed": 1.0
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                # Return base64 audio
-                audio_data = base64.b64encode(response.content).decode()
-                return f"data:audio/mp3;base64,{audio_data}"
-            else:
-                raise Exception(f"Hume API error: {response.status_code}")
+        client = http_clients.get("https://api.hume.ai")
+        response = await client.post(
+            "https://api.hume.ai/v0/tts",
+            headers={
+                "X-Hume-Api-Key": self.hume_key,
+                "Content-Type": "application/json"
+            },
+            json={
+                "text": text,
+                "voice": "ITO",  # Hume's default voice
+                "speed": 1.0
+            },
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            return response.content
+        else:
+            raise Exception(f"Hume API error: {response.status_code}")
     
-    async def _openai_tts(self, text: str) -> str:
+    async def _openai_tts(self, text: str) -> bytes:
         """Fallback: Generate speech using OpenAI TTS"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/audio/speech",
-                headers={
-                    "Authorization": f"Bearer {self.openai_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "tts-1",
-                    "input": text,
-                    "voice": "nova",  # Friendly voice
-                    "speed": 1.0
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                audio_data = base64.b64encode(response.content).decode()
-                return f"data:audio/mp3;base64,{audio_data}"
-            else:
-                raise Exception(f"OpenAI TTS error: {response.status_code}")
-
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/audio/speech",
+            headers={
+                "Authorization": f"Bearer {self.openai_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": "tts-1",
+                "input": text,
+                "voice": "nova",  # Friendly voice
+                "speed": 1.0
+            },
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            return response.content
+        else:
+            raise Exception(f"OpenAI TTS error: {response.status_code}")
 
 reasoning_service = ReasoningService()
@@ -2,69 +2,24 @@
 Slideshow Service - Blackboard-style educational videos
 Like a teacher writing on a board while explaining
 """
-from typing import Optional, Dict, Any, List
-import httpx
+from typing import Optional, Dict, Any, List, AsyncGenerator, Tuple
+import asyncio
 import json
-import base64
+import time
 import os
 import uuid
 import re
 
 from app.core.config import settings
+from app.core.audio_cache import audio_cache
+from app.core.media_store import media_store
+from app.core.http_client import http_clients
+from app.core.json_stream import IncrementalJSONArrayParser, iter_openai_deltas
+from app.services.image_service import image_service
+from app.services.latex_service import latex_service
 
 
-class SlideshowService:
-    """Generate blackboard-style educational slideshows"""
-    
-    def __init__(self):
-        self.openai_key = settings.OPENAI_API_KEY
-        self.gemini_key = settings.GEMINI_API_KEY
-        self.manus_key = settings.MANUS_API_KEY
-        self.manus_api_host = settings.MANUS_API_BASE_URL
-        self.manus_model = settings.MANUS_MODEL
-        self.hume_key = settings.HUME_API_KEY
-        self.minimax_key = settings.MINIMAX_API_KEY
-        self.minimax_api_host = "https://api.minimax.io"  # Global API
-        self.output_dir = os.path.join(settings.VIDEO_OUTPUT_DIR, "slideshows")
-        os.makedirs(self.output_dir, exist_ok=True)
-    
-    async def generate_slideshow(
-        self,
-        problem: str,
-        reasoning_analysis: Optional[Dict[str, Any]] = None,
-        image: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Generate a blackboard-style slideshow"""
-        try:
-            # Generate lesson content
-            lesson = await self._generate_lesson(problem, image)
-            
-            # Create slides
-            slides = self._create_slides(lesson)
-            
-            # Generate audio
-            slides_with_audio = await self._generate_all_audio(slides)
-            
-            return {
-                "success": True,
-                "slideshow_id": str(uuid.uuid4()),
-                "title": lesson.get("title", "Math Lesson"),
-                "slides": slides_with_audio,
-                "total_slides": len(slides_with_audio),
-                "estimated_duration": sum(s.get("duration", 15) for s in slides_with_audio)
-            }
-            
-        except Exception as e:
-            print(f"[Slideshow] Error: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"success": False, "error": str(e)}
-    
-    async def _generate_lesson(self, problem: str, image: Optional[str] = None) -> Dict[str, Any]:
-        """Generate lesson with Manus-first fallback"""
-        """Generate lesson content - Gemini first, OpenAI fallback"""
-        
-        prompt = '''You are creating an educational video like a teacher at a blackboard.
+LESSON_PROMPT = '''You are creating an educational video like a teacher at a blackboard.
 
 LOOK AT THE IMAGE and extract the ACTUAL MATH PROBLEM. The user's text is just a comment - IGNORE IT.
 
@@ -121,6 +76,242 @@ GENERATE 10-12 boards, 2-4 lines each, 40-60 words per voice.
 
 Return ONLY valid JSON, no other text.'''
 
+
+class SlideshowService:
+    """Generate blackboard-style educational slideshows"""
+    
+    def __init__(self):
+        self.openai_key = settings.OPENAI_API_KEY
+        self.gemini_key = settings.GEMINI_API_KEY
+        self.manus_key = settings.MANUS_API_KEY
+        self.manus_api_host = settings.MANUS_API_BASE_URL
+        self.manus_model = settings.MANUS_MODEL
+        self.hume_key = settings.HUME_API_KEY
+        self.minimax_key = settings.MINIMAX_API_KEY
+        self.minimax_api_host = "https://api.minimax.io"  # Global API
+        self.output_dir = os.path.join(settings.VIDEO_OUTPUT_DIR, "slideshows")
+        os.makedirs(self.output_dir, exist_ok=True)
+    
+    async def generate_slideshow(
+        self,
+        problem: str,
+        reasoning_analysis: Optional[Dict[str, Any]] = None,
+        image: Optional[str] = None,
+        render_math: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Generate a blackboard-style slideshow in a single pass:
+        lesson (one LLM call) -> slides -> audio (one TTS pass)
+        With render_math, each slide also gets line_images: a media URL per line (or None).
+        """
+        timings = {}
+        try:
+            # Stage 1: lesson content
+            started = time.perf_counter()
+            lesson = await self._generate_lesson(problem, image)
+            timings["lesson"] = round(time.perf_counter() - started, 2)
+            
+            # Stage 2: slides
+            started = time.perf_counter()
+            slides = self._create_slides(lesson)
+            timings["slides"] = round(time.perf_counter() - started, 2)
+            print(f"[Slideshow] Created {len(slides)} slides")
+            
+            if render_math:
+                started = time.perf_counter()
+                await self._render_line_images(slides)
+                timings["math"] = round(time.perf_counter() - started, 2)
+            
+            # Stage 3: audio
+            started = time.perf_counter()
+            slides_with_audio = await self._generate_all_audio(slides)
+            timings["audio"] = round(time.perf_counter() - started, 2)
+            print(f"[Slideshow] Stage timings: {timings}")
+            
+            return {
+                "success": True,
+                "slideshow_id": str(uuid.uuid4()),
+                "title": lesson.get("title", "Math Lesson"),
+                "slides": slides_with_audio,
+                "total_slides": len(slides_with_audio),
+                "estimated_duration": sum(s.get("duration", 15) for s in slides_with_audio),
+                "timings": timings
+            }
+            
+        except Exception as e:
+            print(f"[Slideshow] Error after stages {timings}: {e}")
+            import traceback
+            traceback.print_exc()
+            return {"success": False, "error": str(e)}
+    
+    async def stream_slideshow(
+        self,
+        problem: str,
+        reasoning_analysis: Optional[Dict[str, Any]] = None,
+        image: Optional[str] = None,
+        render_math: bool = False
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Streaming variant of generate_slideshow.
+        Boards are parsed out of the LLM stream as they close and their narration
+        starts immediately, so audio overlaps with the rest of the lesson generation.
+        Yields {"event": ..., "data": ...} dicts: "lesson" metadata first, then each
+        "slide" as soon as its audio is ready (with its index), "progress" in between,
+        and finally "done" (or "error").
+        """
+        timings = {}
+        pending: List[asyncio.Task] = []
+        slides: List[Dict[str, Any]] = []
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(1, settings.SLIDESHOW_TTS_CONCURRENCY))
+        
+        async def narrate(i: int, slide: Dict[str, Any]):
+            # Always report back - the consumer waits for one message per slide
+            try:
+                if render_math:
+                    await self._render_line_images([slide])
+                narrated = await self._generate_slide_audio(i, slide, None, semaphore)
+            except Exception as e:
+                print(f"[Slideshow] Slide {i+1} failed: {e}")
+                queue.put_nowait(("error", e))
+            else:
+                queue.put_nowait(("slide", (i, narrated)))
+        
+        def start_slide(slide: Dict[str, Any]):
+            slides.append(slide)
+            pending.append(asyncio.ensure_future(narrate(len(slides) - 1, slide)))
+        
+        async def produce():
+            try:
+                async for kind, value in self._stream_lesson(problem, image):
+                    if kind == "board":
+                        start_slide(self._board_to_slide(len(slides), value))
+                    queue.put_nowait((kind, value))
+            except Exception as e:
+                queue.put_nowait(("error", e))
+        
+        try:
+            yield {"event": "progress", "data": {"stage": "lesson", "completed": 0, "total": 0}}
+            started = time.perf_counter()
+            pending.append(asyncio.ensure_future(produce()))
+            
+            announced = False
+            lesson_done = False
+            completed = 0
+            while not lesson_done or completed < len(slides):
+                kind, value = await queue.get()
+                if kind == "error":
+                    raise value
+                
+                if kind in ("title", "board", "lesson") and not announced:
+                    announced = True
+                    title = value if kind == "title" else None
+                    yield {"event": "lesson", "data": {
+                        "slideshow_id": str(uuid.uuid4()),
+                        "title": title or "Math Lesson",
+                        "total_slides": None,
+                        "estimated_duration": None
+                    }}
+                
+                if kind == "board":
+                    yield {"event": "progress", "data": {"stage": "lesson", "completed": len(slides), "total": 0}}
+                elif kind == "lesson":
+                    lesson_done = True
+                    timings["lesson"] = round(time.perf_counter() - started, 2)
+                    if not slides:
+                        for slide in self._create_slides(value):
+                            start_slide(slide)
+                elif kind == "slide":
+                    index, slide = value
+                    completed += 1
+                    yield {"event": "slide", "data": {"index": index, "slide": slide}}
+                    yield {"event": "progress", "data": {
+                        "stage": "audio",
+                        "completed": completed,
+                        "total": len(slides) if lesson_done else 0
+                    }}
+            timings["audio"] = round(time.perf_counter() - started, 2)
+            
+            yield {"event": "done", "data": {
+                "total_slides": len(slides),
+                "estimated_duration": sum(s.get("duration", 15) for s in slides),
+                "timings": timings
+            }}
+        except Exception as e:
+            print(f"[Slideshow] Stream error after stages {timings}: {e}")
+            yield {"event": "error", "data": {"error": str(e)}}
+        finally:
+            # Client went away or we failed - stop outstanding LLM and TTS work
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+    
+    async def _stream_lesson(
+        self,
+        problem: str,
+        image: Optional[str] = None
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Stream lesson generation: yields ("title", str) once known, ("board", dict)
+        as each board closes, then ("lesson", full lesson dict).
+        Streams from Manus, then OpenAI; a provider that fails before its first
+        board falls through to the next, and the non-streaming chain is the last resort.
+        """
+        candidates = []
+        if self.manus_key:
+            candidates.append(("Manus", f"{self.manus_api_host}/v1/chat/completions", self.manus_key, self.manus_model))
+        if self.openai_key:
+            candidates.append(("OpenAI", "https://api.openai.com/v1/chat/completions", self.openai_key, "gpt-4o"))
+        
+        for name, url, key, model in candidates:
+            prepared = await image_service.prepare_image(image, name.lower())
+            messages = self._lesson_messages(problem, prepared, LESSON_PROMPT)
+            parser = IncrementalJSONArrayParser("boards")
+            boards = 0
+            title_sent = False
+            try:
+                print(f"[Slideshow] Streaming lesson from {name}...")
+                async for delta in iter_openai_deltas(
+                    url,
+                    {"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
+                    {
+                        "model": model,
+                        "messages": messages,
+                        "max_tokens": 5000,
+                        "temperature": 0.7,
+                        "response_format": {"type": "json_object"}
+                    },
+                    timeout=120.0
+                ):
+                    items = parser.feed(delta)
+                    if not title_sent and "title" in parser.fields:
+                        title_sent = True
+                        yield ("title", parser.fields["title"])
+                    for board in items:
+                        if isinstance(board, dict):
+                            boards += 1
+                            yield ("board", board)
+                lesson = parser.result()
+            except Exception as e:
+                if boards:
+                    raise
+                print(f"[Slideshow] {name} lesson stream failed: {e}")
+                continue
+            print(f"[Slideshow] {name} streamed {boards} boards")
+            yield ("lesson", lesson)
+            return
+        
+        lesson = await self._generate_lesson(problem, image)
+        yield ("title", lesson.get("title", "Math Lesson"))
+        for board in lesson.get("boards", []):
+            yield ("board", board)
+        yield ("lesson", lesson)
+    
+    async def _generate_lesson(self, problem: str, image: Optional[str] = None) -> Dict[str, Any]:
+        """Generate lesson content (title + boards) - Manus first, then Gemini, then OpenAI"""
+        
+        prompt = LESSON_PROMPT
+
         # Try Manus first (most reliable), then Gemini, then OpenAI
         if self.manus_key:
             try:
@@ -151,20 +342,18 @@ Return ONLY valid JSON, no other text.'''
             print(f"[Slideshow] Using OpenAI API for lesson generation...")
             lesson = await self._generate_lesson_openai(problem, image, prompt)
         
-        slides = self._create_slides(lesson)
-        print(f"[Slideshow] Created {len(slides)} slides")
-        
-        slides_with_audio = await self._generate_all_audio(slides)
-        print(f"[Slideshow] Generated audio")
-        
-        return {"slides": slides_with_audio}
+        return lesson
     
-    async def _generate_lesson_manus(self, problem: str, image: Optional[str], prompt: str) -> Dict[str, Any]:
-        """Generate lesson using Manus AI (OpenAI SDK compatible)"""
+    def _lesson_messages(self, problem: str, image: Optional[str], prompt: str) -> List[Dict[str, Any]]:
+        """Chat messages for lesson generation (OpenAI-compatible providers)"""
         messages = [{"role": "system", "content": prompt}]
         
         if image:
-            image_url = image if image.startswith('data:') or image.startswith('http') else f"data:image/jpeg;base64,{image}"
+            if image.startswith('data:') or image.startswith('http'):
+                image_url = image
+            else:
+                mime_type, img_data = image_service.split_image(image)
+                image_url = f"data:{mime_type};base64,{img_data}"
             messages.append({
                 "role": "user",
                 "content": [
@@ -174,131 +363,125 @@ Return ONLY valid JSON, no other text.'''
             })
         else:
             messages.append({"role": "user", "content": f"Create a detailed lesson (12-15 boards) for: {problem}"})
+        return messages
+    
+    async def _generate_lesson_manus(self, problem: str, image: Optional[str], prompt: str) -> Dict[str, Any]:
+        """Generate lesson using Manus AI (OpenAI SDK compatible)"""
+        image = await image_service.prepare_image(image, "manus")
+        messages = self._lesson_messages(problem, image, prompt)
+        client = http_clients.get(self.manus_api_host)
+        response = await client.post(
+            f"{self.manus_api_host}/v1/chat/completions",
+            headers={"Authorization": f"Bearer {self.manus_key}", "Content-Type": "application/json"},
+            json={
+                "model": self.manus_model,
+                "messages": messages,
+                "max_tokens": 5000,
+                "temperature": 0.7,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=120.0
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.manus_api_host}/v1/chat/completions",
-                headers={"Authorization": f"Bearer {self.manus_key}", "Content-Type": "application/json"},
-                json={
-                    "model": self.manus_model,
-                    "messages": messages,
-                    "max_tokens": 5000,
-                    "temperature": 0.7,
-                    "response_format": {"type": "json_object"}
-                },
-                timeout=120.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                lesson = json.loads(content)
-                print(f"[Slideshow] Manus generated {len(lesson.get('boards', []))} boards")
-                return lesson
-            else:
-                raise Exception(f"Manus error: {response.status_code} - {response.text[:200]}")
+        if response.status_code == 200:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            lesson = json.loads(content)
+            print(f"[Slideshow] Manus generated {len(lesson.get('boards', []))} boards")
+            return lesson
+        else:
+            raise Exception(f"Manus error: {response.status_code} - {response.text[:200]}")
     
     async def _generate_lesson_gemini(self, problem: str, image: Optional[str], prompt: str) -> Dict[str, Any]:
         """Generate lesson using Gemini API"""
-        async with httpx.AsyncClient() as client:
-            # Build Gemini request
-            parts = [{"text": prompt + f"\n\nProblem: {problem}"}]
-            
-            if image:
-                # Extract image data for Gemini
-                if image.startswith('data:image'):
-                    img_data = image.split(',')[1] if ',' in image else image
-                    mime_type = image.split(';')[0].split(':')[1] if 'data:' in image else 'image/jpeg'
-                else:
-                    img_data = image
-                    mime_type = 'image/jpeg'
-                
-                parts.insert(0, {
-                    "inline_data": {
-                        "mime_type": mime_type,
-                        "data": img_data
-                    }
-                })
-            
-            response = await client.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-lite:generateContent?key={self.gemini_key}",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": [{"role": "user", "parts": parts}],
-                    "generationConfig": {
-                        "temperature": 0.7,
-                        "maxOutputTokens": 8192,
-                        "responseMimeType": "application/json"
-                    }
-                },
-                timeout=120.0
-            )
+        image = await image_service.prepare_image(image, "gemini")
+        client = http_clients.get("https://generativelanguage.googleapis.com")
+        # Build Gemini request
+        parts = [{"text": prompt + f"\n\nProblem: {problem}"}]
+        
+        if image:
+            # Resizing may re-encode (e.g. WEBP), so take the type from the prepared image
+            mime_type, img_data = image_service.split_image(image)
             
-            if response.status_code == 200:
-                data = response.json()
-                if "candidates" in data and len(data["candidates"]) > 0:
-                    content = data["candidates"][0]["content"]
-                    if "parts" in content and len(content["parts"]) > 0:
-                        text = content["parts"][0]["text"]
-                        # Parse JSON from response
-                        lesson = json.loads(text)
-                        print(f"[Slideshow] Gemini generated {len(lesson.get('boards', []))} boards")
-                        return lesson
-            else:
-                raise Exception(f"Gemini API error: {response.status_code} - {response.text[:200]}")
+            parts.insert(0, {
+                "inline_data": {
+                    "mime_type": mime_type,
+                    "data": img_data
+                }
+            })
+        
+        response = await client.post(
+            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-lite:generateContent?key={self.gemini_key}",
+            headers={"Content-Type": "application/json"},
+            json={
+                "contents": [{"role": "user", "parts": parts}],
+                "generationConfig": {
+                    "temperature": 0.7,
+                    "maxOutputTokens": 8192,
+                    "responseMimeType": "application/json"
+                }
+            },
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            if "candidates" in data and len(data["candidates"]) > 0:
+                content = data["candidates"][0]["content"]
+                if "parts" in content and len(content["parts"]) > 0:
+                    text = content["parts"][0]["text"]
+                    # Parse JSON from response
+                    lesson = json.loads(text)
+                    print(f"[Slideshow] Gemini generated {len(lesson.get('boards', []))} boards")
+                    return lesson
+            raise Exception("No content in Gemini response")
+        else:
+            raise Exception(f"Gemini API error: {response.status_code} - {response.text[:200]}")
     
     async def _generate_lesson_openai(self, problem: str, image: Optional[str], prompt: str) -> Dict[str, Any]:
         """Generate lesson using OpenAI API"""
-        messages = [{"role": "system", "content": prompt}]
+        image = await image_service.prepare_image(image, "openai")
+        messages = self._lesson_messages(problem, image, prompt)
+        client = http_clients.get("https://api.openai.com")
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={"Authorization": f"Bearer {self.openai_key}", "Content-Type": "application/json"},
+            json={
+                "model": "gpt-4o",
+                "messages": messages,
+                "max_tokens": 5000,
+                "temperature": 0.7,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=120.0
+        )
         
-        if image:
-            image_url = image if image.startswith('data:') or image.startswith('http') else f"data:image/jpeg;base64,{image}"
-            messages.append({
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": f"Create a detailed lesson (12-15 boards) for the problem in this image. User said: '{problem}' (ignore this, extract from image)"},
-                    {"type": "image_url", "image_url": {"url": image_url}}
-                ]
-            })
+        if response.status_code == 200:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            lesson = json.loads(content)
+            print(f"[Slideshow] OpenAI generated {len(lesson.get('boards', []))} boards")
+            return lesson
         else:
-            messages.append({"role": "user", "content": f"Create a detailed lesson (12-15 boards) for: {problem}"})
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={"Authorization": f"Bearer {self.openai_key}", "Content-Type": "application/json"},
-                json={
-                    "model": "gpt-4o",
-                    "messages": messages,
-                    "max_tokens": 5000,
-                    "temperature": 0.7,
-                    "response_format": {"type": "json_object"}
-                },
-                timeout=120.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                lesson = json.loads(content)
-                print(f"[Slideshow] OpenAI generated {len(lesson.get('boards', []))} boards")
-                return lesson
-            else:
-                raise Exception(f"OpenAI error: {response.status_code} - {response.text[:200]}")
+            raise Exception(f"OpenAI error: {response.status_code} - {response.text[:200]}")
+    
+    def _board_to_slide(self, i: int, board: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert one lesson board to a slide"""
+        return {
+            "type": "blackboard",
+            "title": board.get("title", f"Step {i+1}"),
+            "lines": board.get("lines", []),
+            "speaker_notes": board.get("voice", ""),
+            "duration": 18,
+            "background": "blackboard"
+        }
     
     def _create_slides(self, lesson: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Convert boards to slides"""
         slides = []
         
         for i, board in enumerate(lesson.get("boards", [])):
-            slides.append({
-                "type": "blackboard",
-                "title": board.get("title", f"Step {i+1}"),
-                "lines": board.get("lines", []),
-                "speaker_notes": board.get("voice", ""),
-                "duration": 18,
-                "background": "blackboard"
-            })
+            slides.append(self._board_to_slide(i, board))
         
         if not slides:
             slides.append({
@@ -312,87 +495,122 @@ Return ONLY valid JSON, no other text.'''
         
         return slides
     
+    async def _render_line_images(self, slides: List[Dict[str, Any]]) -> None:
+        """Attach line_images (pre-rendered math per line, None where rendering failed)"""
+        rendered = await asyncio.gather(*(
+            latex_service.render_many(slide.get("lines", []), color=settings.SLIDESHOW_MATH_COLOR)
+            for slide in slides
+        ))
+        for slide, line_images in zip(slides, rendered):
+            slide["line_images"] = line_images
+    
     async def _generate_all_audio(self, slides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate audio for all slides"""
-        result = []
+        """
+        Generate audio for all slides concurrently (bounded by SLIDESHOW_TTS_CONCURRENCY).
+        Provider rate limits still apply via the shared limiter; order is preserved
+        and a failed slide only loses its own audio.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.SLIDESHOW_TTS_CONCURRENCY))
+        return list(await asyncio.gather(
+            *(self._generate_slide_audio(i, slide, len(slides), semaphore) for i, slide in enumerate(slides))
+        ))
+    
+    async def _generate_slide_audio(
+        self,
+        i: int,
+        slide: Dict[str, Any],
+        total: Optional[int],
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Return a copy of `slide` with its narration audio attached (never raises)"""
+        slide_copy = slide.copy()
+        notes = slide.get("speaker_notes", "")
         
-        for i, slide in enumerate(slides):
-            slide_copy = slide.copy()
-            notes = slide.get("speaker_notes", "")
-            
-            if notes:
-                print(f"[Slideshow] Audio {i+1}/{len(slides)}: {notes[:50]}...")
+        if not notes:
+            slide_copy["has_audio"] = False
+            print(f"[Slideshow] ⚠ Slide {i+1} has no voice text")
+            return slide_copy
+        
+        async with semaphore:
+            print(f"[Slideshow] Audio {i+1}/{total or '?'}: {notes[:50]}...")
+            try:
                 audio = await self._generate_voice(notes)
-                if audio:
-                    slide_copy["audio"] = audio
-                    slide_copy["has_audio"] = True
-                    print(f"[Slideshow] ✓ Audio {i+1}")
-                else:
-                    slide_copy["has_audio"] = False
-                    print(f"[Slideshow] ✗ Audio {i+1} failed")
-            else:
-                slide_copy["has_audio"] = False
-                print(f"[Slideshow] ⚠ Slide {i+1} has no voice text")
-            
-            result.append(slide_copy)
+            except Exception as e:
+                print(f"[Slideshow] Audio {i+1} raised: {e}")
+                audio = None
         
-        return result
+        if audio:
+            slide_copy["audio"] = audio
+            slide_copy["has_audio"] = True
+            print(f"[Slideshow] ✓ Audio {i+1}")
+        else:
+            slide_copy["has_audio"] = False
+            print(f"[Slideshow] ✗ Audio {i+1} failed")
+        return slide_copy
     
     async def _generate_voice(self, text: str) -> Optional[str]:
-        """Generate voice narration using MiniMax API with OpenAI fallback"""
+        """Generate voice narration using MiniMax API with OpenAI fallback; returns a /api/media URL"""
         if not text.strip():
             return None
         
         # Preprocess text for OCT-style delivery: add strategic pauses
         processed_text = self._preprocess_text_for_oct_style(text)
         
+        # Identical narration from any provider we might use is served from the audio cache
+        minimax_cache_key = audio_cache.key(processed_text, "male-qn-qingse", 0.88, "speech-02-hd")
+        openai_cache_key = audio_cache.key(processed_text, "onyx", 0.88, "tts-1-hd")
+        for cache_key in (minimax_cache_key, openai_cache_key):
+            if await audio_cache.locate(cache_key):
+                print(f"[Slideshow] Audio cache hit")
+                return media_store.url_for(audio_cache, cache_key)
+        
         # Try MiniMax first
         if self.minimax_key:
             print(f"[Slideshow] Trying MiniMax TTS...")
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{self.minimax_api_host}/v1/t2a_v2",
-                        headers={
-                            "Authorization": f"Bearer {self.minimax_key}",
-                            "Content-Type": "application/json"
+                client = http_clients.get(self.minimax_api_host)
+                response = await client.post(
+                    f"{self.minimax_api_host}/v1/t2a_v2",
+                    headers={
+                        "Authorization": f"Bearer {self.minimax_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": "speech-02-hd",
+                        "text": processed_text,
+                        "voice_setting": {
+                            "voice_id": "male-qn-qingse",  # Calm North American male voice
+                            "speed": 0.88,  # Slow, deliberate pace like OCT
+                            "vol": 1.0,
+                            "pitch": -0.5  # Slightly lower for that mid-range authoritative tone
                         },
-                        json={
-                            "model": "speech-02-hd",
-                            "text": processed_text,
-                            "voice_setting": {
-                                "voice_id": "male-qn-qingse",  # Calm North American male voice
-                                "speed": 0.88,  # Slow, deliberate pace like OCT
-                                "vol": 1.0,
-                                "pitch": -0.5  # Slightly lower for that mid-range authoritative tone
-                            },
-                            "audio_setting": {
-                                "sample_rate": 32000,
-                                "bitrate": 128000,
-                                "format": "mp3",
-                                "channel": 1
-                            },
-                            "pronunciation_dict": {
-                                "style": "instructional"  # Academic/tutorial style
-                            }
+                        "audio_setting": {
+                            "sample_rate": 32000,
+                            "bitrate": 128000,
+                            "format": "mp3",
+                            "channel": 1
                         },
-                        timeout=60.0
-                    )
-                    
-                    print(f"[Slideshow] MiniMax TTS: {response.status_code}")
-                    if response.status_code == 200:
-                        data = response.json()
-                        audio_hex = data.get('data', {}).get('audio', '')
-                        if audio_hex:
-                            audio_bytes = bytes.fromhex(audio_hex)
-                            audio = base64.b64encode(audio_bytes).decode()
-                            return f"data:audio/mp3;base64,{audio}"
-                        else:
-                            print(f"[Slideshow] MiniMax: No audio in response")
-                    elif response.status_code == 429:
-                        print(f"[Slideshow] MiniMax rate limited, falling back to OpenAI")
+                        "pronunciation_dict": {
+                            "style": "instructional"  # Academic/tutorial style
+                        }
+                    },
+                    timeout=60.0
+                )
+                
+                print(f"[Slideshow] MiniMax TTS: {response.status_code}")
+                if response.status_code == 200:
+                    data = response.json()
+                    audio_hex = data.get('data', {}).get('audio', '')
+                    if audio_hex:
+                        audio_bytes = bytes.fromhex(audio_hex)
+                        await audio_cache.put(minimax_cache_key, audio_bytes)
+                        return media_store.url_for(audio_cache, minimax_cache_key)
                     else:
-                        print(f"[Slideshow] MiniMax error: {response.text[:200]}")
+                        print(f"[Slideshow] MiniMax: No audio in response")
+                elif response.status_code == 429:
+                    print(f"[Slideshow] MiniMax rate limited, falling back to OpenAI")
+                else:
+                    print(f"[Slideshow] MiniMax error: {response.text[:200]}")
             except Exception as e:
                 print(f"[Slideshow] MiniMax failed: {e}")
         else:
@@ -401,23 +619,23 @@ Return ONLY valid JSON, no other text.'''
         # Fallback to OpenAI TTS
         if self.openai_key:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        "https://api.openai.com/v1/audio/speech",
-                        headers={"Authorization": f"Bearer {self.openai_key}", "Content-Type": "application/json"},
-                        json={
-                            "model": "tts-1-hd",
-                            "input": processed_text,
-                            "voice": "onyx",  # Deeper male voice for OCT style
-                            "speed": 0.88  # Match MiniMax speed
-                        },
-                        timeout=60.0
-                    )
-                    
-                    if response.status_code == 200:
-                        print(f"[Slideshow] OpenAI TTS fallback: 200")
-                        audio = base64.b64encode(response.content).decode()
-                        return f"data:audio/mp3;base64,{audio}"
+                client = http_clients.get("https://api.openai.com")
+                response = await client.post(
+                    "https://api.openai.com/v1/audio/speech",
+                    headers={"Authorization": f"Bearer {self.openai_key}", "Content-Type": "application/json"},
+                    json={
+                        "model": "tts-1-hd",
+                        "input": processed_text,
+                        "voice": "onyx",  # Deeper male voice for OCT style
+                        "speed": 0.88  # Match MiniMax speed
+                    },
+                    timeout=60.0
+                )
+                
+                if response.status_code == 200:
+                    print(f"[Slideshow] OpenAI TTS fallback: 200")
+                    await audio_cache.put(openai_cache_key, response.content)
+                    return media_store.url_for(audio_cache, openai_cache_key)
             except Exception as e:
                 print(f"[Slideshow] OpenAI TTS also failed: {e}")
         
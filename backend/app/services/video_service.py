@@ -3,13 +3,13 @@ Video Service - Handles video generation using MiniMax API
 Creates educational/learning videos based on topics or problems
 """
 from typing import Optional, Dict, Any
-import httpx
 import asyncio
 import os
 import uuid
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.http_client import http_clients
 
 
 class VideoService:
@@ -93,112 +93,112 @@ class VideoService:
             }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/video_generation",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    params={
-                        "task_id": task_id
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    status = data.get("status", "unknown")
-                    
-                    result = {
-                        "success": True,
-                        "task_id": task_id,
-                        "status": status
-                    }
-                    
-                    if status == "Success":
-                        file_id = data.get("file_id")
-                        if file_id:
-                            # Get the video download URL
-                            video_url = await self._get_video_url(file_id)
-                            result["video_url"] = video_url
-                            result["file_id"] = file_id
-                    elif status == "Fail":
-                        result["error"] = data.get("error_message", "Video generation failed")
-                    
-                    return result
-                else:
-                    return {
-                        "success": False,
-                        "error": f"API error: {response.status_code}",
-                        "details": response.text
-                    }
-                    
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    async def _submit_video_task(self, prompt: str) -> Dict[str, Any]:
-        """Submit a video generation task to MiniMax API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+            client = http_clients.get(self.base_url)
+            response = await client.get(
                 f"{self.base_url}/video_generation",
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
                     "Content-Type": "application/json"
                 },
-                json={
-                    "model": self.video_model,
-                    "prompt": prompt,
-                    "prompt_optimizer": True
+                params={
+                    "task_id": task_id
                 },
-                timeout=60.0
+                timeout=30.0
             )
             
             if response.status_code == 200:
                 data = response.json()
-                task_id = data.get("task_id")
+                status = data.get("status", "unknown")
                 
-                if task_id:
-                    return {
-                        "success": True,
-                        "task_id": task_id
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": "No task_id in response",
-                        "details": data
-                    }
+                result = {
+                    "success": True,
+                    "task_id": task_id,
+                    "status": status
+                }
+                
+                if status == "Success":
+                    file_id = data.get("file_id")
+                    if file_id:
+                        # Get the video download URL
+                        video_url = await self._get_video_url(file_id)
+                        result["video_url"] = video_url
+                        result["file_id"] = file_id
+                elif status == "Fail":
+                    result["error"] = data.get("error_message", "Video generation failed")
+                
+                return result
             else:
                 return {
                     "success": False,
                     "error": f"API error: {response.status_code}",
                     "details": response.text
                 }
+                
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def _submit_video_task(self, prompt: str) -> Dict[str, Any]:
+        """Submit a video generation task to MiniMax API"""
+        client = http_clients.get(self.base_url)
+        response = await client.post(
+            f"{self.base_url}/video_generation",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.video_model,
+                "prompt": prompt,
+                "prompt_optimizer": True
+            },
+            timeout=60.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            task_id = data.get("task_id")
+            
+            if task_id:
+                return {
+                    "success": True,
+                    "task_id": task_id
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": "No task_id in response",
+                    "details": data
+                }
+        else:
+            return {
+                "success": False,
+                "error": f"API error: {response.status_code}",
+                "details": response.text
+            }
     
     async def _get_video_url(self, file_id: str) -> str:
         """Get the download URL for a generated video"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/files/retrieve",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                params={
-                    "file_id": file_id
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("file", {}).get("download_url", "")
-            
-            return ""
+        client = http_clients.get(self.base_url)
+        response = await client.get(
+            f"{self.base_url}/files/retrieve",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            params={
+                "file_id": file_id
+            },
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data.get("file", {}).get("download_url", "")
+        
+        return ""
     
     def _build_video_prompt(
         self,
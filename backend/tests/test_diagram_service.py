@@ -0,0 +1,50 @@
+"""
+A diagram render that times out must not take other renders down with it
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import diagram_service as diagram_module
+from app.services.diagram_service import DiagramService
+
+
+def _render_slowly(spec, dpi, fmt="png"):
+    # "hang" never finishes; anything else takes 0.7s
+    if spec["kind"] == "hang":
+        time.sleep(60)
+    time.sleep(0.7)
+    return b"png"
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "DIAGRAM_WORKERS", 2)
+    monkeypatch.setattr(settings, "DIAGRAM_RENDER_TIMEOUT", 1.0)
+    monkeypatch.setattr(diagram_module, "_render", _render_slowly)
+    service = DiagramService()
+    yield service
+    service.shutdown()
+
+
+def test_queued_renders_do_not_time_out(service):
+    async def run():
+        # Six 0.7s renders on two workers - the last ones wait well past the timeout
+        return await asyncio.gather(*(service.rasterize({"kind": "formula"}) for _ in range(6)))
+
+    assert asyncio.run(run()) == [b"png"] * 6
+
+
+def test_render_killed_by_another_timeout_is_retried(service):
+    async def run():
+        stuck = asyncio.ensure_future(service.rasterize({"kind": "hang"}))
+        await asyncio.sleep(0.6)
+        # Still running when the hung render's timeout restarts the pool
+        data = await service.rasterize({"kind": "formula"})
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+        return data
+
+    assert asyncio.run(run()) == b"png"
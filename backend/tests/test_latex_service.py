@@ -0,0 +1,51 @@
+"""
+Large LaTeX batches must typeset every expression and never raise
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.disk_cache import DiskCache
+from app.core.process_pool import WorkerPool
+from app.services import diagram_service as diagram_module
+from app.services.diagram_service import diagram_service
+from app.services.latex_service import latex_service
+
+
+def _typeset_slowly(spec, dpi, fmt="png"):
+    # Lines containing "hang" never finish; the rest take 0.3s
+    if any("hang" in line for line in spec["lines"]):
+        time.sleep(60)
+    time.sleep(0.3)
+    return b"<svg/>"
+
+
+@pytest.fixture
+def workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "DIAGRAM_RENDER_TIMEOUT", 1.0)
+    monkeypatch.setattr(diagram_module, "_render", _typeset_slowly)
+    monkeypatch.setattr(latex_service, "caches", {"svg": DiskCache(str(tmp_path), 10 ** 6, "svg")})
+    pool = WorkerPool("Diagram", 2)
+    monkeypatch.setattr(diagram_service, "workers", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_batch_longer_than_the_timeout_is_fully_typeset(workers):
+    expressions = [f"\\frac{{{i}}}{{x + 1}}" for i in range(12)]
+
+    # 12 x 0.3s on two workers takes about twice the render timeout
+    urls = asyncio.run(latex_service.render_many(expressions, "svg"))
+
+    assert all(url is not None for url in urls)
+
+
+def test_hung_expression_only_fails_itself(workers):
+    expressions = ["\\text{hang}"] + [f"x^{{{i}}}" for i in range(8)]
+
+    urls = asyncio.run(latex_service.render_many(expressions, "svg"))
+
+    assert urls[0] is None
+    assert all(url is not None for url in urls[1:])
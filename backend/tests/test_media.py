@@ -0,0 +1,46 @@
+"""
+Media validators must survive the cache's LRU touch
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.disk_cache import DiskCache
+from app.core.media_store import media_store
+from app.main import app
+
+KEY = "ab" * 32
+
+
+@pytest.fixture
+def media_url(monkeypatch, tmp_path):
+    cache = DiskCache(str(tmp_path), 10 ** 6, "mp3")
+    monkeypatch.setitem(media_store._caches, "mp3", cache)
+    asyncio.run(cache.put(KEY, b"0123456789" * 10))
+
+    # Every lookup touches the file; make each touch land a minute after the last
+    utime = os.utime
+    clock = iter(range(60, 60 * 1000, 60))
+
+    def touch(path, times=None):
+        stamp = next(clock)
+        utime(path, (stamp, stamp))
+
+    monkeypatch.setattr(os, "utime", touch)
+    return media_store.url_for(cache, KEY)
+
+
+def test_etag_revalidates(media_url):
+    with TestClient(app) as client:
+        etag = client.get(media_url).headers["etag"]
+        assert client.get(media_url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_if_range_with_previous_etag_gets_partial_content(media_url):
+    with TestClient(app) as client:
+        etag = client.get(media_url).headers["etag"]
+        response = client.get(media_url, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == b"0123456789"
@@ -0,0 +1,127 @@
+"""
+PDF extraction that times out must not keep its worker busy
+"""
+import asyncio
+import io
+import time
+
+import pytest
+from PyPDF2 import PdfWriter
+
+from app.core.config import settings
+from app.services import pdf_service as pdf_module
+from app.services.pdf_service import PdfService
+
+
+_extract = pdf_module._extract_pages
+
+
+def _hang(*args):
+    time.sleep(60)
+
+
+def _extract_slowly(content, start, stop):
+    # b"hang" never finishes; b"slow:<pdf>" takes 0.7s
+    if content == b"hang":
+        _hang()
+    time.sleep(0.7)
+    return _extract(content[len(b"slow:"):], start, stop)
+
+
+def _blank_pdf() -> bytes:
+    writer = PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_WORKERS", 1)
+    monkeypatch.setattr(settings, "PDF_EXTRACT_TIMEOUT", 1.0)
+    service = PdfService()
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def two_workers(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_WORKERS", 2)
+    monkeypatch.setattr(settings, "PDF_EXTRACT_TIMEOUT", 1.0)
+    service = PdfService()
+    yield service
+    service.shutdown()
+
+
+def test_timed_out_extraction_frees_its_worker(service, monkeypatch):
+    content = _blank_pdf()
+
+    async def run():
+        extract = pdf_module._extract_pages
+        monkeypatch.setattr(pdf_module, "_extract_pages", _hang)
+        extraction = asyncio.ensure_future(service.extract_pages(content))
+        await asyncio.sleep(0.5)
+        workers = list(service.workers.pool._processes.values())
+        with pytest.raises(asyncio.TimeoutError):
+            await extraction
+        monkeypatch.setattr(pdf_module, "_extract_pages", extract)
+
+        # The only worker was busy with the hung document - this only completes if it was replaced
+        assert await service.extract_pages(content) == [""]
+        return workers
+
+    workers = asyncio.run(run())
+    assert workers
+    for process in workers:
+        process.join(timeout=5)
+        assert not process.is_alive()
+
+
+def test_timed_out_stream_frees_its_worker(service, monkeypatch):
+    content = _blank_pdf()
+
+    async def run():
+        extract = pdf_module._extract_page_list
+        monkeypatch.setattr(pdf_module, "_extract_page_list", _hang)
+        with pytest.raises(asyncio.TimeoutError):
+            await _collect(service.iter_pages(content))
+        monkeypatch.setattr(pdf_module, "_extract_page_list", extract)
+        return await _collect(service.iter_pages(content))
+
+    events = asyncio.run(run())
+
+    assert [event["event"] for event in events] == ["meta", "page", "done"]
+
+
+def test_queue_wait_does_not_count_against_the_timeout(service, monkeypatch):
+    monkeypatch.setattr(pdf_module, "_extract_pages", _extract_slowly)
+    content = b"slow:" + _blank_pdf()
+
+    async def run():
+        # Two 0.7s documents on one worker: the second waits 0.7s before it starts
+        return await asyncio.gather(
+            service.extract_pages(content, "first"),
+            service.extract_pages(content, "second")
+        )
+
+    assert asyncio.run(run()) == [[""], [""]]
+
+
+def test_healthy_extraction_survives_another_documents_timeout(two_workers, monkeypatch):
+    monkeypatch.setattr(pdf_module, "_extract_pages", _extract_slowly)
+
+    async def run():
+        stuck = asyncio.ensure_future(two_workers.extract_pages(b"hang"))
+        # Still running when the hung document's timeout restarts the pool
+        await asyncio.sleep(0.6)
+        healthy = await two_workers.extract_pages(b"slow:" + _blank_pdf())
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+        return healthy
+
+    assert asyncio.run(run()) == [""]
@@ -0,0 +1,47 @@
+"""
+Streaming slideshow generation must always terminate
+"""
+import asyncio
+
+from app.services.slideshow_service import slideshow_service
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def test_stream_ends_with_error_when_narration_raises(monkeypatch):
+    async def fake_lesson(problem, image=None):
+        board = {"title": "Step 1", "lines": ["$x = 1$"], "voice": "One."}
+        yield "title", "Lesson"
+        yield "board", board
+        yield "lesson", {"title": "Lesson", "boards": [board]}
+
+    async def failing_audio(*args, **kwargs):
+        raise RuntimeError("narration exploded")
+
+    monkeypatch.setattr(slideshow_service, "_stream_lesson", fake_lesson)
+    monkeypatch.setattr(slideshow_service, "_generate_slide_audio", failing_audio)
+
+    events = asyncio.run(asyncio.wait_for(_collect(slideshow_service.stream_slideshow("problem")), timeout=5))
+
+    assert events[-1]["event"] == "error"
+    assert "narration exploded" in events[-1]["data"]["error"]
+
+
+def test_stream_ends_with_error_when_math_rendering_raises(monkeypatch):
+    async def fake_lesson(problem, image=None):
+        board = {"title": "Step 1", "lines": ["$x = 1$"], "voice": "One."}
+        yield "board", board
+        yield "lesson", {"title": "Lesson", "boards": [board]}
+
+    async def failing_math(slides):
+        raise RuntimeError("math exploded")
+
+    monkeypatch.setattr(slideshow_service, "_stream_lesson", fake_lesson)
+    monkeypatch.setattr(slideshow_service, "_render_line_images", failing_math)
+
+    stream = slideshow_service.stream_slideshow("problem", render_math=True)
+    events = asyncio.run(asyncio.wait_for(_collect(stream), timeout=5))
+
+    assert events[-1]["event"] == "error"
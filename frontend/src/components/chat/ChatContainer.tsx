@@ -123,12 +123,11 @@ export function ChatContainer({ session, onNewSession, onAddMessage, onUpdateSes
     try {
       // Send to API
       const messages = currentSession?.messages || []
-      const imageData = images.map(img => img.data)
-      console.log('[ChatContainer] Sending images:', imageData.length, 'images')
+      console.log('[ChatContainer] Sending images:', images.length, 'images')
       
       const response = await chatService.sendMessage(
         fullContent,
-        imageData,
+        images,
         messages,
         selectedModel,
         false  // Regular mode
@@ -115,7 +115,7 @@ export function ChatInput({ onSend, onStop, isLoading, isWelcome, reasoningMode,
         alert('Failed to read PDF. Please try again.')
       }
     } else {
-      // Handle images
+      // Handle images - preview locally, upload once and keep the handle
       return new Promise((resolve) => {
         const reader = new FileReader()
         reader.onload = () => {
@@ -127,6 +127,12 @@ export function ChatInput({ onSend, onStop, isLoading, isWelcome, reasoningMode,
           }
           setAttachments(prev => [...prev, newAttachment])
           resolve()
+
+          chatService.uploadImage(file)
+            .then((handle) => {
+              setAttachments(prev => prev.map(att => att.id === newAttachment.id ? { ...att, handle } : att))
+            })
+            .catch((error) => console.error('Failed to upload image, sending it inline:', error))
         }
         reader.readAsDataURL(file)
       })
@@ -1,8 +1,16 @@
 import axios from 'axios'
-import { ChatResponse, Message } from '@/types/chat'
+import { ChatResponse, ImageAttachment, Message } from '@/types/chat'
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || '/api'
 
+// Media URLs come back root-relative (/api/media/...); point them at the API origin
+const resolveMediaUrl = (url?: string | null) => {
+  if (url && url.startsWith('/') && /^https?:\/\//.test(API_BASE_URL)) {
+    return new URL(API_BASE_URL).origin + url
+  }
+  return url
+}
+
 // Get access code from localStorage or URL param
 const getAccessCode = () => {
   const urlParams = new URLSearchParams(window.location.search)
@@ -14,6 +22,10 @@ const getAccessCode = () => {
   return localStorage.getItem('access_code') || ''
 }
 
+// Upload handles keep image bytes out of repeated requests; inline data is the fallback
+const imagePayload = (image: ImageAttachment, inline = false) =>
+  inline || !image.handle ? image.data : image.handle
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -189,27 +201,36 @@ export interface GamblingAnalysis {
 export const chatService = {
   async sendMessage(
     message: string,
-    images: string[] = [],
+    images: ImageAttachment[] = [],
     history: Message[] = [],
     model: string = 'langchain',
     reasoningMode: boolean = false
   ): Promise<ChatResponse> {
+    const post = (inline: boolean) => api.post<ChatResponse>('/chat/message', {
+      message,
+      images: images.map(img => imagePayload(img, inline)),
+      history: history.map(msg => ({
+        role: msg.role,
+        content: msg.content,
+        images: msg.images?.map(img => imagePayload(img, inline)),
+      })),
+      model,
+      reasoning_mode: reasoningMode,
+    })
+
     try {
       console.log(`[API Call] Sending message with model: ${model}, reasoning: ${reasoningMode}`)
       console.log(`[API Call] Message: "${message.substring(0, 50)}${message.length > 50 ? '...' : ''}"`)
       console.log(`[API Call] Images: ${images.length}`)
       
-      const response = await api.post<ChatResponse>('/chat/message', {
-        message,
-        images,
-        history: history.map(msg => ({
-          role: msg.role,
-          content: msg.content,
-          images: msg.images?.map(img => img.data),
-        })),
-        model,
-        reasoning_mode: reasoningMode,
-      })
+      let response
+      try {
+        response = await post(false)
+      } catch (error) {
+        // An upload handle was evicted server-side - resend the images inline
+        if (!axios.isAxiosError(error) || error.response?.status !== 404) throw error
+        response = await post(true)
+      }
       
       console.log(`[API Response] Received from ${model}:`, response.data.message.substring(0, 100))
       return response.data
@@ -229,7 +250,7 @@ export const chatService = {
       },
     })
 
-    return response.data.data
+    return response.data.handle
   },
 
   async uploadPdf(file: File): Promise<string> {
@@ -344,7 +365,7 @@ export const chatService = {
         { image_prompt: imagePrompt },
         { timeout: 60000 }
       )
-      return response.data.image_url
+      return resolveMediaUrl(response.data.image_url) ?? null
     } catch (error) {
       console.error('Reasoning image API error:', error)
       return null
@@ -358,7 +379,7 @@ export const chatService = {
         { text },
         { timeout: 30000 }
       )
-      return response.data.audio
+      return resolveMediaUrl(response.data.audio) ?? null
     } catch (error) {
       console.error('Speech API error:', error)
       return null
@@ -385,7 +406,10 @@ export const chatService = {
         { timeout: 180000 } // 3 minute timeout
       )
       console.log('[Explanation API] Received response with', response.data.steps.length, 'steps')
-      return response.data
+      return {
+        ...response.data,
+        steps: response.data.steps.map((step) => ({ ...step, generated_image: resolveMediaUrl(step.generated_image) })),
+      }
     } catch (error) {
       console.error('Explanation API error:', error)
       throw error
@@ -451,7 +475,10 @@ export const chatService = {
         { timeout: 120000 }
       )
       console.log('[Slideshow API] Generated', response.data.total_slides, 'slides')
-      return response.data
+      return {
+        ...response.data,
+        slides: response.data.slides?.map((slide) => ({ ...slide, audio: resolveMediaUrl(slide.audio) })),
+      }
     } catch (error) {
       console.error('Slideshow API error:', error)
       throw error
@@ -9,7 +9,8 @@ export interface Message {
 
 export interface ImageAttachment {
   id: string
-  data: string // Base64 encoded
+  data: string // Base64 encoded (local preview)
+  handle?: string // "blob:<id>" upload handle, sent instead of `data` when present
   name: string
   type: string
 }